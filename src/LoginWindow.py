@@ -8,14 +8,17 @@
 
 import webbrowser
 from WeHack import async
-from weibo import APIClient
+from weibo import APIClient, APIError
 from PyQt4 import QtCore, QtGui
 from LoginWindow_ui import Ui_frm_Login
-from WeCaseWindow import WeCaseWindow
 import const
-from TweetUtils import authorize
+import startuptrace
+import sessionrecorder
+from TweetUtils import authorize, saved_token, TOKEN_ERRORS
+from connectivity import NETWORK_ERRORS
 from time import sleep
 from WeCaseConfig import WeCaseConfig
+from WeRuntimeInfo import WeRuntimeInfo
 
 
 class LoginWindow(QtGui.QDialog, Ui_frm_Login):
@@ -31,6 +34,7 @@ class LoginWindow(QtGui.QDialog, Ui_frm_Login):
         self.setupUi(self)
         self.setupSignals()
         self.err_count = 0
+        self.token = None
 
     def setupSignals(self):
         # Other signals defined in Designer.
@@ -40,14 +44,20 @@ class LoginWindow(QtGui.QDialog, Ui_frm_Login):
     def accept(self):
         if self.chk_Remember.isChecked():
             self.passwd[str(self.username)] = str(self.password)
+            self.tokens[str(self.username)] = self.token
             self.last_login = str(self.username)
             # Because this is a model dialog,
             # closeEvent won't emit when we accept() the window, but will
             # emit when we reject() the window.
             self.saveConfig()
             self.setParent(None)
+        startuptrace.mark("authorize")
+        # Don't load the MainWindow before users have logged in.
+        from WeCaseWindow import WeCaseWindow
+        startuptrace.mark("import WeCaseWindow")
         wecase_main = WeCaseWindow()
         wecase_main.show()
+        startuptrace.mark("WeCaseWindow")
         # Maybe users will logout, so reset the status
         self.pushButton_log.setText(self.tr("GO!"))
         self.pushButton_log.setEnabled(True)
@@ -104,9 +114,11 @@ class LoginWindow(QtGui.QDialog, Ui_frm_Login):
         self.passwd = self.login_config.passwd
         self.last_login = self.login_config.last_login
         self.auto_login = self.login_config.auto_login and self.allow_auto_login
+        self.tokens = self.login_config.tokens
 
     def saveConfig(self):
         self.login_config.passwd = self.passwd
+        self.login_config.tokens = self.tokens
         self.login_config.last_login = self.last_login
         self.login_config.auto_login = self.chk_AutoLogin.isChecked()
         self.login_config.save()
@@ -119,19 +131,53 @@ class LoginWindow(QtGui.QDialog, Ui_frm_Login):
     def ui_authorize(self):
         self.username = self.cmb_Users.currentText()
         self.password = self.txt_Password.text()
-        self.authorize(self.username, self.password)
+        token = None
+        if self.passwd.get(self.username) == self.password:
+            token = saved_token(self.tokens, self.username)
+        self.authorize(self.username, self.password, token)
 
     @async
-    def authorize(self, username, password):
+    def authorize(self, username, password, token=None):
         try:
             client = APIClient(app_key=const.APP_KEY, app_secret=const.APP_SECRET,
                                redirect_uri=const.CALLBACK_URL)
+            api_server = self.login_config.api_server.rstrip("/")
+            if api_server:
+                client.auth_url = api_server + "/oauth2/"
+                client.api_url = api_server + "/2/"
+
+            if token:
+                client.set_access_token(token["access_token"], token["expires"])
+                try:
+                    client.account.get_uid.get()
+                except APIError as e:
+                    if e.error_code not in TOKEN_ERRORS:
+                        raise
+                    # Revoked by Sina, authorize again with the password.
+                    self.tokens.pop(username, None)
+                    token = None
+                except NETWORK_ERRORS:
+                    # Offline, go on with it.
+                    pass
+
+            if token:
+                # The token of the last login is still valid, skip all
+                # the round trips below. It works offline, too.
+                WeRuntimeInfo()["uid"] = token.get("uid")
+                self.token = token
+                const.client = client
+                self.loginReturn.emit(self.SUCCESS)
+                return
 
             # Step 1: Get the authorize url from Sina
             authorize_url = client.get_authorize_url()
 
             # Step 2: Send the authorize info to Sina and get the authorize_code
-            authorize_code = authorize(authorize_url, username, password)
+            if sessionrecorder.replaying():
+                # The access token is replayed, the code doesn't matter.
+                authorize_code = "replay"
+            else:
+                authorize_code = authorize(authorize_url, username, password)
             if not authorize_code:
                 self.loginReturn.emit(self.PASSWORD_ERROR)
                 return
@@ -140,7 +186,12 @@ class LoginWindow(QtGui.QDialog, Ui_frm_Login):
             r = client.request_access_token(authorize_code)
 
             # Step 4: Setup the access token of SDK
+            # The SDK has converted expires_in to the time it expires.
             client.set_access_token(r.access_token, r.expires_in)
+            uid = r.get("uid")
+            self.token = {"access_token": r.access_token, "expires": r.expires_in,
+                          "uid": int(uid) if uid else None}
+            WeRuntimeInfo()["uid"] = self.token["uid"]
             const.client = client
             self.loginReturn.emit(self.SUCCESS)
             return
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This file implemented MetricsWindow, a debug window
+#           to watch the metrics of the hot paths.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import time
+from PyQt4 import QtCore, QtGui
+import const
+from WMetrics import metrics
+
+
+class MetricsWindow(QtGui.QDialog):
+    REFRESH_INTERVAL = 1000
+
+    def __init__(self, parent=None):
+        super(MetricsWindow, self).__init__(parent)
+        self.setAttribute(QtCore.Qt.WA_QuitOnClose, False)
+        self.setupUi()
+        self.refresh()
+
+    def setupUi(self):
+        self.setWindowTitle(self.tr("Metrics"))
+        self.resize(560, 480)
+        layout = QtGui.QVBoxLayout(self)
+
+        self.enableCheckBox = QtGui.QCheckBox(self.tr("&Enable metrics"), self)
+        self.enableCheckBox.setChecked(metrics.enabled())
+        self.enableCheckBox.toggled.connect(self.setEnabledMetrics)
+        layout.addWidget(self.enableCheckBox)
+
+        self.treeWidget = QtGui.QTreeWidget(self)
+        self.treeWidget.setHeaderLabels([self.tr("Name"), self.tr("Value")])
+        self.treeWidget.setColumnWidth(0, 260)
+        layout.addWidget(self.treeWidget)
+
+        buttonLayout = QtGui.QHBoxLayout()
+        buttonLayout.addStretch()
+        self.clearButton = QtGui.QPushButton(self.tr("&Clear"), self)
+        self.clearButton.clicked.connect(self.clear)
+        buttonLayout.addWidget(self.clearButton)
+        self.dumpButton = QtGui.QPushButton(self.tr("&Dump to JSON"), self)
+        self.dumpButton.clicked.connect(self.dump)
+        buttonLayout.addWidget(self.dumpButton)
+        layout.addLayout(buttonLayout)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(self.REFRESH_INTERVAL)
+
+    def _format(self, value):
+        if isinstance(value, float):
+            return "%.4f" % value
+        return str(value)
+
+    def refresh(self):
+        snapshot = metrics.snapshot()
+        del snapshot["time"]
+
+        self.treeWidget.clear()
+        for name, value in sorted(snapshot.items()):
+            item = QtGui.QTreeWidgetItem([name])
+            if isinstance(value, dict):
+                for key in ("count", "mean", "p50", "p90", "p99", "min", "max"):
+                    item.addChild(QtGui.QTreeWidgetItem([key, self._format(value[key])]))
+                item.setText(1, self.tr("%s samples") % value["count"])
+            else:
+                item.setText(1, self._format(value))
+            self.treeWidget.addTopLevelItem(item)
+
+    def setEnabledMetrics(self, state):
+        metrics.setEnabled(state)
+        self.refresh()
+
+    def clear(self):
+        metrics.clear()
+        self.refresh()
+
+    def dump(self):
+        path = const.cache_path + "metrics-%s.json" % time.strftime("%Y%m%d-%H%M%S")
+        metrics.dump(path)
+        QtGui.QMessageBox.information(self, self.tr("Metrics"),
+                                      self.tr("Metrics saved to %s") % path)
+
+    def closeEvent(self, event):
+        self.timer.stop()
@@ -6,23 +6,22 @@
 # License: GPL v3 or later.
 
 
-from WeHack import async
+import os
 from PyQt4 import QtCore, QtGui
-from weibo import APIError
 from Tweet import TweetItem, UserItem, TweetUnderCommentModel, TweetRetweetModel
 from Notify import Notify
-from TweetUtils import tweetLength
+from TweetUtils import TweetLengthCounter
 from NewpostWindow_ui import Ui_NewPostWindow
-from FaceWindow import FaceWindow
 from TweetListWidget import TweetListWidget, SingleTweetWidget
+from WMentionIndex import WMentionIndex
+from WConnectivity import WConnectivity
+from WOutbox import WOutbox
 import const
 
 
 class NewpostWindow(QtGui.QDialog, Ui_NewPostWindow):
     image = None
-    apiError = QtCore.pyqtSignal(str)
     commonError = QtCore.pyqtSignal(str, str)
-    sendSuccessful = QtCore.pyqtSignal()
     userClicked = QtCore.pyqtSignal(UserItem, bool)
     tagClicked = QtCore.pyqtSignal(str, bool)
 
@@ -32,13 +31,13 @@ class NewpostWindow(QtGui.QDialog, Ui_NewPostWindow):
         self.client = const.client
         self.tweet = tweet
         self.action = action
+        self.lengthCounter = TweetLengthCounter()
         self.setupUi(self)
         self.textEdit.callback = self.mentions_suggest
+        self.textEdit.localCallback = self.mentions_local_suggest
         self.textEdit.mention_flag = "@"
         self.notify = Notify(timeout=1)
         self._sent = False
-        self.apiError.connect(self.showException)
-        self.sendSuccessful.connect(self.sent)
         self.commonError.connect(self.showErrorMessage)
 
     def setupUi(self, widget):
@@ -111,19 +110,35 @@ class NewpostWindow(QtGui.QDialog, Ui_NewPostWindow):
         self.splitter.addWidget(self.commentsWidget)
         self.splitter.addWidget(self.textEdit)
 
-    def mentions_suggest(self, text):
-        ret_users = []
+    def _mention_word(self, text):
         try:
             word = text.split(' ')[-1]
             word = word.split('@')[-1]
         except IndexError:
+            return ""
+        return word.strip()
+
+    def mentions_local_suggest(self, text):
+        word = self._mention_word(text)
+        if not word:
             return []
-        if not word.strip():
+        return ["@" + name for name in WMentionIndex().search(word)]
+
+    def mentions_suggest(self, text):
+        word = self._mention_word(text)
+        if not word:
             return []
-        users = self.client.search.suggestions.at_users.get(q=word, type=0)
-        for user in users:
-            ret_users.append("@" + user['nickname'])
-        return ret_users
+
+        index = WMentionIndex()
+        names = index.suggestions(word)
+        if names is None and not WConnectivity().online():
+            # The local suggestions are all we have.
+            return []
+        elif names is None:
+            users = self.client.search.suggestions.at_users.get(q=word, type=0)
+            names = [user['nickname'] for user in users]
+            index.setSuggestions(word, names)
+        return ["@" + name for name in names]
 
     def sent(self):
         self._sent = True
@@ -143,71 +158,49 @@ class NewpostWindow(QtGui.QDialog, Ui_NewPostWindow):
             # If action is in other types, it must be a mistake.
             assert False
 
-    @async
+    def _queued(self):
+        # The outbox tells users when it's sent.
+        if not WConnectivity().online():
+            self.notify.showMessage(self.tr("WeCase"),
+                                    self.tr("You are offline, it will be sent later."))
+        self.sent()
+
     def retweet(self):
         text = str(self.textEdit.toPlainText())
         comment = int(self.chk_comment.isChecked())
         comment_ori = int(self.chk_comment_original.isChecked())
-        try:
-            self.tweet.retweet(text, comment, comment_ori)
-        except APIError as e:
-            self.apiError.emit(str(e))
-            return
-        self.notify.showMessage(self.tr("WeCase"), self.tr("Retweet Success!"))
-        self.sendSuccessful.emit()
+        self.tweet.retweet(text, comment, comment_ori)
+        self._queued()
 
-    @async
     def comment(self):
         text = str(self.textEdit.toPlainText())
         retweet = int(self.chk_repost.isChecked())
         comment_ori = int(self.chk_comment_original.isChecked())
-        try:
-            self.tweet.comment(text, comment_ori, retweet)
-        except APIError as e:
-            self.apiError.emit(str(e))
-            return
-        self.notify.showMessage(self.tr("WeCase"), self.tr("Comment Success!"))
-        self.sendSuccessful.emit()
+        self.tweet.comment(text, comment_ori, retweet)
+        self._queued()
 
-    @async
     def reply(self):
         text = str(self.textEdit.toPlainText())
         comment_ori = int(self.chk_comment_original.isChecked())
         retweet = int(self.chk_repost.isChecked())
-        try:
-            self.tweet.reply(text, comment_ori, retweet)
-        except APIError as e:
-            self.apiError.emit(str(e))
-            return
-        self.notify.showMessage(self.tr("WeCase"), self.tr("Reply Success!"))
-        self.sendSuccessful.emit()
+        self.tweet.reply(text, comment_ori, retweet)
+        self._queued()
 
-    @async
     def new(self):
         text = str(self.textEdit.toPlainText())
-
-        try:
-            if self.image:
-                try:
-                    self.client.statuses.upload.post(status=text,
-                                                     pic=open(self.image, "rb"))
-                except FileNotFoundError:
-                    self.commonError.emit(self.tr("File not found"),
-                                          self.tr("No such file: %s")
-                                          % self.image)
-                    self.addImage()  # In fact, remove image...
-                    return
-            else:
-                self.client.statuses.update.post(status=text)
-
-            self.notify.showMessage(self.tr("WeCase"),
-                                    self.tr("Tweet Success!"))
-            self.sendSuccessful.emit()
-        except APIError as e:
-            self.apiError.emit(str(e))
-            return
-
+        image = self.image
+
+        if image:
+            if not os.path.exists(image):
+                self.commonError.emit(self.tr("File not found"),
+                                      self.tr("No such file: %s") % image)
+                self.addImage()  # In fact, remove image...
+                return
+            WOutbox().add("statuses/upload", {"status": text, "pic": image})
+        else:
+            WOutbox().add("statuses/update", {"status": text})
         self.image = None
+        self._queued()
 
     def addImage(self):
         ACCEPT_TYPE = self.tr("Images") + "(*.png *.jpg *.bmp *.gif)"
@@ -224,18 +217,11 @@ class NewpostWindow(QtGui.QDialog, Ui_NewPostWindow):
                 self.pushButton_picture.setText(self.tr("Remove the picture"))
         self.textEdit.setFocus()
 
-    def showException(self, e):
-        if "Text too long" in e:
-            QtGui.QMessageBox.warning(None, self.tr("Text too long!"),
-                                      self.tr("Please remove some text."))
-        else:
-            QtGui.QMessageBox.warning(None, self.tr("Unknown error!"), e)
-        self.pushButton_send.setEnabled(True)
-
     def showErrorMessage(self, title, text):
         QtGui.QMessageBox.warning(self, title, text)
 
     def showSmiley(self):
+        from FaceWindow import FaceWindow
         wecase_smiley = FaceWindow()
         if wecase_smiley.exec_():
             self.textEdit.textCursor().insertText(wecase_smiley.faceName)
@@ -247,7 +233,7 @@ class NewpostWindow(QtGui.QDialog, Ui_NewPostWindow):
         and label will show red chars."""
 
         text = self.textEdit.toPlainText()
-        numLens = 140 - tweetLength(text)
+        numLens = 140 - self.lengthCounter.update(text)
         if numLens == 140 and (not self.action == "retweet"):
             # you can not send empty tweet, except retweet
             self.pushButton_send.setEnabled(False)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This file implemented OutboxWindow, to show the statuses and
+#           comments being sent, cancel them, and retry the failed ones
+#           and the ones which may not be sent.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import time
+from PyQt4 import QtCore, QtGui
+import outbox
+from WOutbox import WOutbox
+
+
+class OutboxWindow(QtGui.QDialog):
+
+    # Emitted by the outbox in its thread.
+    changed = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(OutboxWindow, self).__init__(parent)
+        self.setAttribute(QtCore.Qt.WA_QuitOnClose, False)
+        self.setupUi()
+        self.changed.connect(self.refresh)
+        self._outboxListener = lambda item: self.changed.emit()
+        WOutbox().addListener(self._outboxListener)
+        self.refresh()
+
+    def setupUi(self):
+        self.setWindowTitle(self.tr("Outbox"))
+        self.resize(560, 360)
+        layout = QtGui.QVBoxLayout(self)
+
+        self.treeWidget = QtGui.QTreeWidget(self)
+        self.treeWidget.setRootIsDecorated(False)
+        self.treeWidget.setHeaderLabels([self.tr("State"), self.tr("Time"),
+                                         self.tr("Text"), self.tr("Error")])
+        self.treeWidget.setColumnWidth(2, 240)
+        self.treeWidget.itemSelectionChanged.connect(self.updateButtons)
+        layout.addWidget(self.treeWidget)
+
+        buttonLayout = QtGui.QHBoxLayout()
+        buttonLayout.addStretch()
+        self.cancelButton = QtGui.QPushButton(self.tr("&Cancel"), self)
+        self.cancelButton.clicked.connect(self.cancel)
+        buttonLayout.addWidget(self.cancelButton)
+        self.retryButton = QtGui.QPushButton(self.tr("&Retry"), self)
+        self.retryButton.clicked.connect(self.retry)
+        buttonLayout.addWidget(self.retryButton)
+        self.removeButton = QtGui.QPushButton(self.tr("R&emove"), self)
+        self.removeButton.clicked.connect(self.remove)
+        buttonLayout.addWidget(self.removeButton)
+        layout.addLayout(buttonLayout)
+
+    def _state(self, item):
+        progress = WOutbox().progress(item["id"])
+        if item["state"] == outbox.SENDING and progress:
+            sent, total = progress
+            return self.tr("Sending %d%%") % (sent * 100 // total)
+        return {outbox.PENDING: self.tr("Pending"),
+                outbox.SENDING: self.tr("Sending"),
+                outbox.SENT: self.tr("Sent"),
+                outbox.FAILED: self.tr("Failed"),
+                outbox.UNKNOWN: self.tr("Maybe sent")}[item["state"]]
+
+    def refresh(self):
+        selected = self.selectedItem()
+        self.treeWidget.clear()
+        for item in WOutbox().items():
+            created = time.strftime("%m-%d %H:%M", time.localtime(item["created"]))
+            row = QtGui.QTreeWidgetItem([self._state(item), created,
+                                         outbox.summary(item), item["error"] or ""])
+            row.setData(0, QtCore.Qt.UserRole, item)
+            self.treeWidget.addTopLevelItem(row)
+            if selected and selected["id"] == item["id"]:
+                row.setSelected(True)
+        self.updateButtons()
+
+    def selectedItem(self):
+        rows = self.treeWidget.selectedItems()
+        if not rows:
+            return None
+        return rows[0].data(0, QtCore.Qt.UserRole)
+
+    def updateButtons(self):
+        item = self.selectedItem()
+        self.cancelButton.setEnabled(bool(item) and item["state"] in (outbox.PENDING,
+                                                                      outbox.SENDING))
+        self.retryButton.setEnabled(bool(item) and item["state"] in (outbox.FAILED,
+                                                                     outbox.UNKNOWN))
+        self.removeButton.setEnabled(bool(item) and item["state"] != outbox.SENDING)
+
+    def retry(self):
+        item = self.selectedItem()
+        if item:
+            WOutbox().retry(item["id"])
+
+    def cancel(self):
+        item = self.selectedItem()
+        if item:
+            WOutbox().cancel(item["id"])
+
+    def remove(self):
+        item = self.selectedItem()
+        if not item:
+            return
+        if item["state"] == outbox.PENDING:
+            choice = QtGui.QMessageBox.question(
+                self, self.tr("Remove?"), self.tr("It hasn't been sent yet."),
+                QtGui.QMessageBox.Yes, QtGui.QMessageBox.No)
+            if choice == QtGui.QMessageBox.No:
+                return
+        WOutbox().remove(item["id"])
+        self.refresh()
+
+    def closeEvent(self, event):
+        WOutbox().removeListener(self._outboxListener)
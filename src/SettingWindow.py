@@ -65,12 +65,12 @@ class WeSettingsWindow(QtGui.QDialog, Ui_SettingWindow):
         return stringList
 
     def saveConfig(self):
-        self.config.notify_interval = str(self.intervalSlider.value())
-        self.config.notify_timeout = str(self.timeoutSlider.value())
-        self.config.remind_comments = str(self.commentsChk.isChecked())
-        self.config.remind_mentions = str(self.mentionsChk.isChecked())
-        self.config.usersBlacklist = str(self._getListWidgetItemsStringList(self.usersBlackListWidget))
-        self.config.tweetsKeywordsBlacklist = str(self._getListWidgetItemsStringList(self.tweetsKeywordsBlacklistWidget))
+        self.config.notify_interval = self.intervalSlider.value()
+        self.config.notify_timeout = self.timeoutSlider.value()
+        self.config.remind_comments = self.commentsChk.isChecked()
+        self.config.remind_mentions = self.mentionsChk.isChecked()
+        self.config.usersBlacklist = self._getListWidgetItemsStringList(self.usersBlackListWidget)
+        self.config.tweetsKeywordsBlacklist = self._getListWidgetItemsStringList(self.tweetsKeywordsBlacklistWidget)
         self.config.save()
 
     def addBlackUser(self):
@@ -7,22 +7,39 @@
 
 from PyQt4 import QtCore
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from http.client import BadStatusLine
 from urllib.error import URLError
 from TweetUtils import get_mid
 from WTimeParser import WTimeParser as time_parser
 from WeHack import async, UNUSED
-from TweetUtils import tweetLength
+from TweetUtils import tweetTruncate
+from WMentionIndex import WMentionIndex
+from WMetrics import metrics
+from WConnectivity import WConnectivity
+from connectivity import NETWORK_ERRORS
+from WStatusStore import WStatusStore
+from WIdentityMap import WIdentityMap
+from WOutbox import WOutbox
+from identitymap import kind
+from statusstore import PAGE_SIZE
+from WeRuntimeInfo import WeRuntimeInfo
 import const
 import logging
 
 
 class TweetSimpleModel(QtCore.QAbstractListModel):
     rowInserted = QtCore.pyqtSignal(int)
+    # Emitted with the first row and the items inserted there. The rows
+    # change in the worker threads, they may be gone already when a view
+    # gets rowsInserted, but the items are still here.
+    itemsInserted = QtCore.pyqtSignal(int, list)
 
     def __init__(self, parent=None):
         super(TweetSimpleModel, self).__init__(parent)
         self._tweets = []
+        # {id: row}, to find a status without walking the rows.
+        self._rows = {}
         self._tweetKeywordBlacklist = []
         self._usersBlackList = []
 
@@ -35,6 +52,7 @@ class TweetSimpleModel(QtCore.QAbstractListModel):
 
     def clear(self):
         self._tweets = []
+        self._rows = {}
 
     def data(self, index, role):
         return self._tweets[index.row()].data(role)
@@ -42,10 +60,40 @@ class TweetSimpleModel(QtCore.QAbstractListModel):
     def get_item(self, row):
         return self._tweets[row]
 
+    def row_of(self, id):
+        """Return the row of the status, or None if it isn't here."""
+        return self._rows.get(id)
+
+    def get_item_by_id(self, id):
+        row = self._rows.get(id)
+        if row is None:
+            return None
+        return self._tweets[row]
+
+    def update_item(self, status):
+        """Replace the data of the row with the same id in place.
+        Return False if the status isn't here."""
+        row = self._rows.get(status.get("id"))
+        if row is None:
+            return False
+        self._tweets[row]._data = status
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+        return True
+
+    def _reindex(self, start):
+        # The rows after start have moved.
+        for row in range(start, len(self._tweets)):
+            id = self._tweets[row].id
+            if id:
+                self._rows[id] = row
+
     def insertRow(self, row, item):
         self.beginInsertRows(QtCore.QModelIndex(), row, row)
         self._tweets.insert(row, item)
+        self._reindex(row)
         self.rowInserted.emit(row)
+        self.itemsInserted.emit(row, [item])
         self.endInsertRows()
 
     def insertRows(self, row, items):
@@ -53,8 +101,25 @@ class TweetSimpleModel(QtCore.QAbstractListModel):
         for item in items:
             self._tweets.insert(row, TweetItem(item))
             self.rowInserted.emit(row)
+        self._reindex(row)
+        self.itemsInserted.emit(row, self._tweets[row:row + len(items)])
         self.endInsertRows()
 
+    def removeRows(self, row, count, parent=QtCore.QModelIndex()):
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row + count - 1)
+        for item in self._tweets[row:row + count]:
+            self._rows.pop(item.id, None)
+        del self._tweets[row:row + count]
+        self._reindex(row)
+        self.endRemoveRows()
+        return True
+
+    def removeItem(self, id):
+        """Remove the row of the status, if it's here."""
+        row = self._rows.get(id)
+        if row is not None:
+            self.removeRows(row, 1)
+
     def rowCount(self, parent=QtCore.QModelIndex()):
         return len(self._tweets)
 
@@ -63,11 +128,31 @@ class TweetTimelineBaseModel(TweetSimpleModel):
 
     timelineLoaded = QtCore.pyqtSignal()
     nothingLoaded = QtCore.pyqtSignal()
+    # Emitted with the id of the anchor after waking up.
+    woken = QtCore.pyqtSignal(int)
+
+    # Whether timeline_gap() is implemented.
+    gaps = False
+    # Fill a gap with this many pages at most, the rest is left to
+    # the next time. After the first page, they are fetched in parallel.
+    GAP_PAGES = 5
+    GAP_WORKERS = 4
+    # Keep at most WINDOW rows. When there are more, EVICT rows are
+    # removed from the other end at a time. They are in the local store,
+    # and restored from it when we scroll back.
+    WINDOW = 200
+    EVICT = 50
 
     def __init__(self, timeline=None, parent=None):
         super(TweetTimelineBaseModel, self).__init__(parent)
         self.timeline = timeline
         self.lock = False
+        # The newest id evicted from the top, and the oldest one
+        # evicted from the bottom.
+        self._evictedNewer = None
+        self._evictedOlder = None
+        # (newest id, oldest id, anchor id) when hibernating.
+        self._hibernated = None
 
     def timeline_get(self):
         raise NotImplementedError
@@ -78,6 +163,10 @@ class TweetTimelineBaseModel(TweetSimpleModel):
     def timeline_old(self):
         raise NotImplementedError
 
+    def timeline_gap(self, since_id, max_id, page=1):
+        """Return a page of the statuses with since_id < id <= max_id."""
+        raise NotImplementedError
+
     def first_id(self):
         assert self._tweets
         return int(self._tweets[0].id)
@@ -86,6 +175,11 @@ class TweetTimelineBaseModel(TweetSimpleModel):
         assert self._tweets
         return int(self._tweets[-1].id)
 
+    def cacheKey(self):
+        """The name of the timeline in the local store."""
+        name = getattr(self.timeline, "_name", type(self).__name__)
+        return "%s/%s" % (WeRuntimeInfo().get("uid"), name)
+
     def _load_next_page(self):
         self.page += 1
         timeline = lambda: self.timeline_get(page=self.page)
@@ -110,6 +204,20 @@ class TweetTimelineBaseModel(TweetSimpleModel):
             return True
         return False
 
+    def merge(self, statuses):
+        """Update the statuses we have in place, return the others
+        without duplicates."""
+
+        ids = set()
+        unseen = []
+        for status in statuses:
+            id = status.get("id")
+            if self.update_item(status) or id in ids:
+                continue
+            ids.add(id)
+            unseen.append(status)
+        return unseen
+
     def filter(self, items):
         new_items = []
         for item in items:
@@ -119,48 +227,290 @@ class TweetTimelineBaseModel(TweetSimpleModel):
                 new_items.append(item)
         return new_items
 
-    @async
-    def _common_get(self, timeline_func, pos):
+    def stored(self, **kwargs):
+        """Return the statuses of this timeline in the local store, the
+        arguments are the ones of StatusStore.statuses()."""
+        return WStatusStore().statuses(self.cacheKey(), **kwargs)
+
+    def _cached(self, timeline_func):
+        """Return what timeline_func returns, from the local store."""
+        if timeline_func == self.timeline_new:
+            since_id = self.first_id() if self._tweets else None
+            return self.stored(since_id=since_id)[::-1]
+        elif timeline_func == self.timeline_old and self._tweets:
+            return self.stored(max_id=self.last_id() - 1)
+        else:
+            page = getattr(self, "page", 1) or 1
+            return self.stored(offset=(page - 1) * PAGE_SIZE)
+
+    def _fetch(self, timeline_func, endpoint, cached=None):
+        """Call timeline_func until success, or read the local store
+        (by cached() if it's given) if we are offline."""
+
         def tprint(*args):
             import threading
             logging.debug(threading.current_thread().name + " " + "".join(*args))
 
-        if self.lock:
-            return
-        self.lock = True
-
-        while 1:
-            # try until success
+        connectivity = WConnectivity()
+        while connectivity.online():
             try:
                 # timeline is just a pointer to the method.
                 # We are in another thread now, call it. UI won't freeze.
-                timeline = timeline_func()
-                break
+                with metrics.timer(endpoint):
+                    timeline = timeline_func()
             except (BadStatusLine, URLError, OSError):
                 # OSError: CRC Check Failed...
                 tprint("Retrying...")
+                metrics.counter(endpoint + ".retries").inc()
+                connectivity.reportFailure()
                 continue
+            connectivity.reportSuccess()
+            WStatusStore().addStatuses(self.cacheKey(), timeline)
+            # The same statuses in other tabs are updated, too.
+            WIdentityMap().addStatuses(timeline)
+            return timeline
+
+        metrics.counter(endpoint + ".offline").inc()
+        if cached:
+            return cached()
+        return self._cached(timeline_func)
+
+    def _fetchGap(self, gap, endpoint):
+        """Return the statuses in the gap, and whether there are more."""
+
+        def page(number):
+            return self._fetch(
+                lambda: self.timeline_gap(gap.since_id, gap.max_id, number),
+                endpoint,
+                lambda: self.stored(max_id=gap.max_id, since_id=gap.since_id,
+                                    offset=(number - 1) * PAGE_SIZE))
+
+        # The window is fixed by max_id, so the pages don't move when
+        # new statuses come, and can be fetched at the same time.
+        pages = [page(1)]
+        full = len(pages[0]) >= PAGE_SIZE
+        if full:
+            with ThreadPoolExecutor(self.GAP_WORKERS) as executor:
+                pages += executor.map(page, range(2, self.GAP_PAGES + 1))
+
+        statuses = []
+        for result in pages:
+            statuses += result
+            full = len(result) >= PAGE_SIZE
+            if not full:
+                break
+        return statuses, full
+
+    def _fillGap(self, gap, endpoint):
+        gap.filling.emit(True)
+        statuses, more = self._fetchGap(gap, endpoint)
+
+        ids = set(status["id"] for status in statuses)
+        # The parallel pages may overlap if the statuses are deleted.
+        timeline = self.filter(self.merge(
+            [status for status in statuses if gap.since_id < status["id"] <= gap.max_id]))
+        WMentionIndex().addStatuses(timeline)
+
+        row = self._tweets.index(gap)
+        if timeline:
+            # Insert the oldest first, each one above the last one.
+            self.insertRows(row, timeline[::-1])
+        if more and ids:
+            gap.max_id = min(ids) - 1
+        else:
+            self.removeRows(row + len(timeline), 1)
+        gap.filling.emit(False)
 
-        # Timeline is not blank, but after filter(), timeline is blank.
-        while timeline and (not self.filter(timeline)):
-            # All tweets in this page are removed.
-            # Load next page.
+    @async
+    def fillGap(self, gap):
+        if self.lock:
+            return
+        self.lock = True
+        endpoint = "api." + getattr(self.timeline, "_name", type(self).__name__)
+        try:
+            self._fillGap(gap, endpoint)
+        finally:
+            self.lock = False
+
+    @async
+    def _common_get(self, timeline_func, pos):
+        if self.lock:
+            return
+        self.lock = True
+        endpoint = "api." + getattr(self.timeline, "_name", type(self).__name__)
+        # Keep the gauge, the registry may be toggled while loading.
+        loading = metrics.gauge("api.loading")
+        loading.inc()
+        try:
             if timeline_func == self.timeline_new:
-                # We are fetching new tweet, do nothing.
+                # The new statuses go to the top, bring the evicted
+                # ones back first.
+                while self._evictedNewer:
+                    self._restoreNewer()
+
+            timeline = self.merge(self._fetch(timeline_func, endpoint))
+
+            # A full page of new statuses, and there may be more between
+            # them and ours.
+            gap = None
+            if (timeline_func == self.timeline_new and self.gaps and
+                    self._tweets and len(timeline) >= PAGE_SIZE):
+                gap = TweetGapItem(self.first_id(),
+                                   min(status["id"] for status in timeline) - 1)
+
+            # Timeline is not blank, but after filter(), timeline is blank.
+            while timeline and (not self.filter(timeline)):
+                # All tweets in this page are removed.
+                # Load next page.
+                if timeline_func == self.timeline_new:
+                    # We are fetching new tweet, do nothing.
+                    break
+
+                # We are not fetch new tweets.
+                timeline = self.merge(self._fetch(self._load_next_page(), endpoint))
+
+            timeline = self.filter(timeline)
+            WMentionIndex().addStatuses(timeline)
+            if not timeline:
+                self.nothingLoaded.emit()
+
+            if pos == -1:
+                self.appendRows(timeline)
+            else:
+                self.insertRows(pos, timeline)
+
+            if gap:
+                self.insertRow(pos + len(timeline), gap)
+                self._fillGap(gap, endpoint)
+            self._evict(top=(pos == -1))
+        finally:
+            loading.dec()
+            self.lock = False
+
+    def _evict(self, top):
+        """Evict the rows at the top or the bottom, if we have too many.
+        A gap is evicted with them, the statuses in it are lost."""
+
+        while len(self._tweets) > self.WINDOW:
+            if top:
+                rows = self._tweets[:self.EVICT]
+            else:
+                rows = self._tweets[-self.EVICT:]
+            ids = [item.id for item in rows if item.type != TweetItem.GAP]
+            if ids and top:
+                self._evictedNewer = max(ids + [self._evictedNewer or 0])
+            elif ids:
+                self._evictedOlder = min(ids + [self._evictedOlder or ids[0]])
+            self.removeRows(0 if top else len(self._tweets) - len(rows), len(rows))
+            metrics.counter("model.evicted").inc(len(rows))
+
+    def hasEvictedNewer(self):
+        return bool(self._evictedNewer)
+
+    def _restoreNewer(self):
+        since_id = self.first_id()
+        while self._evictedNewer:
+            statuses = self.stored(max_id=self._evictedNewer, since_id=since_id,
+                                   count=self.EVICT, oldest_first=True)
+            if not statuses or statuses[-1]["id"] >= self._evictedNewer:
+                self._evictedNewer = None
+            timeline = self.filter(self.merge(statuses))
+            if timeline:
+                # Insert the oldest first, each one above the last one.
+                self.insertRows(0, timeline)
+                break
+            elif statuses:
+                # All of them are in the blacklist, try the next ones.
+                since_id = statuses[-1]["id"]
+        self._evict(top=False)
+
+    def _restoreOlder(self):
+        max_id = self.last_id() - 1
+        while self._evictedOlder:
+            statuses = self.stored(max_id=max_id, since_id=self._evictedOlder - 1,
+                                   count=self.EVICT)
+            if not statuses or statuses[-1]["id"] <= self._evictedOlder:
+                self._evictedOlder = None
+            timeline = self.filter(self.merge(statuses))
+            if timeline:
+                self.appendRows(timeline)
                 break
+            elif statuses:
+                max_id = statuses[-1]["id"] - 1
+        else:
+            self.nothingLoaded.emit()
+        self._evict(top=True)
+
+    @async
+    def restoreNewer(self):
+        """Restore the rows evicted from the top."""
+        if self.lock or not self._evictedNewer:
+            return
+        self.lock = True
+        try:
+            self._restoreNewer()
+        finally:
+            self.lock = False
+
+    @async
+    def restoreOlder(self):
+        """Restore the rows evicted from the bottom."""
+        if self.lock or not self._evictedOlder:
+            return
+        self.lock = True
+        try:
+            self._restoreOlder()
+        finally:
+            self.lock = False
 
-            # We are not fetch new tweets.
-            timeline = self._load_next_page()()
+    def hibernate(self, anchor=None):
+        """Remove all rows, they are in the local store. We'll come back
+        to the same range of statuses, and the anchor, when waking up.
+        Return False if we can't hibernate now."""
 
-        timeline = self.filter(timeline)
-        if not timeline:
-            self.nothingLoaded.emit()
+        if self.lock or self._hibernated or not self._tweets:
+            return False
+        ids = [item.id for item in self._tweets if item.type != TweetItem.GAP]
+        if not ids:
+            return False
+        newest = max(ids + [self._evictedNewer or 0])
+        oldest = min(ids + [self._evictedOlder or ids[-1]])
+        self._hibernated = (newest, oldest, anchor or ids[0])
+        self._evictedNewer = None
+        self._evictedOlder = None
+        self.removeRows(0, len(self._tweets))
+        return True
+
+    def hibernated(self):
+        return self._hibernated is not None
 
-        if pos == -1:
+    @async
+    def wake(self):
+        if self.lock or not self._hibernated:
+            return
+        self.lock = True
+        try:
+            newest, oldest, anchor = self._hibernated
+            self._hibernated = None
+            # Some rows above the anchor, and a window below it.
+            newer = self.stored(max_id=newest, since_id=anchor,
+                                count=self.EVICT, oldest_first=True)
+            older = self.stored(max_id=anchor, since_id=oldest - 1,
+                                count=self.WINDOW - self.EVICT)
+            if newer and newer[-1]["id"] < newest:
+                self._evictedNewer = newest
+            if older and older[-1]["id"] > oldest:
+                self._evictedOlder = oldest
+            timeline = self.filter(self.merge(newer[::-1] + older))
             self.appendRows(timeline)
+        finally:
+            self.lock = False
+
+        if timeline:
+            self.woken.emit(anchor)
         else:
-            self.insertRows(pos, timeline)
-        self.lock = False
+            # The store has been cleared.
+            self.load()
 
     def load(self):
         self.page = 1
@@ -173,12 +523,19 @@ class TweetTimelineBaseModel(TweetSimpleModel):
         self.timelineLoaded.emit()
 
     def next(self):
+        if self._hibernated:
+            return
+        elif self._evictedOlder:
+            self.restoreOlder()
+            return
         timeline = self.timeline_old
         self._common_get(timeline, -1)
 
 
 class TweetCommonModel(TweetTimelineBaseModel):
 
+    gaps = True
+
     def __init__(self, timeline=None, parent=None):
         super(TweetCommonModel, self).__init__(timeline, parent)
 
@@ -192,12 +549,17 @@ class TweetCommonModel(TweetTimelineBaseModel):
 
     def timeline_old(self):
         timeline = self.timeline.get(max_id=self.last_id()).statuses
-        timeline = timeline[1::]
+        return timeline
+
+    def timeline_gap(self, since_id, max_id, page=1):
+        timeline = self.timeline.get(since_id=since_id, max_id=max_id, page=page).statuses
         return timeline
 
 
 class TweetUserModel(TweetTimelineBaseModel):
 
+    gaps = True
+
     def __init__(self, timeline, uid, parent=None):
         super(TweetUserModel, self).__init__(timeline, parent)
         self._uid = uid
@@ -213,15 +575,24 @@ class TweetUserModel(TweetTimelineBaseModel):
 
     def timeline_old(self):
         timeline = self.timeline.get(max_id=self.last_id(), uid=self._uid).statuses
-        timeline = timeline[1::]
         return timeline
 
+    def timeline_gap(self, since_id, max_id, page=1):
+        timeline = self.timeline.get(since_id=since_id, max_id=max_id, page=page,
+                                     uid=self._uid).statuses
+        return timeline
+
+    def cacheKey(self):
+        return "%s/%s" % (super(TweetUserModel, self).cacheKey(), self._uid)
+
     def uid(self):
         return self._uid
 
 
 class TweetCommentModel(TweetTimelineBaseModel):
 
+    gaps = True
+
     def __init__(self, timeline=None, parent=None):
         super(TweetCommentModel, self).__init__(timeline, parent)
         self.page = 0
@@ -236,15 +607,23 @@ class TweetCommentModel(TweetTimelineBaseModel):
 
     def timeline_old(self):
         timeline = self.timeline.get(max_id=self.last_id()).comments
-        timeline = timeline[1::]
+        return timeline
+
+    def timeline_gap(self, since_id, max_id, page=1):
+        timeline = self.timeline.get(since_id=since_id, max_id=max_id, page=page).comments
         return timeline
 
 
 class TweetUnderCommentModel(TweetTimelineBaseModel):
+    gaps = True
+
     def __init__(self, timeline=None, id=0, parent=None):
         super(TweetUnderCommentModel, self).__init__(timeline, parent)
         self.id = id
 
+    def cacheKey(self):
+        return "%s/%s" % (super(TweetUnderCommentModel, self).cacheKey(), self.id)
+
     def timeline_get(self, page=1):
         timeline = self.timeline.get(id=self.id, page=page).comments
         return timeline
@@ -255,15 +634,24 @@ class TweetUnderCommentModel(TweetTimelineBaseModel):
 
     def timeline_old(self):
         timeline = self.timeline.get(id=self.id, max_id=self.last_id()).comments
-        timeline = timeline[1::]
+        return timeline
+
+    def timeline_gap(self, since_id, max_id, page=1):
+        timeline = self.timeline.get(id=self.id, since_id=since_id, max_id=max_id,
+                                     page=page).comments
         return timeline
 
 
 class TweetRetweetModel(TweetTimelineBaseModel):
+    gaps = True
+
     def __init__(self, timeline=None, id=0, parent=None):
         super(TweetRetweetModel, self).__init__(timeline, parent)
         self.id = id
 
+    def cacheKey(self):
+        return "%s/%s" % (super(TweetRetweetModel, self).cacheKey(), self.id)
+
     def timeline_get(self, page=1):
         timeline = self.timeline.get(id=self.id, page=page).reposts
         return timeline
@@ -274,7 +662,11 @@ class TweetRetweetModel(TweetTimelineBaseModel):
 
     def timeline_old(self):
         timeline = self.timeline.get(id=self.id, max_id=self.last_id()).reposts
-        timeline = timeline[1::]
+        return timeline
+
+    def timeline_gap(self, since_id, max_id, page=1):
+        timeline = self.timeline.get(id=self.id, since_id=since_id, max_id=max_id,
+                                     page=page).reposts
         return timeline
 
 
@@ -290,27 +682,74 @@ class TweetTopicModel(TweetTimelineBaseModel):
         return timeline
 
     def timeline_new(self):
+        # The search has no since_id, keep the ones newer than ours.
         timeline = self.timeline.get(q=self._topic, page=1).statuses[::-1]
-        for tweet in timeline:
-            if TweetItem(tweet).id == self.first_id():
-                return reversed(timeline[:timeline.index(tweet)])
-        return timeline
+        first_id = self.first_id()
+        return [status for status in timeline if status["id"] > first_id]
 
     def timeline_old(self):
         self.page += 1
         return self.timeline_get()
 
+    def cacheKey(self):
+        return "%s/%s" % (super(TweetTopicModel, self).cacheKey(), self._topic)
+
     def topic(self):
         return self._topic
 
 
+class TweetSearchModel(TweetTimelineBaseModel):
+    """The statuses in the local store which match the query. They are
+    not stored as a timeline, the rows evicted or hibernated are
+    searched again."""
+
+    def __init__(self, query, parent=None):
+        super(TweetSearchModel, self).__init__(None, parent)
+        self._query = query
+        self.page = 1
+
+    def stored(self, **kwargs):
+        return WStatusStore().search(self._query, **kwargs)
+
+    def _fetch(self, timeline_func, endpoint, cached=None):
+        # Nothing to send, it works offline.
+        with metrics.timer("store.search"):
+            return timeline_func()
+
+    def timeline_get(self, page=1):
+        return self.stored(offset=(page - 1) * PAGE_SIZE)
+
+    def timeline_new(self):
+        if not self._tweets:
+            return self.timeline_get()[::-1]
+        # All of them, there is no gap to fill later.
+        first_id = self.first_id()
+        timeline = []
+        max_id = None
+        while True:
+            statuses = self.stored(max_id=max_id, since_id=first_id)
+            timeline += statuses
+            if len(statuses) < PAGE_SIZE:
+                return timeline[::-1]
+            max_id = statuses[-1]["id"] - 1
+
+    def timeline_old(self):
+        return self.stored(max_id=self.last_id() - 1)
+
+    def cacheKey(self):
+        return "%s/%s" % (super(TweetSearchModel, self).cacheKey(), self._query)
+
+    def query(self):
+        return self._query
+
+
 class UserItem(QtCore.QObject):
     def __init__(self, item, parent=None):
         UNUSED(parent)
         # HACK: Ignore parent, can't create a child with different thread.
         # Where is the thread? I don't know...
         super(UserItem, self).__init__()
-        self._data = item
+        self._shared = WIdentityMap().get("user", item)
         self.client = const.client
 
         if self._data.get('id') and self._data.get('name'):
@@ -319,10 +758,29 @@ class UserItem(QtCore.QObject):
             self._loadCompleteInfo()
 
     def _loadCompleteInfo(self):
-        if self._data.get('id'):
-            self._data = self.client.users.show.get(uid=self._data.get('id'))
-        elif self._data.get('name'):
-            self._data = self.client.users.show.get(screen_name=self._data.get('name'))
+        connectivity = WConnectivity()
+        if connectivity.online():
+            try:
+                if self._data.get('id'):
+                    self._data = self.client.users.show.get(uid=self._data.get('id'))
+                elif self._data.get('name'):
+                    self._data = self.client.users.show.get(screen_name=self._data.get('name'))
+                return
+            except NETWORK_ERRORS:
+                connectivity.reportFailure()
+
+        # Offline, we may have seen the user.
+        user = WStatusStore().user(self._data.get('id'), self._data.get('name'))
+        if user:
+            self._data = user
+
+    @property
+    def _data(self):
+        return self._shared.data
+
+    @_data.setter
+    def _data(self, data):
+        self._shared.update(data)
 
     @QtCore.pyqtProperty(int, constant=True)
     def id(self):
@@ -355,12 +813,28 @@ class TweetItem(QtCore.QObject):
     TWEET = 0
     RETWEET = 1
     COMMENT = 2
+    GAP = 3
+    # Emitted when the status is updated, by any item of it.
+    changed = QtCore.pyqtSignal()
 
     def __init__(self, data={}, parent=None):
         super(TweetItem, self).__init__(parent)
-        self._data = data
+        # All items of the same status share the data.
+        self._shared = WIdentityMap().get(kind(data), data)
+        self._shared.addListener(self._sharedChanged)
         self.client = const.client
-        self.__isFavorite = False
+
+    @property
+    def _data(self):
+        return self._shared.data
+
+    @_data.setter
+    def _data(self, data):
+        self._shared.update(data)
+
+    def _sharedChanged(self, shared):
+        UNUSED(shared)
+        self.changed.emit()
 
     @QtCore.pyqtProperty(int, constant=True)
     def type(self):
@@ -468,16 +942,10 @@ class TweetItem(QtCore.QObject):
             return passedSeconds
 
     def isFavorite(self):
-        return self.__isFavorite
+        return bool(self._data.get('favorited'))
 
     def _cut_off(self, text):
-        cut_text = ""
-        for char in text:
-            if tweetLength(cut_text) >= 140:
-                break
-            else:
-                cut_text += char
-        return cut_text
+        return tweetTruncate(text, 140)
 
     def append_existing_replies(self, text=""):
         if self.original.original:
@@ -488,21 +956,24 @@ class TweetItem(QtCore.QObject):
             text += "//@%s:%s" % (self.author.name, self.text)
         return text
 
+    # reply(), retweet() and comment() only queue the requests in the
+    # outbox, they are sent in the background.
+
     def reply(self, text, comment_ori=False, retweet=False):
-        self.client.comments.reply.post(id=self.original.id, cid=self.id,
-                                        comment=text, comment_ori=int(comment_ori))
+        WOutbox().add("comments/reply", {"id": self.original.id, "cid": self.id,
+                                         "comment": text, "comment_ori": int(comment_ori)})
         if retweet:
             text = self.append_existing_replies(text)
             text = self._cut_off(text)
             self.original.retweet(text)
 
     def retweet(self, text, comment=False, comment_ori=False):
-        self.client.statuses.repost.post(id=self.id, status=text,
-                                         is_comment=int(comment + comment_ori * 2))
+        WOutbox().add("statuses/repost", {"id": self.id, "status": text,
+                                          "is_comment": int(comment + comment_ori * 2)})
 
     def comment(self, text, comment_ori=False, retweet=False):
-        self.client.comments.create.post(id=self.id, comment=text,
-                                         comment_ori=int(comment_ori))
+        WOutbox().add("comments/create", {"id": self.id, "comment": text,
+                                          "comment_ori": int(comment_ori)})
         if retweet:
             self.retweet(text)
 
@@ -517,20 +988,28 @@ class TweetItem(QtCore.QObject):
             raise TypeError
 
         if state:
-            assert(not self.__isFavorite)
+            assert(not self.isFavorite())
             self.client.favorites.create.post(id=self.id)
-            self.__isFavorite = True
         else:
-            assert(self.__isFavorite)
+            assert(self.isFavorite())
             self.client.favorites.destroy.post(id=self.id)
-            self.__isFavorite = False
+        self.setFavoriteForce(state)
 
     def setFavoriteForce(self, state):
-        self.__isFavorite = bool(state)
+        self._data = {'favorited': bool(state)}
 
     def refresh(self):
-        if self.type in [self.TWEET, self.RETWEET]:
-            self._data = self.client.statuses.show.get(id=self.id)
+        connectivity = WConnectivity()
+        if self.type in [self.TWEET, self.RETWEET] and connectivity.online():
+            try:
+                status = self.client.statuses.show.get(id=self.id)
+            except NETWORK_ERRORS:
+                # Keep the old one.
+                connectivity.reportFailure()
+                return
+            # Update the retweeted status and the author, too.
+            self._data = status
+            WIdentityMap().addStatuses([status])
 
     def withKeyword(self, keyword):
         if keyword in self.text:
@@ -543,3 +1022,18 @@ class TweetItem(QtCore.QObject):
             if self.withKeyword(keyword):
                 return True
         return False
+
+
+class TweetGapItem(TweetItem):
+    """A placeholder of the missing statuses with since_id < id <= max_id."""
+
+    filling = QtCore.pyqtSignal(bool)
+
+    def __init__(self, since_id, max_id, parent=None):
+        super(TweetGapItem, self).__init__({}, parent)
+        self.since_id = since_id
+        self.max_id = max_id
+
+    @QtCore.pyqtProperty(int, constant=True)
+    def type(self):
+        return self.GAP
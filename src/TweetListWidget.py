@@ -1,6 +1,5 @@
 import os
 import re
-from time import sleep
 import urllib.request
 from urllib.error import URLError, ContentTooShortError
 from http.client import BadStatusLine
@@ -18,6 +17,9 @@ from const import cache_path
 from WeRuntimeInfo import WeRuntimeInfo
 from WObjectCache import WObjectCache
 from Face import FaceModel
+from WMetrics import metrics
+from WActionQueue import WActionQueue
+from WStatusStore import WStatusStore
 
 
 class TweetListWidget(QtGui.QWidget):
@@ -30,6 +32,7 @@ class TweetListWidget(QtGui.QWidget):
         self.tweetListWidget = SimpleTweetListWidget(parent, without)
         self.tweetListWidget.userClicked.connect(self.userClicked)
         self.tweetListWidget.tagClicked.connect(self.tagClicked)
+        self.tweetListWidget.heightRemovedAbove.connect(self._keepPosition)
         self.setupUi()
 
     def setupUi(self):
@@ -45,12 +48,66 @@ class TweetListWidget(QtGui.QWidget):
 
     def setModel(self, model):
         self.tweetListWidget.setModel(model)
+        if hasattr(model, "woken"):
+            model.woken.connect(self._scrollToLater)
 
     def loadMore(self, value):
-        if value == self.scrollArea.verticalScrollBar().maximum():
+        model = self.tweetListWidget.model
+        if getattr(model, "hibernated", bool)():
+            return
+        elif value == self.scrollArea.verticalScrollBar().maximum():
             self.setBusy(True, SimpleTweetListWidget.BOTTOM)
-            model = self.tweetListWidget.model
             model.next()
+        elif value == 0 and getattr(model, "hasEvictedNewer", bool)():
+            model.restoreNewer()
+
+    def hibernate(self):
+        """Release the rows and their widgets, keep the first visible one."""
+        value = self.scrollArea.verticalScrollBar().value()
+        anchor = None
+        for widget in self.tweetListWidget.tweetWidgets():
+            if widget.y() + widget.height() > value:
+                anchor = widget.tweet.id
+                break
+        return self.model().hibernate(anchor)
+
+    def wake(self):
+        if self.model().hibernated():
+            self.model().wake()
+
+    def _scrollToLater(self, id):
+        # The widgets are not laid out yet.
+        QtCore.QTimer.singleShot(0, lambda: self.scrollTo(id))
+
+    def scrollTo(self, id):
+        row = self.model().row_of(id)
+        if row is not None:
+            widget = self.tweetListWidget.rowWidget(row)
+            self.scrollArea.verticalScrollBar().setValue(widget.y())
+
+    def visibleIds(self):
+        """Return the ids of the statuses we can see, with the ones
+        they retweeted or commented."""
+
+        top = self.scrollArea.verticalScrollBar().value()
+        bottom = top + self.scrollArea.viewport().height()
+        ids = []
+        for widget in self.tweetListWidget.tweetWidgets():
+            if widget.y() > bottom:
+                break
+            elif widget.isHidden() or widget.y() + widget.height() < top:
+                continue
+            tweet = widget.tweet
+            if tweet.type != TweetItem.COMMENT:
+                ids.append(tweet.id)
+            if tweet.original:
+                ids.append(tweet.original.id)
+        return ids
+
+    def _keepPosition(self, height):
+        # The rows above us are evicted, don't jump.
+        scrollBar = self.scrollArea.verticalScrollBar()
+        scrollBar.setValue(max(scrollBar.value() - height, 0))
 
     def moveToTop(self):
         self.scrollArea.verticalScrollBar().setSliderPosition(0)
@@ -72,6 +129,7 @@ class SimpleTweetListWidget(QtGui.QWidget):
     BOTTOM = 2
     userClicked = QtCore.pyqtSignal(UserItem, bool)
     tagClicked = QtCore.pyqtSignal(str, bool)
+    heightRemovedAbove = QtCore.pyqtSignal(int)
 
     def __init__(self, parent=None, without=[]):
         super(SimpleTweetListWidget, self).__init__(parent)
@@ -92,7 +150,8 @@ class SimpleTweetListWidget(QtGui.QWidget):
 
     def setModel(self, model):
         self.model = model
-        self.model.rowsInserted.connect(self._rowsInserted)
+        self.model.itemsInserted.connect(self._itemsInserted)
+        self.model.rowsRemoved.connect(self._rowsRemoved)
         self.model.nothingLoaded.connect(self._hideBusyIcon)
 
     #def search(self):
@@ -105,21 +164,45 @@ class SimpleTweetListWidget(QtGui.QWidget):
     #        self.layout.takeAt(0)
     #        widget.setParent(None)
 
+    def tweetWidgets(self):
+        for index in range(self.layout.count()):
+            widget = self.layout.itemAt(index).widget()
+            if isinstance(widget, SingleTweetWidget):
+                yield widget
+
     def _hideBusyIcon(self):
         self.setBusy(False, self.BOTTOM)
 
-    def _rowsInserted(self, parent, start, end):
-        UNUSED(parent)  # parent is useless
-
+    def _itemsInserted(self, start, items):
+        # Not the rows of the model, they may be evicted before we are here.
         self.setBusy(False, self.TOP)
         self.setBusy(False, self.BOTTOM)
-        for index in range(start, end + 1):
-            item = self.model.get_item(index)
-            widget = SingleTweetWidget(item, self.without, self)
-            widget.userClicked.connect(self.userClicked)
-            widget.tagClicked.connect(self.tagClicked)
+        for index, item in enumerate(items, start):
+            if item.type == TweetItem.GAP:
+                widget = TweetGapWidget(item, self.model, self)
+            else:
+                widget = SingleTweetWidget(item, self.without, self)
+                widget.userClicked.connect(self.userClicked)
+                widget.tagClicked.connect(self.tagClicked)
             self.layout.insertWidget(index, widget)
 
+    def rowWidget(self, row):
+        """Return the widget of the row in the model."""
+        offset = 1 if self.busy() == self.TOP else 0
+        return self.layout.itemAt(row + offset).widget()
+
+    def _rowsRemoved(self, parent, start, end):
+        UNUSED(parent)
+
+        height = 0
+        for index in range(end, start - 1, -1):
+            widget = self.rowWidget(index)
+            height += widget.height() + self.layout.spacing()
+            self.layout.removeWidget(widget)
+            widget.deleteLater()
+        if start == 0:
+            self.heightRemovedAbove.emit(height)
+
     def setupBusyIcon(self):
         busyWidget = QtGui.QWidget()
         layout = QtGui.QVBoxLayout(busyWidget)
@@ -173,6 +256,35 @@ class SimpleTweetListWidget(QtGui.QWidget):
             bottom_widget.setParent(None)
 
 
+class TweetGapWidget(QtGui.QFrame):
+    """The placeholder of a gap, click it to load the statuses."""
+
+    def __init__(self, gap, model, parent=None):
+        super(TweetGapWidget, self).__init__(parent)
+        self.gap = gap
+        self.model = model
+        self.setupUi()
+        self.gap.filling.connect(self.setBusy)
+
+    def setupUi(self):
+        self.layout = QtGui.QHBoxLayout(self)
+        self.button = QtGui.QPushButton(self)
+        self.button.setFlat(True)
+        self.button.clicked.connect(self.fill)
+        self.layout.addWidget(self.button)
+        self.setBusy(False)
+
+    def setBusy(self, busy):
+        self.button.setEnabled(not busy)
+        if busy:
+            self.button.setText(self.tr("Loading..."))
+        else:
+            self.button.setText(self.tr("Load the missing statuses"))
+
+    def fill(self):
+        self.model.fillGap(self.gap)
+
+
 class SingleTweetWidget(QtGui.QFrame):
 
     imageLoaded = QtCore.pyqtSignal()
@@ -188,9 +300,11 @@ class SingleTweetWidget(QtGui.QFrame):
         self.client = const.client
         self.without = without
         self.setObjectName("SingleTweetWidget")
-        self.setupUi()
+        with metrics.timer("widget.SingleTweetWidget"):
+            self.setupUi()
         self.download_lock = False
-        self.__favorite_queue = []
+        # Updated by any tab which shows the same status.
+        self.tweet.changed.connect(self._updateCounters)
 
     def setupUi(self):
         self.horizontalLayout = QtGui.QHBoxLayout(self)
@@ -351,6 +465,8 @@ class SingleTweetWidget(QtGui.QFrame):
         textLabel.tagClicked.connect(self._tagClicked)
         self.textLabel = textLabel  # Hack: save a reference
         originalItem = self.tweet.original
+        self.originalItem = originalItem
+        originalItem.changed.connect(self._updateCounters)
 
         text = QtCore.Qt.escape(originalItem.text)
         text = self._create_mentions(text)
@@ -375,12 +491,14 @@ class SingleTweetWidget(QtGui.QFrame):
                                              QtGui.QSizePolicy.Minimum)
         counterHorizontalLayout.addItem(horizontalSpacer)
         retweet = WIconLabel(widget)
+        self.originalRetweet = retweet
         retweet.setObjectName("retweet")
         retweet.setText(str(originalItem.retweets_count))
         retweet.setIcon(const.myself_path + "/icon/retweets.png")
         retweet.clicked.connect(self._original_retweet)
         counterHorizontalLayout.addWidget(retweet)
         comment = WIconLabel(widget)
+        self.originalComment = comment
         comment.setObjectName("comment")
         comment.setIcon(const.myself_path + "/icon/comments.png")
         comment.setText(str(originalItem.comments_count))
@@ -427,10 +545,16 @@ class SingleTweetWidget(QtGui.QFrame):
 
     def _createFavoriteLabel(self):
         favorite = WIconLabel(self)
-        favorite.setIcon(const.myself_path + "/icon/no_favorites.png")
+        self._setFavoriteIcon(favorite, self.tweet.isFavorite())
         favorite.clicked.connect(self._favorite)
         return favorite
 
+    def _setFavoriteIcon(self, favorite, state):
+        if state:
+            favorite.setIcon(const.icon("favorites.png"))
+        else:
+            favorite.setIcon(const.icon("no_favorites.png"))
+
     def _createRetweetLabel(self):
         retweet = WIconLabel(self)
         retweet.setObjectName("retweet")
@@ -495,44 +619,42 @@ class SingleTweetWidget(QtGui.QFrame):
     def commonProcessor(self, object):
         object()
 
-    def _favorite(self):
-        needWorker = False
+    def _updateCounters(self):
+        if hasattr(self, "retweet"):
+            self.retweet.setText(str(self.tweet.retweets_count))
+            self.comment.setText(str(self.tweet.comments_count))
+        if hasattr(self, "favorite") and WActionQueue().pending(self._favoriteKey()) is None:
+            # Don't undo the clicks which are not sent yet.
+            self._setFavoriteIcon(self.favorite, self.tweet.isFavorite())
+        if hasattr(self, "originalItem"):
+            self.originalRetweet.setText(str(self.originalItem.retweets_count))
+            self.originalComment.setText(str(self.originalItem.comments_count))
 
-        if not self.__favorite_queue:
-            state = not self.tweet.isFavorite()
-            needWorker = True
-        elif not self.__favorite_queue[-1]:
-            state = True
-        else:
-            state = False
+    def _favoriteKey(self):
+        return ("favorite", self.tweet.id)
 
-        self.__favorite_queue.append(state)
-        if state:
-            self.favorite.setIcon(const.icon("favorites.png"))
+    def _favorite(self):
+        queue = WActionQueue()
+        key = self._favoriteKey()
+        # What Sina will have after the request being sent.
+        confirmed = queue.sending(key, self.tweet.isFavorite())
+        state = not queue.pending(key, confirmed)
+        if state == confirmed:
+            # Clicked twice, nothing to send.
+            queue.cancel(key)
         else:
-            self.favorite.setIcon(const.icon("no_favorites.png"))
-
-        if needWorker:
-            self.__favorite_worker()
-
-    @async
-    def __favorite_worker(self):
-        while self.__favorite_queue:
-            state = self.__favorite_queue[0]
-
-            try:
-                self.tweet.setFavorite(state)
-                sleep(0.5)
-                self.__favorite_queue.pop(0)
-            except APIError as e:
-                if e.error_code == 20101:
-                    self.tweet.setFavoriteForce(True)
-                elif e.error_code == 20704:
-                    self.tweet.setFavoriteForce(True)
-                self._e = e
-                self.__favorite_queue = []
-                self.commonSignal.emit(lambda: self._handle_api_error(self._e))
-                return
+            queue.put(key, state, lambda: self.tweet.setFavorite(state),
+                      self._favoriteDone)
+        self._setFavoriteIcon(self.favorite, state)
+
+    def _favoriteDone(self, error):
+        # Called in the thread of WActionQueue.
+        if isinstance(error, APIError):
+            if error.error_code in (20101, 20704):
+                self.tweet.setFavoriteForce(True)
+            self.commonSignal.emit(lambda: self._handle_api_error(error))
+        elif error:
+            raise error
 
     def _retweet(self, tweet=None):
         if not tweet:
@@ -562,13 +684,37 @@ class SingleTweetWidget(QtGui.QFrame):
         if choice == QtGui.QMessageBox.No:
             return
 
-        try:
-            self.tweet.delete()
-        except APIError as e:
-            self._handle_api_error(e)
+        queue = WActionQueue()
+        queue.cancel(self._favoriteKey())
+        queue.put(("delete", self.tweet.type, self.tweet.id), None,
+                  self.tweet.delete, self._deleteDone)
         self.timer.stop()
         self.hide()
 
+    def _deleteDone(self, error):
+        # Called in the thread of WActionQueue.
+        if not error or getattr(error, "error_code", None) == 20101:
+            # Deleted, or deleted already. Or it comes back from the store.
+            WStatusStore().removeStatus(self.tweet.id)
+            self.commonSignal.emit(self._removeRow)
+            return
+
+        # Not deleted, show it again.
+        self.commonSignal.emit(self._deleteFailed)
+        if isinstance(error, APIError):
+            self.commonSignal.emit(lambda: self._handle_api_error(error))
+        else:
+            raise error
+
+    def _removeRow(self):
+        model = getattr(self.parentWidget(), "model", None)
+        if model:
+            model.removeItem(self.tweet.id)
+
+    def _deleteFailed(self):
+        self.show()
+        self._setup_timer()
+
     def _original_retweet(self):
         self._retweet(self.tweet.original)
 
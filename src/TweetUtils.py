@@ -8,10 +8,61 @@
 
 
 import re
+import time
 from math import ceil
+from bisect import bisect_left
 import const
 
 
+TWEET_MIN = 41
+TWEET_MAX = 140
+TWEET_URL_LEN = 20
+
+# please improve it if you can fully understand it
+URL_RE = re.compile(r"http://[a-zA-Z0-9]+(\.[a-zA-Z0-9]+)+([-A-Z0-9a-z_$.+!*()/\\\,:@&=?~#%]*)")
+SINA_URL_RE = re.compile(r"^(http://t.cn)")
+WEIBO_URL_RE = re.compile(r"^(http:\/\/)+(weibo.com|weibo.cn)")
+NON_ASCII_RE = re.compile(r"[^\x00-\x80]")
+
+
+def _weight(text):
+    """Sina counts a non-ASCII character as two half characters."""
+    return len(text) + len(NON_ASCII_RE.findall(text))
+
+
+def _urlLength(url):
+    """Return (counted length, weight removed from the text) of a URL."""
+    byteLen = _weight(url)
+    if SINA_URL_RE.search(url):
+        return 0, 0
+    elif WEIBO_URL_RE.search(url):
+        return (byteLen if byteLen <= TWEET_MIN else
+                (TWEET_URL_LEN
+                 if byteLen <= TWEET_MAX
+                 else byteLen - TWEET_MAX + TWEET_URL_LEN)), byteLen
+    else:
+        return (TWEET_URL_LEN if byteLen <= TWEET_MAX else
+                (byteLen - TWEET_MAX + TWEET_URL_LEN)), byteLen
+
+
+def _urls(text):
+    """
+    Return the total length of URLs in the text, and the text without
+    the URLs which have been counted.
+    """
+
+    total = 0
+    n = text
+    for match in URL_RE.finditer(text):
+        url = match.group()
+        length, weight = _urlLength(url)
+        if not weight:
+            continue
+        total += length
+        n = n.replace(url, "")
+    return total, n
+
+
 def tweetLength(text):
     """
     This function implemented a strings' length counter, the result of
@@ -21,43 +72,160 @@ def tweetLength(text):
     2
     """
 
-    def findall(regex, text):
-        """ re.findall() sometimes output unexpected results. This function
-        is a special version of findall() """
+    total = 0
+    n = text
+    if len(text) > 0:
+        total, n = _urls(text)
+    return ceil((total + _weight(n)) / 2)
 
-        results = []
 
-        re_obj = re.compile(regex)
-        for match in re_obj.finditer(text):
-            results.append(match.group())
-        return results
+# All the chars URL_RE can match, a URL never crosses any other char.
+URL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+                      "0123456789-_$.+!*()/\\,:@&=?~#%")
 
-    TWEET_MIN = 41
-    TWEET_MAX = 140
-    TWEET_URL_LEN = 20
 
-    total = 0
-    n = text
-    if len(text) > 0:
-        # please improve it if you can fully understand it
-        r = findall(r"http://[a-zA-Z0-9]+(\.[a-zA-Z0-9]+)+([-A-Z0-9a-z_$.+!*()/\\\,:@&=?~#%]*)", text)
-
-        for item in r:
-            url = item
-            byteLen = len(url) + len(re.findall(r"[^\x00-\x80]", url))
-
-            if re.search(r"^(http://t.cn)", url):
-                continue
-            elif re.search(r"^(http:\/\/)+(weibo.com|weibo.cn)", url):
-                total += (byteLen if byteLen <= TWEET_MIN else
-                          (TWEET_URL_LEN
-                           if byteLen <= TWEET_MAX
-                           else byteLen - TWEET_MAX + TWEET_URL_LEN))
-            else:
-                total += (TWEET_URL_LEN if byteLen <= TWEET_MAX else
-                          (byteLen - TWEET_MAX + TWEET_URL_LEN))
-            n = n.replace(url, "")
-    return ceil((total + len(n) + len(re.findall(r"[^\x00-\x80]", n))) / 2)
+def _matched(equal, limit):
+    """Return the largest n <= limit, that equal(0, n) is true,
+    where equal(a, b) and equal(b, c) means equal(a, c)."""
+    n = 0
+    step = 16
+    while n + step <= limit and equal(n, n + step):
+        n += step
+        step *= 2
+    while step > 1:
+        step //= 2
+        if n + step <= limit and equal(n, n + step):
+            n += step
+    return n
+
+
+class TweetLengthCounter():
+    """
+    An incremental version of tweetLength().
+
+    The weight of the text is updated by the changed part only. The URLs
+    are cached with their positions, and only the URLs around the changed
+    part are matched again.
+
+    >>> counter = TweetLengthCounter()
+    >>> counter.update("Test")
+    2
+    """
+
+    def __init__(self, text=""):
+        self._text = ""
+        self._weight = 0
+        self._length = 0
+        # [(start, end, url)]
+        self._urls = []
+        self._urlLength = 0
+        self._urlWeight = 0
+        self._exact = True
+        self.update(text)
+
+    def _diff(self, old, text):
+        """Return the length of the common prefix and suffix.
+
+        Compare slices of doubling sizes, then halving sizes, the chars
+        are compared by C code and only about twice in total."""
+
+        limit = min(len(old), len(text))
+        prefix = _matched(lambda start, end: old[start:end] == text[start:end], limit)
+        oldEnd = len(old)
+        end = len(text)
+        suffix = _matched(lambda start, stop: (old[oldEnd - stop:oldEnd - start] ==
+                                               text[end - stop:end - start]),
+                          limit - prefix)
+        return prefix, suffix
+
+    def _updateURLs(self, text, prefix, end, delta):
+        # Expand the changed part [prefix, end) to the chars which can be
+        # a part of a URL, the URLs outside are not changed.
+        low = prefix
+        while low > 0 and text[low - 1] in URL_CHARS:
+            low -= 1
+        high = end
+        while high < len(text) and text[high] in URL_CHARS:
+            high += 1
+
+        before = [url for url in self._urls if url[1] <= low]
+        after = [(start + delta, end + delta, url) for start, end, url in self._urls
+                 if start >= high - delta]
+        found = [(match.start(), match.end(), match.group())
+                 for match in URL_RE.finditer(text, low, high)]
+        changed = found or len(before) + len(after) != len(self._urls)
+        self._urls = before + found + after
+        if not changed:
+            # No URL around the changed part, nothing to count again.
+            return
+
+        self._urlLength = 0
+        self._urlWeight = 0
+        for start, end, url in self._urls:
+            length, weight = _urlLength(url)
+            self._urlLength += length
+            self._urlWeight += weight
+
+        # tweetLength() removes the URLs by str.replace(), which also
+        # removes a URL inside another one. It is rare, count the whole
+        # text in this case.
+        strings = set(url for start, end, url in self._urls)
+        self._exact = not any(a != b and a in b for a in strings for b in strings)
+
+    def update(self, text):
+        old = self._text
+        if text == old:
+            return self._length
+
+        prefix, suffix = self._diff(old, text)
+        self._weight -= _weight(old[prefix:len(old) - suffix])
+        self._weight += _weight(text[prefix:len(text) - suffix])
+        self._text = text
+        self._updateURLs(text, prefix, len(text) - suffix, len(text) - len(old))
+
+        if self._exact:
+            self._length = ceil((self._urlLength + self._weight - self._urlWeight) / 2)
+        else:
+            self._length = tweetLength(text)
+        return self._length
+
+    def length(self):
+        return self._length
+
+    def text(self):
+        return self._text
+
+
+def tweetTruncate(text, limit=TWEET_MAX):
+    """
+    Cut off the text at the first position where its length reaches
+    the limit. It is the same as appending the text char by char until
+    tweetLength() >= limit, but uses a bisect on prefix sums of the weight
+    before the first URL.
+
+    >>> tweetTruncate("Test", 1)
+    'T'
+    """
+
+    url_pos = text.find("http://")
+    if url_pos == -1:
+        url_pos = len(text)
+
+    # Without URLs, the length of a prefix is ceil(weight / 2), which
+    # is monotonic. So find the first prefix whose weight reaches the limit.
+    weights = [0]
+    for char in text[:url_pos]:
+        weights.append(weights[-1] + (2 if NON_ASCII_RE.match(char) else 1))
+    pos = bisect_left(weights, limit * 2 - 1)
+    if pos < len(weights):
+        return text[:pos]
+
+    # URLs are not monotonic (weibo.com is counted as 20 after 41),
+    # check the rest one by one.
+    for pos in range(url_pos + 1, len(text)):
+        if tweetLength(text[:pos]) >= limit:
+            return text[:pos]
+    return text
 
 
 def get_mid(mid):
@@ -109,11 +277,16 @@ def authorize(authorize_url, username, password):
     oauth2['passwd'] = password
     postdata = urllib.parse.urlencode(oauth2)
 
-    conn = http.client.HTTPSConnection('api.weibo.com')
-    sock = socket.create_connection((conn.host, conn.port), conn.timeout, conn.source_address)
-    conn.sock = ssl.wrap_socket(sock, conn.key_file, conn.cert_file, ssl_version=ssl.PROTOCOL_TLSv1)
+    url = urllib.parse.urlsplit(authorize_url)
+    if url.scheme == "http":
+        # A local stand-in of the API.
+        conn = http.client.HTTPConnection(url.netloc)
+    else:
+        conn = http.client.HTTPSConnection(url.netloc)
+        sock = socket.create_connection((conn.host, conn.port), conn.timeout, conn.source_address)
+        conn.sock = ssl.wrap_socket(sock, conn.key_file, conn.cert_file, ssl_version=ssl.PROTOCOL_TLSv1)
 
-    conn.request('POST', '/oauth2/authorize', postdata,
+    conn.request('POST', url.path, postdata,
                  {'Referer': authorize_url,
                   'Content-Type': 'application/x-www-form-urlencoded'})
 
@@ -126,3 +299,29 @@ def authorize(authorize_url, username, password):
     authorize_code = location.split('=')[1]
     conn.close()
     return authorize_code
+
+
+# Authorize again if the access token expires in a day.
+TOKEN_REFRESH_TIME = 24 * 60 * 60
+# The API errors of a token revoked before it expires, e.g. the
+# password is changed: used, expired, revoked, rejected, accessor
+# revoked, expired_token and invalid_access_token.
+TOKEN_ERRORS = (21314, 21315, 21316, 21317, 21319, 21327, 21332)
+
+
+def saved_token(tokens, username, now=None):
+    """
+    Return the saved access token of the user, if it can be used
+    without authorizing again, or None.
+
+    >>> saved_token({"WeCase": {"access_token": "t", "expires": 0, "uid": 1}}, "WeCase")
+    """
+
+    token = tokens.get(username)
+    if not token or not token.get("access_token"):
+        return None
+    if now is None:
+        now = time.time()
+    if token.get("expires", 0) - now < TOKEN_REFRESH_TIME:
+        return None
+    return token
@@ -1,5 +1,66 @@
+import re
+import random
 import unittest
-from TweetUtils import tweetLength, get_mid
+from math import ceil
+from TweetUtils import tweetLength, get_mid, TweetLengthCounter, tweetTruncate, \
+    saved_token, TOKEN_REFRESH_TIME
+
+
+def reference_tweetLength(text):
+    """The original implementation, kept to check the compatibility."""
+
+    def findall(regex, text):
+        results = []
+        re_obj = re.compile(regex)
+        for match in re_obj.finditer(text):
+            results.append(match.group())
+        return results
+
+    TWEET_MIN = 41
+    TWEET_MAX = 140
+    TWEET_URL_LEN = 20
+
+    total = 0
+    n = text
+    if len(text) > 0:
+        r = findall(r"http://[a-zA-Z0-9]+(\.[a-zA-Z0-9]+)+([-A-Z0-9a-z_$.+!*()/\\\,:@&=?~#%]*)", text)
+
+        for item in r:
+            url = item
+            byteLen = len(url) + len(re.findall(r"[^\x00-\x80]", url))
+
+            if re.search(r"^(http://t.cn)", url):
+                continue
+            elif re.search(r"^(http:\/\/)+(weibo.com|weibo.cn)", url):
+                total += (byteLen if byteLen <= TWEET_MIN else
+                          (TWEET_URL_LEN
+                           if byteLen <= TWEET_MAX
+                           else byteLen - TWEET_MAX + TWEET_URL_LEN))
+            else:
+                total += (TWEET_URL_LEN if byteLen <= TWEET_MAX else
+                          (byteLen - TWEET_MAX + TWEET_URL_LEN))
+            n = n.replace(url, "")
+    return ceil((total + len(n) + len(re.findall(r"[^\x00-\x80]", n))) / 2)
+
+
+def reference_cut_off(text):
+    cut_text = ""
+    for char in text:
+        if reference_tweetLength(cut_text) >= 140:
+            break
+        else:
+            cut_text += char
+    return cut_text
+
+
+PIECES = ["a", "Z", "0", " ", "/", ".", "#", "@", "\x80", "我", "【", "Ｔ",
+          "　", "http://", "http://t.cn/", "http://weibo.com/", "abc.com",
+          "zCik3bc0H", "?q=1&p=2", "//@WeCase:"]
+
+
+def random_text(rand, max_pieces=120):
+    return "".join(rand.choice(PIECES)
+                   for i in range(rand.randint(0, max_pieces)))
 
 
 class TweetUtilsTest(unittest.TestCase):
@@ -12,11 +73,49 @@ class TweetUtilsTest(unittest.TestCase):
         self.assertEqual(tweetLength("   Test   "), 5)
         self.assertEqual(tweetLength("　　　Ｔｅｓｔｉｎｇ　　　　"), 14)
 
+    def test_tweetLength_compatible(self):
+        rand = random.Random(20130406)
+        for i in range(500):
+            text = random_text(rand)
+            self.assertEqual(tweetLength(text), reference_tweetLength(text), text)
+
+    def test_TweetLengthCounter(self):
+        rand = random.Random(20130407)
+        counter = TweetLengthCounter()
+        text = ""
+        for i in range(1000):
+            # Simulate typing: insert or remove something at a random place.
+            pos = rand.randint(0, len(text))
+            if text and rand.random() < 0.3:
+                text = text[:pos] + text[pos + rand.randint(1, 10):]
+            else:
+                text = text[:pos] + random_text(rand, 3) + text[pos:]
+            self.assertEqual(counter.update(text), reference_tweetLength(text), text)
+            self.assertEqual(counter.length(), reference_tweetLength(text))
+
+    def test_tweetTruncate(self):
+        self.assertEqual(tweetTruncate(""), "")
+        self.assertEqual(tweetTruncate("Test"), "Test")
+        self.assertEqual(tweetTruncate("我" * 200), "我" * 140)
+        rand = random.Random(20130408)
+        for i in range(150):
+            text = random_text(rand, 200)
+            self.assertEqual(tweetTruncate(text), reference_cut_off(text), text)
+
     def test_get_mid(self):
         self.assertEqual(get_mid("3591268992667779"), 'zCik3bc0H')
         self.assertEqual(get_mid("3591370117495972"), 'zCkX9vs2M')
         self.assertEqual(get_mid("3591291856713634"), 'zCiUVsawq')
 
+    def test_saved_token(self):
+        token = {"access_token": "token", "expires": 1000 + TOKEN_REFRESH_TIME * 2, "uid": 1}
+        tokens = {"WeCase": token, "empty": {}}
+        self.assertEqual(saved_token(tokens, "WeCase", now=1000), token)
+        self.assertIsNone(saved_token(tokens, "other", now=1000))
+        self.assertIsNone(saved_token(tokens, "empty", now=1000))
+        # Expires soon, authorize again.
+        self.assertIsNone(saved_token(tokens, "WeCase", now=1001 + TOKEN_REFRESH_TIME))
+
 
 if __name__ == "__main__":
     unittest.main()
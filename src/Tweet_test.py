@@ -0,0 +1,42 @@
+import unittest
+try:
+    from Tweet import TweetSimpleModel
+except (ImportError, SyntaxError):
+    # PyQt4 is missing, or async is a keyword (Python 3.7+) for WeHack.
+    TweetSimpleModel = None
+
+
+def status(id):
+    return {"id": id, "text": "status %d" % id,
+            "user": {"id": 1, "name": "user1"}}
+
+
+@unittest.skipUnless(TweetSimpleModel, "Tweet can't be imported")
+class TweetSimpleModelTest(unittest.TestCase):
+
+    def test_queued_insert_and_evict(self):
+        model = TweetSimpleModel()
+        events = []
+        model.itemsInserted.connect(lambda row, items: events.append(("insert", row, items)))
+        model.rowsRemoved.connect(lambda parent, start, end: events.append(("remove", start, end)))
+
+        model.appendRows([status(i) for i in range(10, 0, -1)])
+        model.insertRows(0, [status(11), status(12)])
+        # Evicted in the worker thread, before the view got the inserts.
+        model.removeRows(0, 5)
+
+        # The view replays them later, in order.
+        rows = []
+        for event in events:
+            if event[0] == "insert":
+                _, row, items = event
+                rows[row:row] = [item.id for item in items]
+            else:
+                _, start, end = event
+                del rows[start:end + 1]
+        self.assertEqual(rows, [model.get_item(row).id for row in range(model.rowCount())])
+        self.assertEqual(rows, [7, 6, 5, 4, 3, 2, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented the action queue of WeCase.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+from WeHack import Singleton
+from actionqueue import ActionQueue
+from WConnectivity import WConnectivity
+
+
+class WActionQueue(ActionQueue, metaclass=Singleton):
+
+    def __init__(self):
+        super(WActionQueue, self).__init__(WConnectivity())
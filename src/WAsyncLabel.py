@@ -9,6 +9,8 @@ from const import cache_path as down_path
 from const import icon
 from WeHack import async
 from WObjectCache import WObjectCache
+from WMetrics import metrics
+from WConnectivity import WConnectivity
 import logging
 
 
@@ -158,16 +160,29 @@ class WAsyncFetcher(QtCore.QObject):
                 return False
 
         def download():
-            while 1:
+            connectivity = WConnectivity()
+            while connectivity.online():
                 try:
-                    urllib.request.urlretrieve(url, down_path + filename + ".down")
+                    with metrics.timer("image.fetch"):
+                        urllib.request.urlretrieve(url, down_path + filename + ".down")
                     os.rename(down_path + filename + ".down",
                               down_path + filename)
-                    return
+                    connectivity.reportSuccess()
+                    return True
                 except (BadStatusLine, URLError, ContentTooShortError):
+                    metrics.counter("image.fetch.retries").inc()
+                    connectivity.reportFailure()
                     continue
                 except OSError:
-                    return
+                    return True
+            # Offline, and the image is not in the cache.
+            delete_tmp()
+            return False
+
+        if os.path.exists(down_path + filename):
+            metrics.counter("image.cache_hit").inc()
+        else:
+            metrics.counter("image.cache_miss").inc()
 
         while 1:
             if os.path.exists(down_path + filename):
@@ -182,12 +197,18 @@ class WAsyncFetcher(QtCore.QObject):
                 sleep(0.5)
                 continue
             else:
+                # Keep the gauge, the registry may be toggled while fetching.
+                fetching = metrics.gauge("image.fetching")
+                fetching.inc()
                 try:
-                    download()
+                    if not download():
+                        return
                 except Exception as e:
                     # Issue #72, log it for further research.
                     logging.error(str(e))
                     return
+                finally:
+                    fetching.dec()
 
     @async
     def fetch(self, url, filename=""):
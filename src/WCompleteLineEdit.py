@@ -12,11 +12,16 @@ from WeHack import async
 
 
 class WAbstractCompleteLineEdit(QtGui.QTextEdit):
-    fetchListFinished = QtCore.pyqtSignal(list)
+    fetchListFinished = QtCore.pyqtSignal(int, list)
+    # 停止输入多少毫秒后才进行远程查询
+    fetchDelay = 300
 
     def __init__(self, parent=None):
         super(WAbstractCompleteLineEdit, self).__init__(parent)
         self.cursor = self.textCursor()
+        # 每次查询的编号，过时的查询结果会被丢弃
+        self._serial = 0
+        self._localList = []
 
         self.setupUi()
         self.setupSignals()
@@ -27,12 +32,16 @@ class WAbstractCompleteLineEdit(QtGui.QTextEdit):
         self.listView.setEditTriggers(QtGui.QAbstractItemView.NoEditTriggers)
         self.listView.setWindowFlags(QtCore.Qt.ToolTip)
         self.setLineWrapMode(self.WidgetWidth)
+        self.fetchTimer = QtCore.QTimer(self)
+        self.fetchTimer.setSingleShot(True)
+        self.fetchTimer.setInterval(self.fetchDelay)
 
     def setupSignals(self):
         self.textChanged.connect(self.needComplete)
         self.textChanged.connect(self.setCompleter)
         self.listView.clicked.connect(self.mouseCompleteText)
-        self.fetchListFinished.connect(self.showCompleter)
+        self.fetchListFinished.connect(self.fetchFinished)
+        self.fetchTimer.timeout.connect(self.fetch)
 
     def getLine(self):
         # 获得折行后屏幕上实际的行数
@@ -50,9 +59,12 @@ class WAbstractCompleteLineEdit(QtGui.QTextEdit):
             block = block.previous()
         return lines
 
-    def getCompleteList(self):
+    def getCompleteList(self, serial):
         raise NotImplementedError
 
+    def getLocalCompleteList(self):
+        return []
+
     def getNewText(self, original_text, new_text):
         raise NotImplementedError
 
@@ -107,6 +119,10 @@ class WAbstractCompleteLineEdit(QtGui.QTextEdit):
         raise NotImplementedError
 
     def setCompleter(self):
+        # 文本已改变，取消还未发出的查询
+        self.fetchTimer.stop()
+        self._serial += 1
+
         text = self.selectedText()
         text = text.split(self.separator)[-1]
 
@@ -118,8 +134,20 @@ class WAbstractCompleteLineEdit(QtGui.QTextEdit):
         if (len(text) > 1) and (not self.listView.isHidden()):
             return
 
-        self.getCompleteList()
-        self.showCompleter(["Loading..."])
+        self._localList = self.getLocalCompleteList()
+        self.showCompleter(self._localList or ["Loading..."])
+        self.fetchTimer.start()
+
+    def fetch(self):
+        self.selectedText()
+        self.getCompleteList(self._serial)
+
+    def fetchFinished(self, serial, lst):
+        if serial != self._serial:
+            # 文本在查询期间改变了，结果已过时
+            return
+        self.showCompleter(self._localList +
+                           [i for i in lst if i not in self._localList])
 
     def showCompleter(self, lst):
         self.listView.hide()
@@ -154,12 +182,18 @@ class WCompleteLineEdit(WAbstractCompleteLineEdit):
         super(WCompleteLineEdit, self).__init__(parent)
         self._needComplete = False
         self.callback = None
+        self.localCallback = None
         self.setAcceptRichText(False)  # 禁用富文本，微博很穷的
 
     @async
-    def getCompleteList(self):
+    def getCompleteList(self, serial):
         result = self.callback(self.cursor.selectedText())
-        self.fetchListFinished.emit(result)
+        self.fetchListFinished.emit(serial, result)
+
+    def getLocalCompleteList(self):
+        if not self.localCallback:
+            return []
+        return self.localCallback(self.cursor.selectedText())
 
     def getNewText(self, original_text, new_text):
         for index, value in enumerate(original_text):
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented the identity map of WeCase.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+from WeHack import Singleton
+from identitymap import IdentityMap
+
+
+class WIdentityMap(IdentityMap, metaclass=Singleton):
+    pass
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented an index of screen names
+#           for completing @mentions without asking Sina
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+from WeHack import Singleton
+from WPrefixTree import WPrefixTree
+
+
+class WMentionIndex(WPrefixTree, metaclass=Singleton):
+    """All screen names we've seen in timelines and suggestions,
+    and Sina's suggestions for the prefixes we've asked."""
+
+    def __init__(self):
+        super(WMentionIndex, self).__init__()
+        self._suggestions = {}
+
+    def addStatuses(self, statuses):
+        for status in statuses:
+            while status:
+                user = status.get("user")
+                if user:
+                    self.add(user.get("name"))
+                # retweeted_status for tweets, status for comments.
+                status = status.get("retweeted_status") or status.get("status")
+
+    def suggestions(self, prefix):
+        """Return the cached suggestions of the prefix, or None."""
+        return self._suggestions.get(prefix.lower())
+
+    def setSuggestions(self, prefix, names):
+        self._suggestions[prefix.lower()] = names
+        self.addWords(names)
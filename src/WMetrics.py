@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented a lightweight metrics registry
+#           for the hot paths: counters, gauges and histograms.
+#           Run WeCase with WECASE_METRICS=1 or enable it in the metrics
+#           window. When it is disabled, every metric is a no-op.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import os
+import json
+import threading
+from collections import deque
+from time import perf_counter, time
+
+
+ENV_NAME = "WECASE_METRICS"
+# How many recent samples a histogram keeps for the percentiles.
+HISTOGRAM_SAMPLES = 1024
+
+
+class Counter():
+    # `value += n` is not atomic, the metrics are updated by many threads.
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge():
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def dec(self, n=1):
+        with self._lock:
+            self.value -= n
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram():
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._samples = deque(maxlen=HISTOGRAM_SAMPLES)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+            self._samples.append(value)
+
+    def percentile(self, percent):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[int(round(percent / 100 * (len(samples) - 1)))]
+
+    def snapshot(self):
+        return {"count": self.count,
+                "sum": self.sum,
+                "min": self.min,
+                "max": self.max,
+                "mean": self.sum / self.count if self.count else None,
+                "p50": self.percentile(50),
+                "p90": self.percentile(90),
+                "p99": self.percentile(99)}
+
+
+class _Timer():
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._histogram.observe(perf_counter() - self._start)
+        return False
+
+
+class _NullMetric():
+    """Used when the registry is disabled, does nothing."""
+
+    def inc(self, n=1):
+        pass
+
+    def dec(self, n=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_null_metric = _NullMetric()
+
+
+class MetricsRegistry():
+
+    def __init__(self, enabled=False):
+        self._enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def enabled(self):
+        return self._enabled
+
+    def setEnabled(self, state):
+        self._enabled = bool(state)
+
+    def _get(self, name, cls):
+        if not self._enabled:
+            return _null_metric
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, cls())
+        return metric
+
+    def counter(self, name):
+        return self._get(name, Counter)
+
+    def gauge(self, name):
+        return self._get(name, Gauge)
+
+    def histogram(self, name):
+        return self._get(name, Histogram)
+
+    def timer(self, name):
+        """Time a with-block in seconds, into the histogram name."""
+        if not self._enabled:
+            return _null_metric
+        return _Timer(self.histogram(name))
+
+    def clear(self):
+        with self._lock:
+            self._metrics = {}
+
+    def snapshot(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        result = {"time": time(), "threads": threading.active_count()}
+        for name, metric in sorted(metrics.items()):
+            result[name] = metric.snapshot()
+        return result
+
+    def dump(self, path):
+        with open(path, "w") as dump_file:
+            json.dump(self.snapshot(), dump_file, indent=4, sort_keys=True)
+
+
+metrics = MetricsRegistry(enabled=bool(os.environ.get(ENV_NAME)))
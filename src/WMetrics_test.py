@@ -0,0 +1,73 @@
+import os
+import json
+import tempfile
+import threading
+import unittest
+from WMetrics import MetricsRegistry
+
+
+class WMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = MetricsRegistry(enabled=True)
+
+    def test_counter_and_gauge(self):
+        self.metrics.counter("hit").inc()
+        self.metrics.counter("hit").inc(2)
+        self.metrics.gauge("loading").inc()
+        self.metrics.gauge("loading").inc()
+        self.metrics.gauge("loading").dec()
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["hit"], 3)
+        self.assertEqual(snapshot["loading"], 1)
+
+    def test_threads(self):
+        def work():
+            for i in range(10000):
+                self.metrics.counter("hit").inc()
+                self.metrics.gauge("loading").inc()
+                self.metrics.gauge("loading").dec()
+        threads = [threading.Thread(target=work) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["hit"], 40000)
+        self.assertEqual(snapshot["loading"], 0)
+
+    def test_histogram(self):
+        for i in range(1, 101):
+            self.metrics.histogram("latency").observe(i)
+        with self.metrics.timer("block"):
+            pass
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["latency"]["count"], 100)
+        self.assertEqual(snapshot["latency"]["min"], 1)
+        self.assertEqual(snapshot["latency"]["max"], 100)
+        self.assertEqual(snapshot["latency"]["p50"], 51)
+        self.assertEqual(snapshot["latency"]["p99"], 99)
+        self.assertEqual(snapshot["block"]["count"], 1)
+
+    def test_disabled(self):
+        metrics = MetricsRegistry()
+        metrics.counter("hit").inc()
+        metrics.histogram("latency").observe(1)
+        with metrics.timer("block"):
+            pass
+        self.assertEqual(set(metrics.snapshot()), {"time", "threads"})
+
+    def test_dump(self):
+        self.metrics.counter("hit").inc()
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.metrics.dump(path)
+            with open(path) as dump_file:
+                self.assertEqual(json.load(dump_file)["hit"], 1)
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
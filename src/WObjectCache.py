@@ -1,4 +1,5 @@
 from WeHack import Singleton
+from WMetrics import metrics
 
 
 class WObjectCache(metaclass=Singleton):
@@ -13,7 +14,10 @@ class WObjectCache(metaclass=Singleton):
         # TODO: Using LRU Cache to free memory.
         hash_key = self.__calculate_key(object, key)
         if hash_key in self.__objects.keys():
+            metrics.counter("objectcache.hit").inc()
             return self.__objects[hash_key]
+        metrics.counter("objectcache.miss").inc()
         obj = object(key, *args)
         self.__objects[hash_key] = obj
+        metrics.gauge("objectcache.size").set(len(self.__objects))
         return obj
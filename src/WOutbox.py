@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented the outbox of WeCase.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import os
+from WeHack import Singleton
+from outbox import Outbox
+from WConnectivity import WConnectivity
+import imageprep
+import upload
+import sessionrecorder
+import const
+
+
+def _post(endpoint, params, progress, cancel):
+    """POST by the SDK, e.g. statuses/update is client.statuses.update.post().
+    The pic of statuses/upload is the path of the image, it is scaled
+    down here in the thread of the outbox and streamed from the disk."""
+
+    api = const.client
+    for name in endpoint.split("/"):
+        api = getattr(api, name)
+    if "pic" not in params:
+        return api.post(**params)
+
+    params = dict(params)
+    path = params.pop("pic")
+    pic = imageprep.prepare(path, const.cache_path)
+    if sessionrecorder.replaying():
+        # The replayer only knows the requests of urllib.
+        with open(pic, "rb") as f:
+            result = api.post(pic=f, **params)
+    else:
+        result = upload.upload("%s%s.json" % (const.client.api_url, endpoint),
+                               const.client.access_token, params, {"pic": pic},
+                               progress, cancel)
+    imageprep.discard(path, const.cache_path)
+    return result
+
+
+def _discard(item):
+    """Remove the preprocessed image of a cancelled or removed item."""
+    if "pic" in item["params"]:
+        imageprep.discard(item["params"]["pic"], const.cache_path)
+
+
+class WOutbox(Outbox, metaclass=Singleton):
+
+    def __init__(self):
+        # Not in the cache, the pending items are what users wrote.
+        path = os.path.join(os.path.dirname(const.config_path), "outbox.db")
+        super(WOutbox, self).__init__(_post, WConnectivity(), path, discard=_discard)
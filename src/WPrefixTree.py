@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented a case-insensitive prefix tree
+#           for completing words locally
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import threading
+
+
+class _Node():
+    __slots__ = ("children", "words")
+
+    def __init__(self):
+        self.children = {}
+        # the original words end at this node, and how many times
+        # we've seen them.
+        self.words = {}
+
+
+class WPrefixTree():
+    """
+    A prefix tree of words. Words are matched case-insensitively,
+    and the words we've seen more often come first.
+
+    >>> tree = WPrefixTree()
+    >>> tree.add("WeCase")
+    >>> tree.search("we")
+    ['WeCase']
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._count = 0
+        # Models add words in their own threads.
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, word):
+        with self._lock:
+            node = self._find(word.lower())
+            return node is not None and word in node.words
+
+    def _find(self, key):
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def add(self, word):
+        if not word:
+            return
+
+        with self._lock:
+            node = self._root
+            for char in word.lower():
+                node = node.children.setdefault(char, _Node())
+            if word not in node.words:
+                self._count += 1
+            node.words[word] = node.words.get(word, 0) + 1
+
+    def addWords(self, words):
+        for word in words:
+            self.add(word)
+
+    def search(self, prefix, limit=10):
+        with self._lock:
+            node = self._find(prefix.lower())
+            if node is None:
+                return []
+
+            found = []
+            stack = [node]
+            while stack:
+                node = stack.pop()
+                found.extend(node.words.items())
+                stack.extend(node.children.values())
+
+        found.sort(key=lambda word: (-word[1], word[0]))
+        return [word for word, count in found[:limit]]
@@ -0,0 +1,32 @@
+import unittest
+from WPrefixTree import WPrefixTree
+
+
+class WPrefixTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = WPrefixTree()
+        self.tree.addWords(["WeCase", "wecase_bot", "Weibo", "微博小秘书",
+                            "微博", "Tom"])
+
+    def test_search(self):
+        self.assertEqual(self.tree.search("we"), ["WeCase", "Weibo", "wecase_bot"])
+        self.assertEqual(self.tree.search("WECASE"), ["WeCase", "wecase_bot"])
+        self.assertEqual(self.tree.search("微博"), ["微博", "微博小秘书"])
+        self.assertEqual(self.tree.search("x"), [])
+        self.assertEqual(len(self.tree.search("")), 6)
+
+    def test_frequency_and_limit(self):
+        self.tree.add("Weibo")
+        self.assertEqual(self.tree.search("we", limit=2), ["Weibo", "WeCase"])
+
+    def test_contains(self):
+        self.tree.add("Tom")
+        self.assertEqual(len(self.tree), 6)
+        self.assertIn("Tom", self.tree)
+        self.assertNotIn("tom", self.tree)
+        self.assertNotIn("To", self.tree)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented the local status store of WeCase.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import logging
+import threading
+from WeHack import Singleton
+from statusstore import StatusStore
+import const
+
+
+class WStatusStore(StatusStore, metaclass=Singleton):
+
+    def __init__(self):
+        super(WStatusStore, self).__init__(const.cache_path + "statuses.db")
+        # Once a run, it may take a while after a long time.
+        threading.Thread(target=self._prune, name="Status store pruning",
+                         daemon=True).start()
+
+    def _prune(self):
+        try:
+            removed = self.prune()
+        except:
+            logging.exception("Failed to prune the status store")
+            return
+        if removed:
+            logging.info("%d statuses pruned from the status store" % removed)
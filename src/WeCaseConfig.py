@@ -1,103 +1,195 @@
+import os
+import ast
+import copy
+import threading
 from configparser import ConfigParser
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class _ConfigFile():
+    """A config file shared by all WeCaseConfig of the same path.
+
+    Values are parsed once and cached, only the changed options are
+    written back, so the sections can't clobber each other.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.parser = ConfigParser()
+        self.parser.read(path)
+        self.cache = {}
+        self.dirty = {}
+        self.listeners = []
+        self.lock = threading.RLock()
+
+    def _lockFile(self):
+        if not fcntl:
+            return None
+        lock_file = open(self.path + ".lock", "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _unlockFile(self, lock_file):
+        if not lock_file:
+            return
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            dirty = self.dirty
+            self.dirty = {}
+
+            lock_file = self._lockFile()
+            try:
+                # Someone may have written the other options since we
+                # read the file, merge our changes into the latest one.
+                parser = ConfigParser()
+                parser.read(self.path)
+                for section, keys in dirty.items():
+                    if not parser.has_section(section):
+                        parser[section] = {}
+                    for key in keys:
+                        parser[section][key] = self.parser.get(section, key, raw=True)
+
+                # The passwords and the access tokens are in the file,
+                # only the user can read it, even if it was 0644 before.
+                mode = 0o600
+                tmp_path = self.path + ".tmp"
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+                os.fchmod(fd, mode)
+                with open(fd, "w") as config_file:
+                    parser.write(config_file)
+                    config_file.flush()
+                    os.fsync(config_file.fileno())
+                os.replace(tmp_path, self.path)
+            except:
+                # Nothing is saved, keep the changes for the next time.
+                for section, keys in dirty.items():
+                    self.dirty.setdefault(section, set()).update(keys)
+                raise
+            finally:
+                self._unlockFile(lock_file)
+
+            for section in list(self.parser.sections()):
+                if not parser.has_section(section):
+                    parser[section] = {}
+            self.parser = parser
+            self.cache = {}
+
+        for section, listener in list(self.listeners):
+            if section in dirty:
+                listener(set(dirty[section]))
+
+
+def _option(key, typ, default):
+    """Define a typed option of the section."""
+
+    def getter(self):
+        return self._get(key, typ, default)
+
+    def setter(self, value):
+        self._set(key, value)
+
+    return property(getter, setter)
 
 
 class WeCaseConfig():
 
+    _files = {}
+    _files_lock = threading.Lock()
+
     def __init__(self, path, section="main"):
-        self._path = path
-        self._config = ConfigParser()
-        self._config.read(path)
+        with self._files_lock:
+            if path not in self._files:
+                self._files[path] = _ConfigFile(path)
+        self._file = self._files[path]
+        self._section = section
 
         # create a empty field
-        if not self._config.has_section(section):
-            self._config[section] = {}
-
-        self._main_config = self._config[section]
+        with self._file.lock:
+            if not self._file.parser.has_section(section):
+                self._file.parser[section] = {}
+
+    @staticmethod
+    def _parse(typ, raw, default):
+        try:
+            if typ == bool:
+                return ConfigParser.BOOLEAN_STATES[raw.lower()]
+            elif typ in (list, dict):
+                value = ast.literal_eval(raw)
+                if not isinstance(value, typ):
+                    return default
+                return value
+            return typ(raw)
+        except (KeyError, ValueError, SyntaxError):
+            return default
+
+    def _get(self, key, typ, default):
+        file = self._file
+        cache_key = (self._section, key)
+        with file.lock:
+            if cache_key not in file.cache:
+                raw = file.parser[self._section].get(key)
+                if raw is None:
+                    value = default
+                else:
+                    value = self._parse(typ, raw, default)
+                file.cache[cache_key] = value
+            value = file.cache[cache_key]
+
+        if typ in (list, dict):
+            # Don't let the caller change our cache.
+            return copy.deepcopy(value)
+        return value
+
+    def _set(self, key, value):
+        raw = str(value)
+        file = self._file
+        with file.lock:
+            if file.parser[self._section].get(key) == raw:
+                return
+            file.parser[self._section][key] = raw
+            file.cache.pop((self._section, key), None)
+            file.dirty.setdefault(self._section, set()).add(key)
 
     def save(self):
-        # TODO: Create and check the lock file during writing
-        with open(self._path, "w+") as config_file:
-            self._config.write(config_file)
-
-    # Section: main
-    @property
-    def notify_interval(self):
-        return int(self._main_config.get("notify_interval", "30"))
-
-    @notify_interval.setter
-    def notify_interval(self, second):
-        self._main_config["notify_interval"] = str(second)
-
-    @property
-    def notify_timeout(self):
-        return int(self._main_config.get("notify_timeout", "5"))
-
-    @notify_timeout.setter
-    def notify_timeout(self, second):
-        self._main_config["notify_timeout"] = str(second)
-
-    @property
-    def remind_comments(self):
-        return self._main_config.getboolean("remind_comments", True)
-
-    @remind_comments.setter
-    def remind_comments(self, state):
-        self._main_config["remind_comments"] = str(state)
+        self._file.save()
 
-    @property
-    def remind_mentions(self):
-        return self._main_config.getboolean("remind_mentions", True)
+    def addListener(self, listener):
+        """listener(keys) will be called with the changed keys of this
+        section, after anyone saved them."""
+        self._file.listeners.append((self._section, listener))
 
-    @remind_mentions.setter
-    def remind_mentions(self, state):
-        self._main_config["remind_mentions"] = str(state)
+    def removeListener(self, listener):
+        self._file.listeners.remove((self._section, listener))
 
-    @property
-    def usersBlacklist(self):
-        return eval(self._main_config.get("usersBlacklist", "[]"))
-
-    @usersBlacklist.setter
-    def usersBlacklist(self, users):
-        self._main_config["usersBlacklist"] = str(users)
-
-    @property
-    def tweetsKeywordsBlacklist(self):
-        return eval(self._main_config.get("tweetKeywordsBlacklist", "[]"))
-
-    @tweetsKeywordsBlacklist.setter
-    def tweetsKeywordsBlacklist(self, keywords):
-        self._main_config["tweetKeywordsBlacklist"] = str(keywords)
-
-    @property
-    def mainwindow_geometry(self):
-        return eval(self._main_config.get("mainwindow_geometry",
-                                          '{"height": 656, "width": 403}'))
-
-    @mainwindow_geometry.setter
-    def mainwindow_geometry(self, geometry_dic):
-        self._main_config["mainwindow_geometry"] = str(geometry_dic)
+    # Section: main
+    notify_interval = _option("notify_interval", int, 30)
+    notify_timeout = _option("notify_timeout", int, 5)
+    remind_comments = _option("remind_comments", bool, True)
+    remind_mentions = _option("remind_mentions", bool, True)
+    usersBlacklist = _option("usersBlacklist", list, [])
+    tweetsKeywordsBlacklist = _option("tweetKeywordsBlacklist", list, [])
+    mainwindow_geometry = _option("mainwindow_geometry", dict,
+                                  {"height": 656, "width": 403})
+    # Minutes before an inactive user or topic tab hibernates, 0 to disable.
+    tab_hibernate_time = _option("tab_hibernate_time", int, 30)
+    # Seconds between refreshing the counts of the visible statuses,
+    # 0 to disable.
+    count_refresh_interval = _option("count_refresh_interval", int, 60)
 
     # Section: login
-    @property
-    def passwd(self):
-        return eval(self._main_config.get("passwd", "{}"))
-
-    @passwd.setter
-    def passwd(self, accounts):
-        self._main_config["passwd"] = str(accounts)
-
-    @property
-    def last_login(self):
-        return str(self._main_config.get("last_login", ""))
-
-    @last_login.setter
-    def last_login(self, account):
-        self._main_config["last_login"] = str(account)
-
-    @property
-    def auto_login(self):
-        return self._main_config.getboolean("auto_login", False)
-
-    @auto_login.setter
-    def auto_login(self, state):
-        self._main_config["auto_login"] = str(state)
+    passwd = _option("passwd", dict, {})
+    last_login = _option("last_login", str, "")
+    auto_login = _option("auto_login", bool, False)
+    # {username: {"access_token": ..., "expires": ..., "uid": ...}}, kept
+    # with the passwords, in a file only the user can read.
+    tokens = _option("tokens", dict, {})
+    # Use a stand-in of the API instead of Sina, e.g. fakeweibo.py.
+    api_server = _option("api_server", str, "")
@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from WeCaseConfig import WeCaseConfig
+
+
+class WeCaseConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "config_db")
+        WeCaseConfig._files.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        WeCaseConfig._files.clear()
+
+    def reopen(self, section="main"):
+        WeCaseConfig._files.clear()
+        return WeCaseConfig(self.path, section)
+
+    def test_defaults(self):
+        config = WeCaseConfig(self.path)
+        self.assertEqual(config.notify_interval, 30)
+        self.assertEqual(config.remind_comments, True)
+        self.assertEqual(config.usersBlacklist, [])
+        self.assertEqual(config.mainwindow_geometry, {"height": 656, "width": 403})
+
+    def test_typed_values(self):
+        config = WeCaseConfig(self.path)
+        config.notify_interval = "60"
+        config.remind_mentions = False
+        config.usersBlacklist = str(["a", "b"])
+        config.save()
+
+        config = self.reopen()
+        self.assertEqual(config.notify_interval, 60)
+        self.assertEqual(config.remind_mentions, False)
+        self.assertEqual(config.usersBlacklist, ["a", "b"])
+
+    def test_cache_is_not_shared_with_caller(self):
+        config = WeCaseConfig(self.path, "login")
+        passwd = config.passwd
+        passwd["user"] = "secret"
+        self.assertEqual(config.passwd, {})
+        config.passwd = passwd
+        self.assertEqual(config.passwd, {"user": "secret"})
+
+    def test_sections_do_not_clobber(self):
+        main = WeCaseConfig(self.path)
+        login = WeCaseConfig(self.path, "login")
+        main.notify_timeout = 10
+        login.last_login = "WeCase"
+        main.save()
+        login.save()
+
+        self.assertEqual(self.reopen().notify_timeout, 10)
+        self.assertEqual(self.reopen("login").last_login, "WeCase")
+
+    def test_merge_with_file(self):
+        main = WeCaseConfig(self.path)
+        main.notify_timeout = 10
+        main.save()
+
+        # Another WeCase changed the file.
+        other = self.reopen("login")
+        other.last_login = "other"
+        other.save()
+
+        WeCaseConfig._files[self.path] = main._file
+        main.notify_interval = 100
+        main.save()
+        self.assertEqual(self.reopen("login").last_login, "other")
+        self.assertEqual(self.reopen().notify_interval, 100)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    def test_private_mode(self):
+        config = WeCaseConfig(self.path, "login")
+        config.passwd = {"user": "secret"}
+        config.save()
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+        # A file written before the tokens were saved.
+        os.chmod(self.path, 0o644)
+        config.tokens = {"user": {"access_token": "token", "expires": 0, "uid": 1}}
+        config.save()
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_failed_save(self):
+        config = WeCaseConfig(self.path)
+        config.notify_interval = 60
+        with mock.patch("os.replace", side_effect=OSError):
+            self.assertRaises(OSError, config.save)
+        config.save()
+        self.assertEqual(self.reopen().notify_interval, 60)
+
+    def test_listener(self):
+        changes = []
+        main = WeCaseConfig(self.path)
+        main.addListener(changes.append)
+
+        settings = WeCaseConfig(self.path)
+        settings.notify_interval = 60
+        settings.notify_timeout = 5
+        settings.save()
+        self.assertEqual(changes, [{"notify_interval", "notify_timeout"}])
+        self.assertEqual(main.notify_interval, 60)
+
+        # Nothing changed.
+        settings.notify_interval = 60
+        settings.save()
+        login = WeCaseConfig(self.path, "login")
+        login.auto_login = True
+        login.save()
+        self.assertEqual(len(changes), 1)
+
+        main.removeListener(changes.append)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,22 +9,30 @@
 import os
 import platform
 import http
-from time import sleep
+from time import sleep, time
 from WTimer import WTimer
 from urllib.error import URLError
 from PyQt4 import QtCore, QtGui
-from Tweet import TweetCommonModel, TweetCommentModel, TweetUserModel, TweetTopicModel
+from Tweet import TweetCommonModel, TweetCommentModel, TweetUserModel, TweetTopicModel, \
+    TweetSearchModel
 from Notify import Notify
-from NewpostWindow import NewpostWindow
-from SettingWindow import WeSettingsWindow
-from AboutWindow import AboutWindow
 import const
+import startuptrace
 from WeCaseConfig import WeCaseConfig
 from WeHack import async, setGeometry, getGeometry, UNUSED
 from WObjectCache import WObjectCache
 from WeRuntimeInfo import WeRuntimeInfo
 from TweetListWidget import TweetListWidget
 from WAsyncLabel import WAsyncFetcher
+from WMetrics import metrics
+from WConnectivity import WConnectivity
+from WStatusStore import WStatusStore
+from WIdentityMap import WIdentityMap
+from connectivity import NETWORK_ERRORS
+from weibo import APIError
+import statuscounts
+import outbox
+from WOutbox import WOutbox
 import logging
 import wecase_rc
 
@@ -41,26 +49,47 @@ class WeCaseWindow(QtGui.QMainWindow):
     imageLoaded = QtCore.pyqtSignal(str)
     tabBadgeChanged = QtCore.pyqtSignal(int, int)
     tabAvatarFetched = QtCore.pyqtSignal(str)
+    connectivityChanged = QtCore.pyqtSignal(bool)
+    outboxChanged = QtCore.pyqtSignal(dict)
 
     def __init__(self, parent=None):
         super(WeCaseWindow, self).__init__(parent)
         self.setAttribute(QtCore.Qt.WA_QuitOnClose, True)
         self._iconPixmap = {}
+        # The last time we've seen a tab.
+        self._tabActivity = {}
         self.setupUi(self)
+        startuptrace.mark("WeCaseWindow.setupUi")
         self._setupSysTray()
+        startuptrace.mark("WeCaseWindow._setupSysTray")
         self.tweetViews = [self.homeView, self.mentionsView, self.commentsView]
         self.info = WeRuntimeInfo()
         self.client = const.client
         self.loadConfig()
         self.init_account()
+        startuptrace.mark("WeCaseWindow.init_account")
         self.setupModels()
+        startuptrace.mark("WeCaseWindow.setupModels")
         self.IMG_AVATAR = -2
         self.IMG_THUMB = -1
         self.notify = Notify(timeout=self.notify_timeout)
+        self.countTimer = QtCore.QTimer(self)
+        self.countTimer.timeout.connect(self.refreshCounts)
         self.applyConfig()
+        self.config.addListener(self.configChanged)
+        self.connectivityChanged.connect(self.setOnline)
+        # Called in other threads, let Qt deliver it.
+        self._connectivityListener = self.connectivityChanged.emit
+        WConnectivity().addListener(self._connectivityListener)
         self.download_lock = []
         self._last_reminds_count = 0
         self._setupUserTab(self.uid(), False, True)
+        self._setupHibernation()
+        self.outboxChanged.connect(self.outboxItemChanged)
+        self._outboxListener = self.outboxChanged.emit
+        WOutbox().addListener(self._outboxListener)
+        # Send what we haven't sent last time.
+        WOutbox().setAccount(self.uid())
 
     def _setupTab(self, view):
         tab = QtGui.QWidget()
@@ -76,6 +105,7 @@ class WeCaseWindow(QtGui.QMainWindow):
         view.tagClicked.connect(self.tagClicked)
         tab = self._setupTab(view)
         self.tabWidget.addTab(tab, "")
+        self._tabActivity[tab] = time()
         if switch:
             self.tabWidget.setCurrentWidget(tab)
         if protect:
@@ -107,9 +137,22 @@ class WeCaseWindow(QtGui.QMainWindow):
 
         @async
         def fetchUserTabAvatar(self, uid):
+            connectivity = WConnectivity()
+            user = None
+            if connectivity.online():
+                try:
+                    user = self.client.users.show.get(uid=uid)
+                except (http.client.BadStatusLine, URLError):
+                    connectivity.reportFailure()
+            if not user:
+                # Offline, we may have seen the user.
+                user = WStatusStore().user(uid)
+                if not user:
+                    return
             fetcher = WAsyncFetcher()
-            f = fetcher.down(self.client.users.show.get(uid=uid)["profile_image_url"])
-            self.tabAvatarFetched.emit(f)
+            f = fetcher.down(user["profile_image_url"])
+            if f:
+                self.tabAvatarFetched.emit(f)
 
         @QtCore.pyqtSlot(str)
         def setAvatar(f):
@@ -133,6 +176,82 @@ class WeCaseWindow(QtGui.QMainWindow):
             QtGui.QPixmap, const.icon("topic.jpg")
         ))
 
+    def _setupSearchTab(self, query, switch=True):
+        index = self._getSameTab("query", query)
+        if index:
+            if switch:
+                self.tabWidget.setCurrentIndex(index)
+            return
+
+        view = TweetListWidget()
+        timeline = TweetSearchModel(query, view)
+        tab = self._setupCommonTab(timeline, view, switch, protect=False)
+        self.tabWidget.setTabToolTip(self.tabWidget.indexOf(tab), query)
+        self._setTabIcon(tab, QtGui.QIcon.fromTheme("edit-find").pixmap(24, 24))
+
+    def search(self):
+        query, ok = QtGui.QInputDialog.getText(
+            self, self.tr("Search"),
+            self.tr("Search the statuses we've seen, on this computer:"))
+        if ok and query.strip():
+            self._setupSearchTab(query.strip())
+
+    def _setupHibernation(self):
+        self._currentTab = self.tabWidget.currentWidget()
+        self.tabWidget.currentChanged.connect(self._tabChanged)
+        self.hibernateTimer = QtCore.QTimer(self)
+        self.hibernateTimer.timeout.connect(self.hibernateTabs)
+        self.hibernateTimer.start(60 * 1000)
+
+    def _tabChanged(self, index):
+        # The last tab was active until now.
+        if self._currentTab:
+            self._tabActivity[self._currentTab] = time()
+        self._currentTab = self.tabWidget.widget(index)
+        if self._currentTab:
+            self._currentTab.layout().itemAt(0).widget().wake()
+
+    def hibernateTabs(self):
+        """Hibernate the user, topic and search tabs we haven't seen for a while."""
+        if not self.tabHibernateTime:
+            return
+
+        tabBar = self.tabWidget.tabBar()
+        now = time()
+        for i in range(self.tabWidget.count()):
+            tab = self.tabWidget.widget(i)
+            if tab == self.tabWidget.currentWidget() or tabBar.protectTab(tab):
+                continue
+            if now - self._tabActivity.get(tab, now) > self.tabHibernateTime * 60:
+                view = tab.layout().itemAt(0).widget()
+                if view.hibernate():
+                    logging.info("Tab %d hibernated" % i)
+
+    def refreshCounts(self):
+        """Refresh the counts of the statuses we are looking at."""
+        if not WConnectivity().online() or not self.isVisible():
+            return
+        ids = self.currentTweetView().visibleIds()
+        if ids:
+            self._fetchCounts(ids)
+
+    @async
+    def _fetchCounts(self, ids):
+        # The widgets are told by WIdentityMap, only their counters change.
+        connectivity = WConnectivity()
+        try:
+            with metrics.timer("api.statuses.count"):
+                statuscounts.refreshCounts(
+                    ids, lambda ids: self.client.statuses.count.get(ids=ids),
+                    WIdentityMap())
+        except NETWORK_ERRORS:
+            connectivity.reportFailure()
+        except APIError as e:
+            # Not important, try again next time.
+            logging.warning("Failed to refresh the counts: %s" % e)
+        else:
+            connectivity.reportSuccess()
+
     def userClicked(self, userItem, openAtBackend):
         self._setupUserTab(userItem.id, switch=(not openAtBackend))
 
@@ -189,6 +308,10 @@ class WeCaseWindow(QtGui.QMainWindow):
         self.logoutAction = QtGui.QAction(mainWindow)
         self.exitAction = QtGui.QAction(mainWindow)
         self.settingsAction = QtGui.QAction(mainWindow)
+        self.metricsAction = QtGui.QAction(mainWindow)
+        self.profilerAction = QtGui.QAction(mainWindow)
+        self.outboxAction = QtGui.QAction(mainWindow)
+        self.searchAction = QtGui.QAction(mainWindow)
 
         self.aboutAction.setIcon(QtGui.QIcon(QtGui.QPixmap("./IMG/img/where_s_my_weibo.svg")))
         self.exitAction.setIcon(QtGui.QIcon(QtGui.QPixmap(":/IMG/img/application-exit.svg")))
@@ -205,6 +328,8 @@ class WeCaseWindow(QtGui.QMainWindow):
         self.optionsMenu = QtGui.QMenu(self.menubar)
 
         self.mainMenu.addAction(self.refreshAction)
+        self.mainMenu.addAction(self.searchAction)
+        self.mainMenu.addAction(self.outboxAction)
         self.mainMenu.addSeparator()
         self.mainMenu.addAction(self.logoutAction)
         self.mainMenu.addAction(self.exitAction)
@@ -219,6 +344,10 @@ class WeCaseWindow(QtGui.QMainWindow):
         self.settingsAction.triggered.connect(mainWindow.showSettings)
         self.logoutAction.triggered.connect(mainWindow.logout)
         self.refreshAction.triggered.connect(mainWindow.refresh)
+        self.outboxAction.triggered.connect(mainWindow.showOutbox)
+        self.searchAction.triggered.connect(mainWindow.search)
+        self.metricsAction.triggered.connect(mainWindow.showMetrics)
+        self.profilerAction.triggered.connect(mainWindow.toggleProfiler)
 
         self.pushButton_refresh = QtGui.QPushButton(self.widget)
         self.pushButton_new = QtGui.QPushButton(self.widget)
@@ -228,6 +357,12 @@ class WeCaseWindow(QtGui.QMainWindow):
         self.tabBadgeChanged.connect(self.drawNotifyBadge)
 
         self.refreshAction.setShortcut(QtGui.QKeySequence("F5"))
+        self.searchAction.setShortcut(QtGui.QKeySequence.Find)
+        # A hidden debug window, no menu item.
+        self.metricsAction.setShortcut(QtGui.QKeySequence("Ctrl+Shift+M"))
+        mainWindow.addAction(self.metricsAction)
+        self.profilerAction.setShortcut(QtGui.QKeySequence("Ctrl+Shift+P"))
+        mainWindow.addAction(self.profilerAction)
         self.pushButton_refresh.setIcon(QtGui.QIcon(const.icon("refresh.png")))
         self.pushButton_new.setIcon(QtGui.QIcon(const.icon("new.png")))
 
@@ -298,6 +433,8 @@ class WeCaseWindow(QtGui.QMainWindow):
         self.logoutAction.setText(self.tr("&Log out"))
         self.exitAction.setText(self.tr("&Exit"))
         self.settingsAction.setText(self.tr("&Settings"))
+        self.outboxAction.setText(self.tr("Out&box"))
+        self.searchAction.setText(self.tr("&Search..."))
 
     def _setupSysTray(self):
         self.systray = QtGui.QSystemTrayIcon()
@@ -345,6 +482,10 @@ class WeCaseWindow(QtGui.QMainWindow):
 
     def closeTab(self, index):
         widget = self.tabWidget.widget(index)
+        self._tabActivity.pop(widget, None)
+        if widget == self._currentTab:
+            # Or _tabChanged() keeps it, removeTab() switches the tab.
+            self._currentTab = None
         self.tabWidget.removeTab(index)
         widget.deleteLater()
 
@@ -360,22 +501,50 @@ class WeCaseWindow(QtGui.QMainWindow):
         self.remindMentions = self.config.remind_mentions
         self.remindComments = self.config.remind_comments
         self.mainWindow_geometry = self.config.mainwindow_geometry
+        self.tabHibernateTime = self.config.tab_hibernate_time
+        self.countRefreshInterval = self.config.count_refresh_interval
 
-    def applyConfig(self):
-        try:
-            self.timer.stop_event.set()
-        except AttributeError:
-            pass
+    def applyConfig(self, keys=None):
+        """Apply the changed options in keys, or all options if keys is None."""
+
+        if keys is None or "notify_interval" in keys:
+            try:
+                self.timer.stop_event.set()
+            except AttributeError:
+                pass
+
+            self.timer = WTimer(self.notify_interval, self.show_notify)
+            self.timer.start()
+
+        if keys is None or "notify_timeout" in keys:
+            self.notify.timeout = self.notify_timeout
+
+        if keys is None or "count_refresh_interval" in keys:
+            self.countTimer.stop()
+            if self.countRefreshInterval:
+                self.countTimer.start(self.countRefreshInterval * 1000)
 
-        self.timer = WTimer(self.notify_interval, self.show_notify)
-        self.timer.start()
-        self.notify.timeout = self.notify_timeout
-        setGeometry(self, self.mainWindow_geometry)
+        if keys is not None and keys & {"usersBlacklist", "tweetKeywordsBlacklist"}:
+            for i in range(self.tabWidget.count()):
+                view = self.tabWidget.widget(i).layout().itemAt(0).widget()
+                view.model().setUsersBlacklist(self.usersBlacklist)
+                view.model().setTweetsKeywordsBlacklist(self.tweetKeywordsBlacklist)
+
+        if keys is None:
+            # We saved the geometry by ourselves, don't move the window.
+            setGeometry(self, self.mainWindow_geometry)
+
+    def configChanged(self, keys):
+        self.loadConfig()
+        self.applyConfig(keys)
 
     def setupModels(self):
         self.all_timeline = TweetCommonModel(self.client.statuses.home_timeline, self)
         self._prepareTimeline(self.all_timeline)
         self.homeView.setModel(self.all_timeline)
+        if startuptrace.enabled():
+            # Connect after the view, so the tweets have been rendered.
+            self.all_timeline.rowsInserted.connect(self._firstTimelineRendered)
 
         self.mentions = TweetCommonModel(self.client.statuses.mentions, self)
         self._prepareTimeline(self.mentions)
@@ -385,6 +554,11 @@ class WeCaseWindow(QtGui.QMainWindow):
         self._prepareTimeline(self.comment_to_me)
         self.commentsView.setModel(self.comment_to_me)
 
+    def _firstTimelineRendered(self):
+        self.all_timeline.rowsInserted.disconnect(self._firstTimelineRendered)
+        startuptrace.mark("first timeline rendered")
+        startuptrace.finish(const.cache_path + "startup_trace")
+
     @async
     def reset_remind(self):
         typ = ""
@@ -398,25 +572,32 @@ class WeCaseWindow(QtGui.QMainWindow):
             self.tabBadgeChanged.emit(self.tabWidget.currentIndex(), 0)
 
         if typ:
-            while 1:
+            connectivity = WConnectivity()
+            while connectivity.online():
                 try:
                     self.client.remind.set_count.post(type=typ)
                     break
                 except URLError:
+                    connectivity.reportFailure()
                     continue
 
     def get_remind(self, uid):
         """this function is used to get unread_count
-        from Weibo API. uid is necessary."""
+        from Weibo API. uid is necessary. Return None if we are offline."""
 
-        while 1:
+        connectivity = WConnectivity()
+        while connectivity.online():
             try:
-                reminds = self.client.remind.unread_count.get(uid=uid)
-                break
+                with metrics.timer("api.remind/unread_count"):
+                    reminds = self.client.remind.unread_count.get(uid=uid)
+                connectivity.reportSuccess()
+                return reminds
             except (http.client.BadStatusLine, URLError):
+                metrics.counter("api.remind/unread_count.retries").inc()
+                connectivity.reportFailure()
                 sleep(0.2)
                 continue
-        return reminds
+        return None
 
     def uid(self):
         """How can I get my uid? here it is"""
@@ -431,6 +612,8 @@ class WeCaseWindow(QtGui.QMainWindow):
         # to display unread count
 
         reminds = self.get_remind(self.uid())
+        if reminds is None:
+            return
         msg = self.tr("You have:") + "\n"
         reminds_count = 0
 
@@ -469,20 +652,72 @@ class WeCaseWindow(QtGui.QMainWindow):
         self._iconPixmap[icon.cacheKey()] = _tabPixmap
         self.tabWidget.setTabIcon(index, icon)
 
+    def setOnline(self, online):
+        if online:
+            self.setWindowTitle(self.tr("WeCase"))
+            self.systray.setToolTip(self.tr("WeCase"))
+        else:
+            self.setWindowTitle(self.tr("WeCase (Offline)"))
+            self.systray.setToolTip(self.tr("WeCase (Offline)"))
+
     def moveToTop(self):
         self.currentTweetView().moveToTop()
 
     def showSettings(self):
+        from SettingWindow import WeSettingsWindow
         wecase_settings = WeSettingsWindow()
-        if wecase_settings.exec_():
-            self.loadConfig()
-            self.applyConfig()
+        # configChanged() will apply the new settings after saving.
+        wecase_settings.exec_()
 
     def showAbout(self):
+        from AboutWindow import AboutWindow
         wecase_about = AboutWindow()
         wecase_about.exec_()
 
+    def showOutbox(self):
+        from OutboxWindow import OutboxWindow
+        self.wecase_outbox = OutboxWindow()
+        self.wecase_outbox.show()
+
+    def outboxItemChanged(self, item):
+        if item["state"] == outbox.SENT:
+            message = {"statuses/update": self.tr("Tweet Success!"),
+                       "statuses/upload": self.tr("Tweet Success!"),
+                       "statuses/repost": self.tr("Retweet Success!"),
+                       "comments/create": self.tr("Comment Success!"),
+                       "comments/reply": self.tr("Reply Success!")}.get(item["endpoint"])
+            if message:
+                self.notify.showMessage(self.tr("WeCase"), message)
+        elif item["state"] == outbox.FAILED:
+            self.notify.showMessage(self.tr("Failed to send"),
+                                    "%s\n%s" % (outbox.summary(item), item["error"]))
+        elif item["state"] == outbox.UNKNOWN:
+            self.notify.showMessage(self.tr("It may not be sent"),
+                                    self.tr("%s\nCheck it and retry it in the outbox.")
+                                    % outbox.summary(item))
+
+    def showMetrics(self):
+        from MetricsWindow import MetricsWindow
+        self.wecase_metrics = MetricsWindow()
+        self.wecase_metrics.show()
+
+    def toggleProfiler(self):
+        import samplingprofiler
+        path = samplingprofiler.toggle(const.cache_path)
+        if path:
+            QtGui.QMessageBox.information(self, self.tr("Profiler"),
+                                          self.tr("Profile saved to %s") % path)
+
     def logout(self):
+        # Forget the access token, the next login authorizes again.
+        login_config = WeCaseConfig(const.config_path, "login")
+        tokens = login_config.tokens
+        for username, token in list(tokens.items()):
+            if token and token.get("uid") == self.info.get("uid"):
+                del tokens[username]
+        login_config.tokens = tokens
+        login_config.save()
+
         self.close()
         # This is a model dialog, if we exec it before we close MainWindow
         # MainWindow won't close
@@ -491,6 +726,7 @@ class WeCaseWindow(QtGui.QMainWindow):
         wecase_login.exec_()
 
     def postTweet(self):
+        from NewpostWindow import NewpostWindow
         self.wecase_new = NewpostWindow()
         self.wecase_new.userClicked.connect(self.userClicked)
         self.wecase_new.tagClicked.connect(self.tagClicked)
@@ -514,6 +750,11 @@ class WeCaseWindow(QtGui.QMainWindow):
         self.systray.hide()
         self.hide()
         self.timer.stop_event.set()
+        self.config.removeListener(self.configChanged)
+        WConnectivity().removeListener(self._connectivityListener)
+        WOutbox().removeListener(self._outboxListener)
+        # Don't send them by the next account.
+        WOutbox().setAccount("")
         self.saveConfig()
         self.timer.join()
         # Reset uid when the thread exited.
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented a write-behind queue of the actions
+#           on statuses, e.g. favorite and delete. One thread sends them
+#           one by one, and an action replaces the pending one with the
+#           same key, so a few clicks become one request at most.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import logging
+import threading
+from collections import OrderedDict
+from connectivity import NETWORK_ERRORS
+
+
+class ActionQueue():
+    """Call the actions in order, INTERVAL seconds apart, in a thread.
+
+    The callback of an action is called with None after it succeeded,
+    or with the exception it raised. Network errors are reported to the
+    connectivity, and the action is sent again when we are online."""
+
+    # Sina limits the rate of the writes.
+    INTERVAL = 0.5
+
+    def __init__(self, connectivity):
+        self._connectivity = connectivity
+        # {key: (value, action, callback)}
+        self._pending = OrderedDict()
+        # (key, value) of the action being sent.
+        self._sending = None
+        self._lock = threading.Lock()
+        self._running = False
+        self._stop_event = threading.Event()
+
+    def put(self, key, value, action, callback=None):
+        """Call action() later. It replaces the pending action with the
+        same key, the value can be read by pending(key) until then."""
+        with self._lock:
+            self._pending[key] = (value, action, callback)
+        self._start()
+
+    def cancel(self, key):
+        """Drop the pending action, return False if there isn't one."""
+        with self._lock:
+            return self._pending.pop(key, None) is not None
+
+    def pending(self, key, default=None):
+        """Return the value of the pending action of the key."""
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key][0]
+        return default
+
+    def sending(self, key, default=None):
+        """Return the value of the action of the key being sent."""
+        sending = self._sending
+        if sending and sending[0] == key:
+            return sending[1]
+        return default
+
+    def __len__(self):
+        return len(self._pending)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _start(self):
+        with self._lock:
+            if self._running or not self._pending:
+                return
+            self._running = True
+        threading.Thread(target=self._run, name="Action queue", daemon=True).start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                if not self._pending or not self._connectivity.online():
+                    self._running = False
+                    break
+                key, (value, action, callback) = self._pending.popitem(last=False)
+                self._sending = (key, value)
+
+            try:
+                action()
+            except NETWORK_ERRORS:
+                self._connectivity.reportFailure()
+                with self._lock:
+                    # Unless it is replaced already.
+                    if key not in self._pending:
+                        self._pending[key] = (value, action, callback)
+                        self._pending.move_to_end(key, last=False)
+            except Exception as e:
+                self._connectivity.reportSuccess()
+                self._report(callback, e)
+            else:
+                self._connectivity.reportSuccess()
+                self._report(callback, None)
+            finally:
+                self._sending = None
+            self._stop_event.wait(self.INTERVAL)
+
+        if self._pending and not self._stop_event.is_set():
+            # Offline, go on when we are online again.
+            self._connectivity.queue(self._start)
+
+    def _report(self, callback, error):
+        if not callback:
+            return
+        try:
+            callback(error)
+        except:
+            logging.exception("Action callback failed")
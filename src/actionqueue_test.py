@@ -0,0 +1,90 @@
+import threading
+import unittest
+from urllib.error import URLError
+from actionqueue import ActionQueue
+from connectivity import Connectivity
+
+
+class ActionQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.reachable = True
+        self.connectivity = Connectivity(probe=self.probe)
+        self.connectivity.PROBE_INTERVAL = 0.01
+        self.connectivity.RETRY_DELAY = 0.01
+        self.queue = ActionQueue(self.connectivity)
+        self.queue.INTERVAL = 0.01
+        self.calls = []
+        self.results = []
+        self.done = threading.Event()
+
+    def tearDown(self):
+        self.queue.stop()
+        self.connectivity.stop()
+
+    def probe(self):
+        if not self.reachable:
+            raise URLError("unreachable")
+
+    def action(self, name, error=None):
+        def action():
+            self.calls.append(name)
+            if error:
+                raise error
+        return action
+
+    def callback(self, error):
+        self.results.append(error)
+        self.done.set()
+
+    def test_order_and_results(self):
+        gate = threading.Event()
+        self.queue.put("first", None, gate.wait)
+        self.queue.put("a", None, self.action("a"), self.callback)
+        self.queue.put("b", None, self.action("b", KeyError()), self.callback)
+        self.done.clear()
+        gate.set()
+        while len(self.results) < 2:
+            self.done.wait(1)
+            self.done.clear()
+        self.assertEqual(self.calls, ["a", "b"])
+        self.assertIsNone(self.results[0])
+        self.assertIsInstance(self.results[1], KeyError)
+
+    def test_coalesce(self):
+        gate = threading.Event()
+        self.queue.put("first", None, gate.wait)
+        self.queue.put(("favorite", 1), True, self.action("on"))
+        self.assertEqual(self.queue.pending(("favorite", 1)), True)
+        self.queue.put(("favorite", 1), False, self.action("off"), self.callback)
+        self.assertEqual(self.queue.pending(("favorite", 1)), False)
+        self.assertTrue(self.queue.cancel(("favorite", 1)))
+        self.assertFalse(self.queue.cancel(("favorite", 1)))
+        self.assertIsNone(self.queue.pending(("favorite", 1)))
+        self.assertEqual(self.queue.sending("first"), None)
+        self.assertEqual(self.queue.sending(("favorite", 1), False), False)
+
+        self.queue.put("last", None, self.action("last"), self.callback)
+        gate.set()
+        self.assertTrue(self.done.wait(1))
+        self.assertEqual(self.calls, ["last"])
+
+    def test_offline(self):
+        failures = [URLError("down")] * Connectivity.FAILURES
+
+        def action():
+            self.calls.append("delete")
+            if failures:
+                # The probe brings us online after we are offline.
+                self.reachable = len(failures) == 1
+                raise failures.pop()
+
+        self.reachable = False
+        self.queue.put(("delete", 1), None, action, self.callback)
+        self.assertTrue(self.done.wait(1))
+        self.assertEqual(self.results, [None])
+        self.assertEqual(len(self.calls), Connectivity.FAILURES + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
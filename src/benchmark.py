@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This file implemented microbenchmarks for the hot paths
+#           of WeCase, and compares them with the stored baselines.
+#           The baselines depend on the machine, so none is shipped:
+#           run "./benchmark.py --save" on yours before changing the code,
+#           then "./benchmark.py" reports the regressions.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import os
+import re
+import sys
+import json
+import argparse
+from time import perf_counter
+
+
+BENCH_PATH = os.path.dirname(os.path.realpath(__file__)) + "/bench/"
+CORPUS_FILE = BENCH_PATH + "corpus.json"
+BASELINE_FILE = BENCH_PATH + "baseline.json"
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a benchmark. The decorated function receives the corpus
+    and returns (function, items), the function is called on each item.
+    Raise ImportError in it if an optional dependency is missing."""
+
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+
+def load_corpus(path=CORPUS_FILE):
+    with open(path) as corpus_file:
+        return json.load(corpus_file)
+
+
+@benchmark("TweetUtils.tweetLength")
+def bench_tweetLength(corpus):
+    from TweetUtils import tweetLength
+    return tweetLength, corpus["tweets"]
+
+
+@benchmark("TweetUtils.TweetLengthCounter")
+def bench_TweetLengthCounter(corpus):
+    from TweetUtils import TweetLengthCounter
+
+    # Simulate typing, the counter receives one more char every time.
+    counter = TweetLengthCounter()
+    prefixes = []
+    for text in corpus["tweets"]:
+        prefixes.extend(text[:i] for i in range(1, len(text) + 1))
+    return counter.update, prefixes
+
+
+@benchmark("TweetUtils.tweetTruncate")
+def bench_tweetTruncate(corpus):
+    from TweetUtils import tweetTruncate
+    texts = ["//@".join(corpus["tweets"][i:] + corpus["tweets"][:i])
+             for i in range(len(corpus["tweets"]))]
+    return tweetTruncate, texts
+
+
+@benchmark("TweetUtils.get_mid")
+def bench_get_mid(corpus):
+    from TweetUtils import get_mid
+    return get_mid, corpus["ids"]
+
+
+@benchmark("WTimeParser.parse")
+def bench_WTimeParser(corpus):
+    from WTimeParser import WTimeParser
+    return WTimeParser().parse, corpus["timestamps"]
+
+
+def _renderer():
+    from TweetListWidget import SingleTweetWidget
+
+    class Renderer():
+        # We don't need a real widget to render the text,
+        # but loading the animations needs a running QApplication.
+        _create_animation = lambda self, path: None
+        _create_mentions = SingleTweetWidget._create_mentions
+        _create_html_url = SingleTweetWidget._create_html_url
+        _create_hashtag = SingleTweetWidget._create_hashtag
+        _create_smiles = SingleTweetWidget._create_smiles
+
+    return Renderer()
+
+
+@benchmark("SingleTweetWidget._create_*")
+def bench_render(corpus):
+    from PyQt4 import QtCore
+    renderer = _renderer()
+
+    def render(text):
+        text = QtCore.Qt.escape(text)
+        text = renderer._create_mentions(text)
+        text = renderer._create_html_url(text)
+        text = renderer._create_hashtag(text)
+        text = renderer._create_smiles(text)
+        return text
+    return render, corpus["tweets"]
+
+
+@benchmark("FaceModel.dic")
+def bench_FaceModel(corpus):
+    from Face import FaceModel
+    faceModel = FaceModel()
+    faceModel.init()
+    names = re.findall(r"\[(.*?)\]", "".join(corpus["tweets"]))
+    return lambda name: faceModel.dic().get(name), names
+
+
+def percentile(sorted_samples, percent):
+    index = int(round(percent / 100 * (len(sorted_samples) - 1)))
+    return sorted_samples[index]
+
+
+def measure(func, items, repeat):
+    """Call func on every item `repeat` times. The percentiles are of
+    the latencies of single calls, the overhead of the timer itself
+    (about 0.1us) is included."""
+
+    # Warm up.
+    for item in items:
+        func(item)
+
+    latencies = []
+    start = perf_counter()
+    for i in range(repeat):
+        for item in items:
+            call_start = perf_counter()
+            func(item)
+            latencies.append(perf_counter() - call_start)
+    total = perf_counter() - start
+
+    latencies.sort()
+    # All times are in microseconds.
+    return {"ops": len(latencies) / total,
+            "p50": percentile(latencies, 50) * 1e6,
+            "p90": percentile(latencies, 90) * 1e6,
+            "p99": percentile(latencies, 99) * 1e6}
+
+
+def run(pattern="", repeat=30, corpus=None):
+    if not corpus:
+        corpus = load_corpus()
+
+    results = {}
+    for name, setup in BENCHMARKS:
+        if not re.search(pattern, name):
+            continue
+        try:
+            func, items = setup(corpus)
+        except (ImportError, OSError) as e:
+            print("%-32s skipped: %s" % (name, e))
+            continue
+        results[name] = measure(func, items, repeat)
+        print("%-32s %12.1f ops/s  p50 %8.2fus  p90 %8.2fus  p99 %8.2fus" %
+              (name, results[name]["ops"], results[name]["p50"],
+               results[name]["p90"], results[name]["p99"]))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return the names of benchmarks which are slower than the
+    baseline by more than threshold (0.1 means 10%)."""
+
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        base_ops = baseline[name]["ops"]
+        change = (result["ops"] - base_ops) / base_ops
+        if change < -threshold:
+            regressions.append(name)
+            state = "REGRESSION"
+        else:
+            state = "ok"
+        print("%-32s %+7.1f%%  %s" % (name, change * 100, state))
+    return regressions
+
+
+RESOURCE_SCRIPT = """
+import sys, time, resource
+from PyQt4 import QtCore
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if sys.argv[1] == "module":
+    import wecase_rc_data
+else:
+    assert QtCore.QResource.registerResource("%s")
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss)
+"""
+
+
+def measure_resources(repeat=5):
+    """Compare importing wecase_rc_data with registering wecase.rcc,
+    each in a fresh interpreter."""
+
+    import subprocess
+    from const import myself_path
+    rcc_path = myself_path + "wecase.rcc"
+    script = RESOURCE_SCRIPT % rcc_path
+
+    for way in ("module", "rcc"):
+        if way == "rcc" and not os.path.exists(rcc_path):
+            print("%-32s skipped: %s is not found, run make.py" % (way, rcc_path))
+            continue
+        times = []
+        try:
+            for i in range(repeat):
+                output = subprocess.check_output([sys.executable, "-c", script, way],
+                                                 cwd=myself_path)
+                elapsed, rss = output.split()
+                times.append(float(elapsed))
+        except subprocess.CalledProcessError as e:
+            print("%-32s failed: %s" % (way, e))
+            continue
+        print("%-32s %8.2fms  max RSS +%s KiB" %
+              ("resources (%s)" % way, min(times) * 1000, rss.decode()))
+
+
+SCALES = (1000, 10000, 100000)
+# Creating the widgets of 100k statuses takes forever, and it is
+# not what the users do.
+VIEW_SCALE_LIMIT = 10000
+PAGE_SIZE = 20
+SCALE_BENCHMARKS = []
+
+
+def scale_benchmark(name):
+    """Register a scale benchmark. The decorated function receives the
+    statuses and returns a function, which is timed once. Raise
+    ImportError in it if an optional dependency is missing."""
+
+    def register(setup):
+        SCALE_BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+
+def _pages(statuses):
+    return [statuses[i:i + PAGE_SIZE] for i in range(0, len(statuses), PAGE_SIZE)]
+
+
+@scale_benchmark("model.appendRows")
+def scale_appendRows(statuses):
+    from Tweet import TweetSimpleModel
+
+    def append():
+        model = TweetSimpleModel()
+        for page in _pages(statuses):
+            model.appendRows(page)
+    return append
+
+
+@scale_benchmark("model.insertRows(0)")
+def scale_insertRows(statuses):
+    from Tweet import TweetSimpleModel
+
+    def insert():
+        # New statuses are always inserted at the top, oldest first.
+        model = TweetSimpleModel()
+        for page in _pages(statuses[::-1]):
+            model.insertRows(0, page)
+    return insert
+
+
+@scale_benchmark("model.filter")
+def scale_filter(statuses):
+    from Tweet import TweetTimelineBaseModel
+    model = TweetTimelineBaseModel()
+    model.setTweetsKeywordsBlacklist(["广告", "转发抽奖", "Android"])
+    model.setUsersBlacklist([status["user"]["screen_name"] for status in statuses[:10]])
+    return lambda: model.filter(statuses)
+
+
+@scale_benchmark("SingleTweetWidget._create_*")
+def scale_render(statuses):
+    from PyQt4 import QtCore
+    renderer = _renderer()
+
+    def render():
+        for status in statuses:
+            text = QtCore.Qt.escape(status["text"])
+            text = renderer._create_mentions(text)
+            text = renderer._create_html_url(text)
+            text = renderer._create_hashtag(text)
+            renderer._create_smiles(text)
+    return render
+
+
+@scale_benchmark("SimpleTweetListWidget")
+def scale_view(statuses):
+    if len(statuses) > VIEW_SCALE_LIMIT:
+        raise ImportError("more than %d statuses" % VIEW_SCALE_LIMIT)
+    app = _application()
+    from Tweet import TweetTimelineBaseModel
+    from TweetListWidget import SimpleTweetListWidget
+
+    def view():
+        model = TweetTimelineBaseModel()
+        widget = SimpleTweetListWidget()
+        widget.setModel(model)
+        for page in _pages(statuses):
+            model.appendRows(page)
+            app.processEvents()
+        widget.deleteLater()
+        app.processEvents()
+    return view
+
+
+def _application():
+    if not os.environ.get("DISPLAY"):
+        # Qt 4 aborts without a X server.
+        raise ImportError("no display, try xvfb-run")
+    from PyQt4 import QtGui
+    global _app
+    _app = QtGui.QApplication.instance() or QtGui.QApplication([])
+    return _app
+
+
+def _image_server():
+    """Serve the images of the statuses locally, the views should not
+    download from Sina."""
+
+    import threading
+    from fakeweibo import FakeWeiboServer
+    server = FakeWeiboServer(("127.0.0.1", 0), {})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.url + "/images"
+
+
+def measure_memory(statuses):
+    """Return the bytes allocated by Python for a model of the statuses.
+    The memory of Qt is not counted."""
+
+    import gc
+    import tracemalloc
+    from Tweet import TweetSimpleModel
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    model = TweetSimpleModel()
+    for page in _pages(statuses):
+        model.appendRows(page)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del model
+    return after - before
+
+
+def run_scale(pattern="", scales=SCALES):
+    from corpusgen import CorpusGenerator
+
+    image_host = _image_server()
+    results = {}
+    for scale in scales:
+        generator = CorpusGenerator(image_host=image_host, avatar_host=image_host)
+        statuses = generator.statuses(scale)[::-1]
+
+        for name, setup in SCALE_BENCHMARKS:
+            if not re.search(pattern, name):
+                continue
+            try:
+                func = setup(statuses)
+            except (ImportError, OSError) as e:
+                print("%-32s %7d  skipped: %s" % (name, scale, e))
+                continue
+            start = perf_counter()
+            func()
+            elapsed = perf_counter() - start
+            results["%s@%d" % (name, scale)] = {"ops": scale / elapsed}
+            print("%-32s %7d  %10.1fms  %8.2fus/status" %
+                  (name, scale, elapsed * 1000, elapsed / scale * 1e6))
+
+        if re.search(pattern, "memory"):
+            try:
+                size = measure_memory(statuses)
+            except ImportError as e:
+                print("%-32s %7d  skipped: %s" % ("memory", scale, e))
+                continue
+            print("%-32s %7d  %10.1fMiB  %8.0fB/status" %
+                  ("memory", scale, size / 2 ** 20, size / scale))
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="WeCase microbenchmarks")
+    parser.add_argument("-k", dest="pattern", default="",
+                        help="only run benchmarks matching this regex")
+    parser.add_argument("-n", dest="repeat", type=int, default=30,
+                        help="passes over the corpus per benchmark (default: 30)")
+    parser.add_argument("--baseline", default=BASELINE_FILE,
+                        help="baseline file (default: bench/baseline.json)")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed slowdown before reporting a "
+                             "regression (default: 0.1, means 10%%)")
+    parser.add_argument("--save", action="store_true",
+                        help="store the results as the new baseline")
+    parser.add_argument("--resources", action="store_true",
+                        help="measure the cost of loading the resources")
+    parser.add_argument("--scale", nargs="?", const=",".join(map(str, SCALES)),
+                        help="run the scale benchmarks with synthetic statuses, "
+                             "at the comma-separated sizes (default: %s)" %
+                             ",".join(map(str, SCALES)))
+    args = parser.parse_args(argv)
+
+    if args.resources:
+        measure_resources()
+        return 0
+
+    if args.scale:
+        results = run_scale(args.pattern, [int(n) for n in args.scale.split(",")])
+    else:
+        results = run(args.pattern, args.repeat)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                baseline = json.load(baseline_file)
+        baseline.update(results)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baseline, baseline_file, indent=4, sort_keys=True)
+        print("Baseline saved to %s" % args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline, run with --save to create one.")
+        return 0
+
+    print()
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if compare(results, baseline, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
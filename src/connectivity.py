@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented a tracker of the connectivity to Sina.
+#           We are offline after a few network failures in a row, then
+#           the timelines are read from the local store, and the actions
+#           of users are queued until we are online again.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import socket
+import logging
+import threading
+from collections import deque
+from http.client import HTTPException
+from urllib.error import URLError
+from urllib.parse import urlsplit
+import const
+
+
+# Not all OSError, a missing file is not the fault of the network.
+NETWORK_ERRORS = (HTTPException, URLError, ConnectionError,
+                  socket.timeout, socket.gaierror)
+DEFAULT_API_URL = "https://api.weibo.com/2/"
+
+
+def _connectToAPI(timeout=5):
+    """Raise OSError if the API server can't be connected."""
+    url = urlsplit(getattr(const.client, "api_url", None) or DEFAULT_API_URL)
+    port = url.port or (443 if url.scheme == "https" else 80)
+    socket.create_connection((url.hostname, port), timeout).close()
+
+
+class Connectivity():
+    """We go offline after FAILURES network failures in a row, and a
+    probe thread tries to connect every PROBE_INTERVAL seconds. Any
+    successful request brings us online again.
+
+    Listeners are called with the new state, in the thread which
+    changed it."""
+
+    FAILURES = 3
+    PROBE_INTERVAL = 15
+    # Wait a moment before retrying a failed queued action.
+    RETRY_DELAY = 1
+
+    def __init__(self, probe=_connectToAPI):
+        self._probe = probe
+        self._online = True
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._listeners = []
+        self._pending = deque()
+        self._probing = False
+        self._flushing = False
+
+    def online(self):
+        return self._online
+
+    def reportSuccess(self):
+        if self._online and not self._failures and not self._pending:
+            return
+
+        with self._lock:
+            self._failures = 0
+            changed = not self._online
+            self._online = True
+        if changed:
+            logging.info("Online")
+            self._notify(True)
+        self._flush()
+
+    def reportFailure(self):
+        with self._lock:
+            self._failures += 1
+            if not self._online or self._failures < self.FAILURES:
+                return
+            self._online = False
+        logging.info("Offline")
+        self._notify(False)
+        self._startProbe()
+
+    def queue(self, action):
+        """Call action() in a thread when we are online, again and again
+        until it doesn't fail because of the network."""
+        with self._lock:
+            self._pending.append(action)
+        if self._online:
+            self._flush()
+
+    def pending(self):
+        return len(self._pending)
+
+    def addListener(self, listener):
+        self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        self._listeners.remove(listener)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _notify(self, online):
+        for listener in list(self._listeners):
+            listener(online)
+
+    def _startProbe(self):
+        with self._lock:
+            if self._probing:
+                return
+            self._probing = True
+        threading.Thread(target=self._probeLoop, name="Connectivity probe",
+                         daemon=True).start()
+
+    def _probeLoop(self):
+        while not self._online and not self._stop_event.wait(self.PROBE_INTERVAL):
+            try:
+                self._probe()
+            except OSError:
+                # e.g. the network is unreachable.
+                continue
+            self.reportSuccess()
+
+        with self._lock:
+            self._probing = False
+        if not self._online and not self._stop_event.is_set():
+            # Offline again before we exited.
+            self._startProbe()
+
+    def _flush(self):
+        with self._lock:
+            if self._flushing or not self._pending:
+                return
+            self._flushing = True
+        threading.Thread(target=self._flushLoop, name="Connectivity queue",
+                         daemon=True).start()
+
+    def _flushLoop(self):
+        while True:
+            with self._lock:
+                if not self._pending or not self._online:
+                    self._flushing = False
+                    return
+                action = self._pending.popleft()
+
+            try:
+                action()
+            except NETWORK_ERRORS:
+                with self._lock:
+                    self._pending.appendleft(action)
+                self.reportFailure()
+                self._stop_event.wait(self.RETRY_DELAY)
+            except:
+                logging.exception("Queued action failed")
@@ -0,0 +1,70 @@
+import threading
+import unittest
+from urllib.error import URLError
+from connectivity import Connectivity
+
+
+class ConnectivityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.reachable = False
+        self.connectivity = Connectivity(probe=self.probe)
+        self.connectivity.PROBE_INTERVAL = 0.01
+        self.connectivity.RETRY_DELAY = 0.01
+        self.changes = []
+        self.changed = threading.Event()
+        self.connectivity.addListener(self.listener)
+
+    def tearDown(self):
+        self.connectivity.stop()
+
+    def probe(self):
+        if not self.reachable:
+            raise URLError("unreachable")
+
+    def listener(self, online):
+        self.changes.append(online)
+        self.changed.set()
+
+    def test_offline_and_online(self):
+        self.connectivity.reportFailure()
+        self.connectivity.reportFailure()
+        self.assertTrue(self.connectivity.online())
+        self.connectivity.reportSuccess()
+        for i in range(Connectivity.FAILURES):
+            self.connectivity.reportFailure()
+        self.assertFalse(self.connectivity.online())
+        self.assertEqual(self.changes, [False])
+
+        # The probe brings us online.
+        self.changed.clear()
+        self.reachable = True
+        self.assertTrue(self.changed.wait(5))
+        self.assertTrue(self.connectivity.online())
+        self.assertEqual(self.changes, [False, True])
+
+    def test_queue(self):
+        done = threading.Event()
+        calls = []
+
+        def action():
+            calls.append(1)
+            if len(calls) == 1:
+                raise URLError("timeout")
+            done.set()
+
+        for i in range(Connectivity.FAILURES):
+            self.connectivity.reportFailure()
+        self.connectivity.queue(action)
+        self.assertEqual(self.connectivity.pending(), 1)
+        self.assertEqual(calls, [])
+
+        # Failed once, and retried.
+        self.reachable = True
+        self.assertTrue(done.wait(5))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.connectivity.pending(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This file implemented a generator of synthetic statuses and
+#           comments, which look like the JSON of Sina Weibo API, for
+#           the scale benchmarks and fakeweibo.py.
+#
+#           $ ./corpusgen.py 10000 -o corpus.json
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import sys
+import json
+import time
+import random
+import argparse
+
+
+# Common Chinese characters, weighted by nothing but our taste.
+CJK_CHARS = ("的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得"
+             "里后自以会家可下而过天去能对小多然于心学么之都好看起发当没成只如事把还用"
+             "第样道想作种开美总从无情己面最女但现前些所同日手又行意动方期它头经长儿回"
+             "位分爱老因很给名法间斯知世什两次使身者被高已亲其进此话常与活正感微博今晚"
+             "吃饭哈笑转发评论图片视频音乐电影")
+ASCII_WORDS = ("Linux", "WeCase", "Python", "Qt", "GitHub", "OK", "iPhone", "lol", "2013")
+SMILEYS = ("[哈哈]", "[嘻嘻]", "[爱你]", "[泪]", "[衰]", "[good]", "[围观]", "[威武]",
+           "[偷笑]", "[鼓掌]", "[嘘]", "[怒]", "[赞]", "[doge]")
+SOURCES = ('<a href="http://weibo.com/" rel="nofollow">新浪微博</a>',
+           '<a href="http://app.weibo.com/t/feed/5yiHuw" rel="nofollow">iPhone客户端</a>',
+           '<a href="http://app.weibo.com/t/feed/9ksdit" rel="nofollow">Android客户端</a>',
+           '<a href="https://github.com/WeCase/WeCase" rel="nofollow">WeCase</a>')
+BASE62 = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+FIRST_STATUS_ID = 3500000000000000
+FIRST_COMMENT_ID = 3600000000000000
+FIRST_USER_ID = 1000000000
+
+
+def timestamp(seconds):
+    """Format the time like Sina, in UTC+8."""
+    return time.strftime("%a %b %d %H:%M:%S +0800 %Y", time.gmtime(seconds + 8 * 3600))
+
+
+class CorpusGenerator():
+    """All the rates are probabilities per status (or per comment),
+    the length of a text is drawn from a triangular distribution of
+    text_length = (min, max, mode) chars."""
+
+    def __init__(self, seed=0, users=500,
+                 retweet_rate=0.3, picture_rate=0.25, comment_rate=0.5,
+                 mention_rate=0.3, url_rate=0.2, hashtag_rate=0.1, smiley_rate=0.3,
+                 text_length=(4, 140, 30), interval=60,
+                 image_host="http://ww%d.sinaimg.cn", avatar_host="http://tp%d.sinaimg.cn"):
+        self.rand = random.Random(seed)
+        self.retweet_rate = retweet_rate
+        self.picture_rate = picture_rate
+        self.comment_rate = comment_rate
+        self.mention_rate = mention_rate
+        self.url_rate = url_rate
+        self.hashtag_rate = hashtag_rate
+        self.smiley_rate = smiley_rate
+        self.text_length = text_length
+        self.interval = interval
+        self.image_host = image_host
+        self.avatar_host = avatar_host
+        self.topics = [self._chars(2, 6) for i in range(max(users // 10, 1))]
+        self.users = [self._user(i) for i in range(users)]
+
+    def _chars(self, min, max):
+        return "".join(self.rand.choice(CJK_CHARS)
+                       for i in range(self.rand.randint(min, max)))
+
+    def _host(self, pattern):
+        return pattern % self.rand.randint(1, 4) if "%d" in pattern else pattern
+
+    def _user(self, index):
+        uid = FIRST_USER_ID + index
+        if self.rand.random() < 0.5:
+            name = self._chars(2, 6) + str(index)
+        else:
+            name = "%s_%d" % (self.rand.choice(ASCII_WORDS), index)
+        avatar = self._host(self.avatar_host)
+        return {"id": uid, "idstr": str(uid), "screen_name": name, "name": name,
+                "description": self._chars(0, 30),
+                "profile_image_url": "%s/%d/50/0/1" % (avatar, uid),
+                "avatar_large": "%s/%d/180/0/1" % (avatar, uid),
+                "verified": False,
+                "verified_type": self.rand.choice((-1, -1, -1, 0, 2, 220)),
+                "verified_reason": "",
+                "followers_count": int(self.rand.paretovariate(1.2)) * 10,
+                "friends_count": self.rand.randint(0, 2000),
+                "statuses_count": self.rand.randint(0, 50000)}
+
+    def _url(self):
+        return "http://t.cn/" + "".join(self.rand.choice(BASE62) for i in range(7))
+
+    def text(self):
+        min, max, mode = self.text_length
+        length = int(self.rand.triangular(min, max, mode))
+        parts = []
+        while length > 0:
+            roll = self.rand.random()
+            if roll < 0.85:
+                parts.append(self._chars(1, 10))
+            elif roll < 0.95:
+                parts.append(" %s " % self.rand.choice(ASCII_WORDS))
+            else:
+                parts.append("，")
+            length -= len(parts[-1])
+        if self.rand.random() < self.smiley_rate:
+            for i in range(self.rand.randint(1, 3)):
+                parts.insert(self.rand.randint(0, len(parts)), self.rand.choice(SMILEYS))
+        if self.rand.random() < self.hashtag_rate:
+            parts.insert(0, "#%s#" % self.rand.choice(self.topics))
+        if self.rand.random() < self.mention_rate:
+            for i in range(self.rand.randint(1, 3)):
+                user = self.rand.choice(self.users)
+                parts.insert(self.rand.randint(0, len(parts)), "@%s " % user["screen_name"])
+        if self.rand.random() < self.url_rate:
+            parts.append(" " + self._url())
+        return "".join(parts)
+
+    def _pictures(self, status):
+        host = self._host(self.image_host)
+        name = "%xjw1e%s.jpg" % (status["user"]["id"], "".join(
+            self.rand.choice(BASE62[:36]) for i in range(10)))
+        status["thumbnail_pic"] = "%s/thumbnail/%s" % (host, name)
+        status["bmiddle_pic"] = "%s/bmiddle/%s" % (host, name)
+        status["original_pic"] = "%s/large/%s" % (host, name)
+        status["pic_urls"] = [{"thumbnail_pic": status["thumbnail_pic"]}]
+
+    def statuses(self, count, start=None):
+        """Return `count` statuses, oldest first."""
+        if start is None:
+            start = int(time.time()) - count * self.interval
+
+        statuses = []
+        for i in range(count):
+            id = FIRST_STATUS_ID + i
+            status = {"id": id, "mid": str(id), "idstr": str(id),
+                      "created_at": timestamp(start + i * self.interval),
+                      "text": self.text(),
+                      "source": self.rand.choice(SOURCES),
+                      "user": self.rand.choice(self.users),
+                      "favorited": False, "truncated": False,
+                      "reposts_count": 0, "comments_count": 0, "attitudes_count": 0}
+
+            if statuses and self.rand.random() < self.retweet_rate:
+                original = self.rand.choice(statuses)
+                # Like Sina, always point to the root status.
+                if "retweeted_status" in original:
+                    # Retweeting a retweet, keep the chain in the text.
+                    status["text"] += "//@%s:%s" % (original["user"]["screen_name"],
+                                                    original["text"].split("//@")[0])
+                    original = original["retweeted_status"]
+                original["reposts_count"] += 1
+                status["retweeted_status"] = original
+            elif self.rand.random() < self.picture_rate:
+                self._pictures(status)
+            statuses.append(status)
+        return statuses
+
+    def comments(self, count, statuses):
+        """Return `count` comments on the statuses, oldest first."""
+        comments = []
+        for i in range(count):
+            id = FIRST_COMMENT_ID + i
+            status = self.rand.choice(statuses)
+            status["comments_count"] += 1
+            text = self.text()
+            if comments and self.rand.random() < 0.3:
+                text = "回复@%s:%s" % (self.rand.choice(comments)["user"]["screen_name"], text)
+            comments.append({"id": id, "mid": str(id), "idstr": str(id),
+                             "created_at": status["created_at"],
+                             "text": text, "source": self.rand.choice(SOURCES),
+                             "user": self.rand.choice(self.users),
+                             "status": status})
+        return comments
+
+    def dataset(self, count):
+        """Return {"users": [], "statuses": [], "comments": []},
+        the format which fakeweibo.py reads."""
+        statuses = self.statuses(count)
+        comments = self.comments(int(count * self.comment_rate), statuses)
+        return {"users": self.users, "statuses": statuses, "comments": comments}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic statuses.")
+    parser.add_argument("count", type=int, help="number of statuses")
+    parser.add_argument("-o", dest="output", help="output file (default: stdout)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    dataset = CorpusGenerator(args.seed, args.users).dataset(args.count)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(dataset, output, ensure_ascii=False)
+    else:
+        json.dump(dataset, sys.stdout, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import json
+import unittest
+from corpusgen import CorpusGenerator, SMILEYS
+
+
+class CorpusGeneratorTest(unittest.TestCase):
+
+    def test_deterministic(self):
+        first = json.dumps(CorpusGenerator(seed=1, users=10).dataset(50), sort_keys=True)
+        second = json.dumps(CorpusGenerator(seed=1, users=10).dataset(50), sort_keys=True)
+        self.assertEqual(first, second)
+
+    def test_dataset(self):
+        dataset = CorpusGenerator(users=10, comment_rate=0.5).dataset(200)
+        statuses = dataset["statuses"]
+        self.assertEqual(len(statuses), 200)
+        self.assertEqual(len(dataset["comments"]), 100)
+        self.assertEqual(len(dataset["users"]), 10)
+
+        ids = [status["id"] for status in statuses]
+        self.assertEqual(ids, sorted(set(ids)))
+        for status in statuses:
+            original = status.get("retweeted_status")
+            if original:
+                self.assertNotIn("retweeted_status", original)
+                self.assertNotIn("thumbnail_pic", status)
+        self.assertEqual(sum(status["reposts_count"] for status in statuses),
+                         sum(1 for status in statuses if "retweeted_status" in status))
+
+    def test_rates(self):
+        generator = CorpusGenerator(users=10, retweet_rate=0, picture_rate=1,
+                                    mention_rate=1, url_rate=1, hashtag_rate=1,
+                                    smiley_rate=1, text_length=(10, 20, 15))
+        for status in generator.statuses(20):
+            text = status["text"]
+            self.assertNotIn("retweeted_status", status)
+            self.assertIn("thumbnail_pic", status)
+            self.assertIn("@", text)
+            self.assertIn("http://t.cn/", text)
+            self.assertRegex(text, "#.+#")
+            self.assertTrue(any(smiley in text for smiley in SMILEYS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This file implemented a local stand-in of the Sina Weibo API
+#           for load testing, with latency and fault injection.
+#
+#           $ ./fakeweibo.py --port 8123 --latency 0.3 --error-rate 0.05
+#
+#           Then set api_server = http://127.0.0.1:8123 in the [login]
+#           section of the config, any username and password can login.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import re
+import sys
+import json
+import time
+import zlib
+import struct
+import random
+import argparse
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qsl
+from corpusgen import CorpusGenerator, timestamp
+
+
+DEFAULT_COUNT = 20
+RATE_LIMIT_WINDOW = 3600
+SINAIMG_RE = re.compile(r"http://(\w+)\.sinaimg\.cn/")
+
+
+class APIError(Exception):
+    def __init__(self, status, error_code, error):
+        super(APIError, self).__init__(error)
+        self.status = status
+        self.error_code = error_code
+        self.error = error
+
+
+def placeholder_png(width=50, height=50, color=(0x80, 0x80, 0x80)):
+    def chunk(typ, body):
+        return (struct.pack(">I", len(body)) + typ + body +
+                struct.pack(">I", zlib.crc32(typ + body) & 0xffffffff))
+
+    row = b"\0" + bytes(color) * width
+    return (b"\x89PNG\r\n\x1a\n" +
+            chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(row * height)) +
+            chunk(b"IEND", b""))
+
+
+class FakeWeibo():
+    """The API, without HTTP. call() returns the object to be sent
+    as JSON, or raises APIError."""
+
+    def __init__(self, data, image_url=None):
+        self.lock = threading.Lock()
+        self.image_url = image_url
+        self.users = data.get("users", [])
+        self.statuses = sorted(data.get("statuses", []), key=lambda s: s["id"], reverse=True)
+        self.comments = sorted(data.get("comments", []), key=lambda c: c["id"], reverse=True)
+        self.next_id = max([s["id"] for s in self.statuses + self.comments] + [4000000000000000]) + 1
+        self.rand = random.Random(0)
+
+        self.handlers = {}
+        for name in dir(self):
+            if name.startswith("GET_") or name.startswith("POST_"):
+                method, path = name.split("_", 1)
+                self.handlers[(method, path.replace("__", "/"))] = getattr(self, name)
+
+    def _rewriteImages(self, obj):
+        if not self.image_url:
+            return obj
+        text = json.dumps(obj, ensure_ascii=False)
+        text = SINAIMG_RE.sub(self.image_url + r"\1/", text)
+        return json.loads(text)
+
+    def call(self, method, path, params):
+        handler = self.handlers.get((method, path))
+        if not handler:
+            raise APIError(400, 10014, "Insufficient app permissions!")
+        with self.lock:
+            return self._rewriteImages(handler(params))
+
+    # Helpers
+
+    def _newId(self):
+        self.next_id += 1
+        return self.next_id
+
+    def _page(self, items, params):
+        count = int(params.get("count", DEFAULT_COUNT))
+        since_id = int(params.get("since_id", 0))
+        max_id = int(params.get("max_id", 0))
+        if since_id:
+            items = [item for item in items if item["id"] > since_id]
+        if max_id:
+            items = [item for item in items if item["id"] <= max_id]
+        page = int(params.get("page", 1))
+        return items[(page - 1) * count:page * count]
+
+    def _timeline(self, key, items, params):
+        return {key: self._page(items, params), "total_number": len(items),
+                "previous_cursor": 0, "next_cursor": 0}
+
+    def _find(self, items, id):
+        for item in items:
+            if item["id"] == int(id):
+                return item
+        raise APIError(400, 20101, "Target weibo does not exist!")
+
+    def _user(self, params):
+        for user in self.users:
+            if (str(user["id"]) == params.get("uid") or
+                    user["screen_name"] == params.get("screen_name")):
+                return user
+        raise APIError(400, 20003, "User does not exists!")
+
+    def _me(self):
+        return self.users[0]
+
+    # OAuth
+
+    def POST_oauth2__access_token(self, params):
+        return {"access_token": "fake-%d" % self.rand.randint(0, 1 << 32),
+                "expires_in": 157679999, "remind_in": 157679999,
+                "uid": str(self._me()["id"])}
+
+    # Timelines
+
+    def GET_statuses__home_timeline(self, params):
+        return self._timeline("statuses", self.statuses, params)
+
+    def GET_statuses__mentions(self, params):
+        mentions = [status for status in self.statuses if status["id"] % 5 == 0]
+        return self._timeline("statuses", mentions, params)
+
+    def GET_statuses__user_timeline(self, params):
+        uid = int(params.get("uid", self._me()["id"]))
+        statuses = [status for status in self.statuses if status["user"]["id"] == uid]
+        return self._timeline("statuses", statuses, params)
+
+    def GET_statuses__repost_timeline(self, params):
+        id = int(params["id"])
+        reposts = [status for status in self.statuses
+                   if status.get("retweeted_status", {}).get("id") == id]
+        return self._timeline("reposts", reposts, params)
+
+    def GET_search__topics(self, params):
+        topic = "#%s#" % params.get("q", "")
+        statuses = [status for status in self.statuses if topic in status["text"]]
+        return self._timeline("statuses", statuses, params)
+
+    def GET_comments__to_me(self, params):
+        return self._timeline("comments", self.comments, params)
+
+    def GET_comments__show(self, params):
+        id = int(params["id"])
+        comments = [comment for comment in self.comments if comment["status"]["id"] == id]
+        return self._timeline("comments", comments, params)
+
+    def GET_statuses__show(self, params):
+        return self._find(self.statuses, params["id"])
+
+    def GET_statuses__count(self, params):
+        ids = set(int(id) for id in params["ids"].split(","))
+        return [{"id": status["id"], "comments": status["comments_count"],
+                 "reposts": status["reposts_count"], "attitudes": status["attitudes_count"]}
+                for status in self.statuses if status["id"] in ids]
+
+    # Users
+
+    def GET_users__show(self, params):
+        return self._user(params)
+
+    def GET_account__get_uid(self, params):
+        return {"uid": self._me()["id"]}
+
+    def GET_search__suggestions__at_users(self, params):
+        q = params.get("q", "")
+        count = int(params.get("count", 10))
+        users = [user for user in self.users if user["screen_name"].startswith(q)]
+        return [{"uid": user["id"], "nickname": user["screen_name"], "remark": ""}
+                for user in users[:count]]
+
+    # Reminds
+
+    def GET_remind__unread_count(self, params):
+        return {"status": self.rand.randint(0, 20), "follower": 0,
+                "cmt": self.rand.randint(0, 3), "dm": 0,
+                "mention_status": self.rand.randint(0, 3), "mention_cmt": 0,
+                "group": 0, "notice": 0, "invite": 0, "badge": 0, "photo": 0}
+
+    def POST_remind__set_count(self, params):
+        return {"result": True}
+
+    # Writes
+
+    def _newStatus(self, text):
+        id = self._newId()
+        status = {"id": id, "mid": str(id), "idstr": str(id),
+                  "created_at": timestamp(time.time()), "text": text,
+                  "source": '<a href="http://weibo.com/" rel="nofollow">WeCase</a>',
+                  "user": self._me(), "favorited": False,
+                  "reposts_count": 0, "comments_count": 0, "attitudes_count": 0}
+        self.statuses.insert(0, status)
+        return status
+
+    def POST_statuses__update(self, params):
+        return self._newStatus(params.get("status", ""))
+
+    def POST_statuses__upload(self, params):
+        return self._newStatus(params.get("status", ""))
+
+    def POST_statuses__repost(self, params):
+        original = self._find(self.statuses, params["id"])
+        original = original.get("retweeted_status", original)
+        original["reposts_count"] += 1
+        status = self._newStatus(params.get("status", ""))
+        status["retweeted_status"] = original
+        return status
+
+    def POST_statuses__destroy(self, params):
+        status = self._find(self.statuses, params["id"])
+        self.statuses.remove(status)
+        return status
+
+    def _newComment(self, params):
+        status = self._find(self.statuses, params["id"])
+        status["comments_count"] += 1
+        id = self._newId()
+        comment = {"id": id, "mid": str(id), "idstr": str(id),
+                   "created_at": timestamp(time.time()),
+                   "text": params.get("comment", ""),
+                   "source": '<a href="http://weibo.com/" rel="nofollow">WeCase</a>',
+                   "user": self._me(), "status": status}
+        self.comments.insert(0, comment)
+        return comment
+
+    def POST_comments__create(self, params):
+        return self._newComment(params)
+
+    def POST_comments__reply(self, params):
+        self._find(self.comments, params["cid"])
+        return self._newComment(params)
+
+    def POST_comments__destroy(self, params):
+        comment = self._find(self.comments, params["cid"])
+        self.comments.remove(comment)
+        return comment
+
+    def POST_favorites__create(self, params):
+        status = self._find(self.statuses, params["id"])
+        status["favorited"] = True
+        return {"status": status, "tags": [], "favorited_time": timestamp(time.time())}
+
+    def POST_favorites__destroy(self, params):
+        status = self._find(self.statuses, params["id"])
+        status["favorited"] = False
+        return {"status": status, "tags": [], "favorited_time": timestamp(time.time())}
+
+
+class Faults():
+    """Decide the fate of a request."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, truncate_rate=0.0,
+                 rate_limit=0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.rate_limit = rate_limit
+        self.rand = random.Random(seed)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def delay(self):
+        if self.latency:
+            time.sleep(self.rand.expovariate(1 / self.latency))
+
+    def check(self):
+        """Raise APIError for an injected error or an exceeded rate limit."""
+        with self.lock:
+            if self.rate_limit:
+                now = time.time()
+                self.requests = [t for t in self.requests if now - t < RATE_LIMIT_WINDOW]
+                if len(self.requests) >= self.rate_limit:
+                    raise APIError(403, 10023, "User requests out of rate limit!")
+                self.requests.append(now)
+            if self.rand.random() < self.error_rate:
+                raise APIError(500, 10001, "System error")
+
+    def truncate(self, body):
+        with self.lock:
+            if body and self.rand.random() < self.truncate_rate:
+                return body[:self.rand.randint(0, len(body) - 1)]
+        return body
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super(RequestHandler, self).log_message(format, *args)
+
+    def _params(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        if self.command == "POST":
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                params.update(parse_qsl(body.decode("utf-8")))
+            elif b"name=\"status\"" in body:
+                # multipart/form-data of statuses/upload, only the text matters.
+                match = re.search(rb'name="status"\r\n\r\n(.*?)\r\n--', body, re.S)
+                if match:
+                    params["status"] = match.group(1).decode("utf-8")
+        return url.path, params
+
+    def _send(self, status, body, content_type, headers=()):
+        full_length = len(body)
+        body = self.server.faults.truncate(body)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", full_length)
+        for header in headers:
+            self.send_header(*header)
+        if len(body) < full_length:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sendJSON(self, status, obj):
+        self._send(status, json.dumps(obj, ensure_ascii=False).encode("utf-8"),
+                   "application/json;charset=UTF-8")
+
+    def _handle(self):
+        path, params = self._params()
+        self.server.faults.delay()
+
+        if path.startswith("/images/"):
+            self._send(200, placeholder_png(), "image/png")
+            return
+
+        if path == "/oauth2/authorize":
+            # Any username and password is right.
+            redirect_uri = params.get("redirect_uri", "")
+            self._send(302, b"", "text/html", [("Location", redirect_uri + "?code=fake")])
+            return
+
+        api = path[len("/2/"):-len(".json")] if path.startswith("/2/") else path[1:]
+        try:
+            self.server.faults.check()
+            obj = self.server.api.call(self.command, api, params)
+        except APIError as e:
+            self._sendJSON(e.status, {"error": e.error, "error_code": e.error_code,
+                                      "request": path})
+        except (KeyError, ValueError):
+            self._sendJSON(400, {"error": "Param error", "error_code": 10008,
+                                 "request": path})
+        else:
+            self._sendJSON(200, obj)
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class FakeWeiboServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, data, faults=None, verbose=False):
+        HTTPServer.__init__(self, address, RequestHandler)
+        host, port = self.server_address[:2]
+        self.url = "http://%s:%d" % (host, port)
+        self.api = FakeWeibo(data, self.url + "/images/")
+        self.faults = faults or Faults()
+        self.verbose = verbose
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A local stand-in of the Sina Weibo API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--data", help="a JSON file of users, statuses and comments, "
+                                       "instead of the synthetic data")
+    parser.add_argument("--statuses", type=int, default=1000,
+                        help="number of synthetic statuses")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="mean latency of the responses, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="probability of a 500 error")
+    parser.add_argument("--truncate-rate", type=float, default=0.0,
+                        help="probability of a truncated body")
+    parser.add_argument("--rate-limit", type=int, default=0,
+                        help="requests per hour before returning 403")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.data:
+        with open(args.data) as data_file:
+            data = json.load(data_file)
+    else:
+        data = CorpusGenerator(args.seed or 0).dataset(args.statuses)
+
+    faults = Faults(args.latency, args.error_rate, args.truncate_rate,
+                    args.rate_limit, args.seed)
+    server = FakeWeiboServer((args.host, args.port), data, faults, args.verbose)
+    print("Serving the fake API at %s" % server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
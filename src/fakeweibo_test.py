@@ -0,0 +1,71 @@
+import json
+import threading
+import unittest
+import urllib.request
+import urllib.error
+from fakeweibo import FakeWeibo, FakeWeiboServer, Faults, APIError
+from corpusgen import CorpusGenerator, FIRST_USER_ID
+
+
+class FakeWeiboTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeWeibo(CorpusGenerator(users=5).dataset(100))
+
+    def test_pages(self):
+        get = lambda **params: self.api.call("GET", "statuses/home_timeline",
+                                             {k: str(v) for k, v in params.items()})["statuses"]
+        first = get()
+        self.assertEqual(len(first), 20)
+        ids = [status["id"] for status in first]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+        older = get(max_id=ids[-1])
+        self.assertEqual(older[0]["id"], ids[-1])
+        self.assertEqual(get(page=2)[:19], older[1:])
+        self.assertEqual(get(since_id=ids[1]), first[:1])
+
+    def test_writes(self):
+        status = self.api.call("POST", "statuses/update", {"status": "Hello"})
+        self.assertEqual(self.api.call("GET", "statuses/home_timeline", {})["statuses"][0], status)
+        comment = self.api.call("POST", "comments/create", {"id": str(status["id"]),
+                                                            "comment": "Hi"})
+        comments = self.api.call("GET", "comments/show", {"id": str(status["id"])})["comments"]
+        self.assertEqual(comments, [comment])
+        self.api.call("POST", "statuses/destroy", {"id": str(status["id"])})
+        self.assertRaises(APIError, self.api.call, "GET", "statuses/show", {"id": str(status["id"])})
+
+
+class FakeWeiboServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWeiboServer(("127.0.0.1", 0), CorpusGenerator(users=5).dataset(50),
+                                      Faults(rate_limit=3))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def get(self, path):
+        return urllib.request.urlopen(self.server.url + path).read()
+
+    def test_server(self):
+        timeline = json.loads(self.get("/2/statuses/home_timeline.json?count=5").decode("utf-8"))
+        self.assertEqual(len(timeline["statuses"]), 5)
+        self.assertTrue(timeline["statuses"][0]["user"]["profile_image_url"].startswith(
+                        self.server.url + "/images/tp"))
+        self.assertTrue(self.get("/images/tp1/%d/50/0/1" % FIRST_USER_ID).startswith(b"\x89PNG"))
+
+        self.get("/2/users/show.json?uid=%d" % FIRST_USER_ID)
+        self.get("/2/account/get_uid.json")
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            self.get("/2/account/get_uid.json")
+        self.assertEqual(cm.exception.code, 403)
+        self.assertEqual(json.loads(cm.exception.read().decode("utf-8"))["error_code"], 10023)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented an identity map of statuses and users.
+#           A status in many tabs is stored once, and an update of it is
+#           seen by all of them.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import threading
+import types
+import weakref
+
+
+def kind(data):
+    """Comments and statuses have different ids, tell them apart."""
+    return "comment" if "status" in data else "status"
+
+
+def _ref(listener):
+    # Don't keep the owners of the listeners alive, e.g. the items of
+    # a closed tab.
+    if isinstance(listener, types.MethodType):
+        return weakref.WeakMethod(listener)
+    return lambda: listener
+
+
+class Shared():
+    """The only copy of the data of a status or a user.
+
+    Listeners are called with the Shared after it is changed, in the
+    thread which changed it. Bound methods are referenced weakly."""
+
+    def __init__(self, data):
+        self.data = data
+        self._listeners = []
+
+    def addListener(self, listener):
+        self._listeners = [ref for ref in self._listeners if ref()]
+        self._listeners.append(_ref(listener))
+
+    def removeListener(self, listener):
+        self._listeners = [ref for ref in self._listeners
+                           if ref() and ref() != listener]
+
+    def update(self, changes):
+        """Update the data, return False if nothing changed."""
+        if changes is self.data:
+            return False
+        changed = {key: value for key, value in changes.items()
+                   if self.data.get(key) != value}
+        if not changed:
+            return False
+        self.data.update(changed)
+
+        for ref in list(self._listeners):
+            listener = ref()
+            if listener:
+                listener(self)
+        return True
+
+
+class IdentityMap():
+    """Map ("status" | "comment" | "user", id) to the Shared. A Shared
+    is dropped when nothing references it."""
+
+    def __init__(self):
+        self._objects = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, kind, data):
+        """Return the Shared of the data, it is created from the data if
+        it's the first one with the id."""
+
+        id = data.get("id")
+        if not id:
+            # Can't be shared.
+            return Shared(data)
+
+        with self._lock:
+            shared = self._objects.get((kind, id))
+            if shared is None:
+                shared = Shared(data)
+                self._objects[(kind, id)] = shared
+        return shared
+
+    def find(self, kind, id):
+        return self._objects.get((kind, id))
+
+    def update(self, kind, data):
+        """Update the Shared with newer data, if someone has it."""
+        shared = self.find(kind, data.get("id"))
+        if shared:
+            shared.update(data)
+        return shared
+
+    def addStatuses(self, statuses):
+        """Update the Shared of the statuses from Sina, and the ones
+        nested in them."""
+
+        for status in statuses:
+            self.update(kind(status), status)
+            if status.get("user"):
+                self.update("user", status["user"])
+            for key in ("retweeted_status", "status"):
+                if status.get(key):
+                    self.addStatuses([status[key]])
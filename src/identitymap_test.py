@@ -0,0 +1,76 @@
+import gc
+import unittest
+from identitymap import IdentityMap, kind
+
+
+class Listener():
+
+    def __init__(self):
+        self.changes = []
+
+    def changed(self, shared):
+        self.changes.append(dict(shared.data))
+
+
+class IdentityMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.map = IdentityMap()
+
+    def test_kind(self):
+        self.assertEqual(kind({"id": 1, "text": "status"}), "status")
+        self.assertEqual(kind({"id": 1, "status": {"id": 2}}), "comment")
+
+    def test_same_object(self):
+        first = self.map.get("status", {"id": 1, "text": "first"})
+        second = self.map.get("status", {"id": 1, "text": "second"})
+        self.assertIs(first, second)
+        self.assertEqual(second.data["text"], "first")
+        self.assertIsNot(self.map.get("comment", {"id": 1}), first)
+        self.assertIsNot(self.map.get("status", {}), self.map.get("status", {}))
+
+    def test_weak(self):
+        self.map.get("status", {"id": 1})
+        gc.collect()
+        self.assertIsNone(self.map.find("status", 1))
+
+    def test_update(self):
+        shared = self.map.get("status", {"id": 1, "reposts_count": 0})
+        listener = Listener()
+        shared.addListener(listener.changed)
+
+        self.assertFalse(shared.update({"id": 1, "reposts_count": 0}))
+        self.assertTrue(shared.update({"reposts_count": 2, "favorited": True}))
+        self.assertEqual(listener.changes,
+                         [{"id": 1, "reposts_count": 2, "favorited": True}])
+
+        shared.removeListener(listener.changed)
+        shared.update({"reposts_count": 3})
+        self.assertEqual(len(listener.changes), 1)
+
+    def test_weak_listener(self):
+        shared = self.map.get("status", {"id": 1})
+        listener = Listener()
+        shared.addListener(listener.changed)
+        del listener
+        gc.collect()
+        self.assertTrue(shared.update({"text": "changed"}))
+
+    def test_addStatuses(self):
+        original = self.map.get("status", {"id": 1, "comments_count": 0})
+        user = self.map.get("user", {"id": 10, "name": "old"})
+        comment = self.map.get("comment", {"id": 3, "status": {}})
+        self.map.addStatuses([
+            {"id": 2, "user": {"id": 10, "name": "new"},
+             "retweeted_status": {"id": 1, "comments_count": 5}},
+            {"id": 3, "text": "comment", "status": {"id": 1, "comments_count": 6}}])
+
+        self.assertEqual(original.data["comments_count"], 6)
+        self.assertEqual(user.data["name"], "new")
+        self.assertEqual(comment.data["text"], "comment")
+        # Nobody shows it.
+        self.assertIsNone(self.map.find("status", 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
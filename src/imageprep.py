@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented the preprocessing of the images to
+#           upload. The photos of cameras are scaled down and compressed
+#           again to the limits of Sina, which also strips the EXIF data,
+#           e.g. the location where the photo was taken. The orientation
+#           in the EXIF data is applied to the pixels first.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import os
+import struct
+import hashlib
+
+
+# Sina scales the larger images down anyway.
+MAX_SIDE = 2048
+MAX_BYTES = 5 * 1024 * 1024
+QUALITY = 85
+MIN_QUALITY = 50
+
+
+def fit(width, height, max_side=MAX_SIDE):
+    """The size of the image scaled down to max_side, keeping the ratio."""
+    side = max(width, height)
+    if side <= max_side:
+        return width, height
+    return (max(1, round(width * max_side / side)),
+            max(1, round(height * max_side / side)))
+
+
+# EXIF orientation: (clockwise rotation, mirror horizontally, vertically),
+# the rotation first.
+ORIENTATIONS = {
+    1: (0, False, False),
+    2: (0, True, False),
+    3: (180, False, False),
+    4: (0, False, True),
+    5: (90, True, False),
+    6: (90, False, False),
+    7: (90, False, True),
+    8: (270, False, False),
+}
+
+
+def orientation(path):
+    """Return the EXIF orientation of a JPEG file, 1 if there isn't one."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(2) != b"\xff\xd8":
+                return 1
+            while True:
+                marker, length = struct.unpack(">2sH", f.read(4))
+                if marker[0] != 0xff or marker[1] == 0xda:
+                    # The image data, no more headers.
+                    return 1
+                segment = f.read(length - 2)
+                if marker[1] == 0xe1 and segment.startswith(b"Exif\0\0"):
+                    return _tiffOrientation(segment[6:])
+    except (OSError, struct.error):
+        return 1
+
+
+def _tiffOrientation(tiff):
+    order = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if not order:
+        return 1
+    offset, = struct.unpack(order + "I", tiff[4:8])
+    count, = struct.unpack(order + "H", tiff[offset:offset + 2])
+    for i in range(count):
+        entry = tiff[offset + 2 + i * 12:offset + 14 + i * 12]
+        tag, type, _, value = struct.unpack(order + "HHIH", entry[:10])
+        if tag == 0x0112:
+            return value if value in ORIENTATIONS else 1
+    return 1
+
+
+def cachedName(path):
+    """The name of the preprocessed image, changed with the file."""
+    stat = os.stat(path)
+    key = "%s:%d:%d" % (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    return "upload-" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def discard(path, cache_dir):
+    """Remove the preprocessed image of the path, if there is one."""
+    try:
+        name = os.path.join(cache_dir, cachedName(path))
+    except OSError:
+        # The image is gone, so is its name.
+        return
+    for ext in (".png", ".jpg"):
+        if os.path.exists(name + ext):
+            os.remove(name + ext)
+
+
+def prepare(path, cache_dir):
+    """Return the path of the image to upload, in the cache_dir.
+
+    GIF images are sent as they are if they are small enough, or their
+    animation is lost. PNG images with an alpha channel stay PNG, the
+    others become JPEG. It is safe to call it in any thread, QImage is
+    not a QPixmap."""
+
+    from PyQt4 import QtCore, QtGui
+
+    if path.lower().endswith(".gif") and os.path.getsize(path) <= MAX_BYTES:
+        return path
+
+    name = os.path.join(cache_dir, cachedName(path))
+    for ext in (".png", ".jpg"):
+        if os.path.exists(name + ext):
+            return name + ext
+
+    image = QtGui.QImage(path)
+    if image.isNull():
+        # Not an image we can read, let Sina decide.
+        return path
+    # The EXIF data is lost when saving it, turn the pixels instead.
+    rotation, horizontal, vertical = ORIENTATIONS[orientation(path)]
+    if rotation:
+        image = image.transformed(QtGui.QTransform().rotate(rotation))
+    if horizontal or vertical:
+        image = image.mirrored(horizontal, vertical)
+    width, height = fit(image.width(), image.height())
+    if (width, height) != (image.width(), image.height()):
+        image = image.scaled(width, height, QtCore.Qt.IgnoreAspectRatio,
+                             QtCore.Qt.SmoothTransformation)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if image.hasAlphaChannel():
+        if image.save(name + ".png", "PNG") and os.path.getsize(name + ".png") <= MAX_BYTES:
+            return name + ".png"
+        if os.path.exists(name + ".png"):
+            os.remove(name + ".png")
+        # Too large, flatten it on white for a JPEG.
+        flat = QtGui.QImage(image.size(), QtGui.QImage.Format_RGB32)
+        flat.fill(0xffffffff)
+        painter = QtGui.QPainter(flat)
+        painter.drawImage(0, 0, image)
+        painter.end()
+        image = flat
+
+    quality = QUALITY
+    while True:
+        image.save(name + ".jpg", "JPEG", quality)
+        if os.path.getsize(name + ".jpg") <= MAX_BYTES or quality <= MIN_QUALITY:
+            return name + ".jpg"
+        quality -= 10
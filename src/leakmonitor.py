@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This file implemented LeakMonitor, which counts the objects
+#           of the types we usually leak, and reports the types which
+#           keep growing, with the reference chains keeping them alive.
+#           Run WeCase with WECASE_LEAKMONITOR=<seconds> to enable it.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import os
+import time
+import inspect
+from collections import deque
+import objgraph
+
+
+ENV_NAME = "WECASE_LEAKMONITOR"
+WATCHED_TYPES = ("SingleTweetWidget", "QMovie", "QPixmap",
+                 "TweetItem", "UserItem", "Thread")
+
+
+def _edgeString(source, target):
+    if target is getattr(source, "__dict__", None):
+        return ".__dict__"
+    if isinstance(source, dict):
+        for key, value in source.items():
+            if value is target:
+                return "[%s]" % objgraph.safe_repr(key)
+    if isinstance(source, (list, tuple)):
+        for index, value in enumerate(source):
+            if value is target:
+                return "[%d]" % index
+    return "->"
+
+
+def chainString(chain):
+    lines = []
+    for index, obj in enumerate(chain):
+        edge = _edgeString(chain[index - 1], obj) if index else ""
+        lines.append("    %s %s: %s" % (edge, type(obj).__name__, objgraph.safe_repr(obj)))
+    return "\n".join(lines)
+
+
+class LeakMonitor():
+    """Call check() periodically. A type is reported if its number of
+    instances never decreased and has grown in the last `window` checks.
+
+    check() runs the garbage collector and walks all the objects, call it
+    from the GUI thread, collecting Qt objects in other threads is unsafe."""
+
+    def __init__(self, path, types=WATCHED_TYPES, window=5, chains=3):
+        self.path = path
+        self.types = types
+        self.chains = chains
+        self.history = deque(maxlen=window)
+
+    def snapshot(self):
+        stats = objgraph.typestats()
+        counts = {name: stats.get(name, 0) for name in self.types}
+        self.history.append(counts)
+        return counts
+
+    def growing(self):
+        """Return [(type, first count, last count)] of the growing types."""
+        if len(self.history) < self.history.maxlen:
+            return []
+
+        growing = []
+        for name in self.types:
+            counts = [counts[name] for counts in self.history]
+            if all(a <= b for a, b in zip(counts, counts[1:])) and counts[-1] > counts[0]:
+                growing.append((name, counts[0], counts[-1]))
+        growing.sort(key=lambda item: item[2] - item[1], reverse=True)
+        return growing
+
+    def backrefChains(self, name):
+        objs = objgraph.by_type(name)
+        chains = []
+        # The newest objects are the most likely leaked ones.
+        for obj in objs[-self.chains:]:
+            chains.append(objgraph.find_backref_chain(obj, inspect.ismodule,
+                                                      extra_ignore=[id(objs)]))
+        return chains
+
+    def check(self):
+        """Take a snapshot, and append a report to the report file
+        if there are growing types. Return the growing types."""
+        self.snapshot()
+        growing = self.growing()
+        if growing:
+            self.report(growing)
+            # Report the next growth only.
+            self.history.clear()
+        return growing
+
+    def report(self, growing):
+        lines = ["=== %s ===" % time.strftime("%Y-%m-%d %H:%M:%S")]
+        for name, first, last in growing:
+            lines.append("%s: %d -> %d in %d checks" %
+                         (name, first, last, self.history.maxlen))
+            for chain in self.backrefChains(name):
+                if chain:
+                    lines.append(chainString(chain))
+                else:
+                    lines.append("    (not referenced by any module, "
+                                 "maybe a thread, a frame or C++ code)")
+                lines.append("")
+
+        with open(self.path, "a") as report_file:
+            report_file.write("\n".join(lines) + "\n")
+
+
+def interval():
+    """Return the interval in seconds set by the environment, or 0."""
+    try:
+        return max(int(os.environ.get(ENV_NAME, 0)), 0)
+    except ValueError:
+        return 0
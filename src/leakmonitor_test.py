@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from leakmonitor import LeakMonitor
+
+
+class LeakyObject():
+    pass
+
+
+class OtherObject():
+    pass
+
+
+leaked = []
+
+
+class LeakMonitorTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.monitor = LeakMonitor(self.path, types=("LeakyObject", "OtherObject"),
+                                   window=3, chains=1)
+
+    def tearDown(self):
+        del leaked[:]
+        os.remove(self.path)
+
+    def test_growing(self):
+        others = []
+        for i in range(2):
+            self.assertEqual(self.monitor.check(), [])
+            leaked.append(LeakyObject())
+            others.append(OtherObject())
+        del others[:]
+        self.assertEqual(self.monitor.check(), [("LeakyObject", 0, 2)])
+        self.assertEqual(len(self.monitor.history), 0)
+
+        with open(self.path) as report_file:
+            report = report_file.read()
+        self.assertIn("LeakyObject: 0 -> 2", report)
+        self.assertIn("['leaked'] list", report)
+        self.assertNotIn("OtherObject", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,8 +24,12 @@ def generate_ui(file, path):
 
 
 def generate_rc(file, path):
+    # The module is only a fallback, wecase_rc.py loads the binary
+    # bundle if we have it.
     print("Generating RC file for %s" % file)
-    os.popen("pyrcc4 -py3 -compress 9 %s > %s.py" % (path, file.replace(".qrc", "_rc")))
+    os.popen("pyrcc4 -py3 -compress 9 %s > %s.py" % (path, file.replace(".qrc", "_rc_data")))
+    print("Generating binary RC bundle for %s" % file)
+    os.popen("rcc -binary -compress 9 %s -o %s" % (path, file.replace(".qrc", ".rcc")))
 
 
 def process_ui():
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented the outbox of WeCase. The new statuses,
+#           comments, replies and reposts are saved on the disk first, then
+#           sent in the background, again and again until Sina has them.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import json
+import errno
+import socket
+import logging
+import sqlite3
+import threading
+import time
+from urllib.error import URLError
+from connectivity import NETWORK_ERRORS
+
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+# It may be sent or not, the network failed in the middle.
+UNKNOWN = "unknown"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_try REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL
+);
+"""
+
+
+def unsent(error):
+    """Whether the network failed before the request was sent, so it
+    can't be posted twice if we send it again."""
+    if isinstance(error, URLError):
+        error = error.reason
+    if isinstance(error, (ConnectionRefusedError, socket.gaierror)):
+        return True
+    return isinstance(error, OSError) and error.errno in (errno.ENETUNREACH,
+                                                         errno.EHOSTUNREACH)
+
+
+def summary(item):
+    """The text of the item, to show it to users."""
+    params = item["params"]
+    return params.get("status") or params.get("comment") or ""
+
+
+class Outbox():
+    """The items are sent in order by a thread, with post(endpoint, params,
+    progress, cancel). A long request calls progress(sent, total), and
+    stops when the cancel event is set.
+
+    A network error before the request is sent (see unsent()) delays
+    the item by a backoff, doubled on each attempt, and the items after
+    it wait. The statuses and comments are not idempotent, the item is
+    UNKNOWN after other network errors, and if it was being sent when
+    WeCase exited. Other errors fail the item. The failed, the unknown
+    and the cancelled items are sent again only if retry() is called.
+
+    discard(item) is called when an item is cancelled or removed, to
+    delete what post() has left for it.
+
+    Only the items of the account which is logged in are listed and
+    sent, see setAccount().
+
+    Listeners are called with the item after its state or its progress
+    changed, in the thread which changed it."""
+
+    BACKOFF = 2
+    MAX_BACKOFF = 5 * 60
+    # Keep this many sent items to show them.
+    KEEP_SENT = 50
+    CANCELLED = "Cancelled"
+    INTERRUPTED = "Interrupted"
+
+    def __init__(self, post, connectivity, path=":memory:", account="", discard=None):
+        self._post = post
+        self._discard = discard
+        self._account = str(account)
+        self._connectivity = connectivity
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._running = False
+        self._thread = None
+        self._listeners = []
+        # (id, cancel event, (sent, total)) of the item being sent.
+        self._sending = None
+        self._notified = 0
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+            self._db.execute("UPDATE outbox SET state = ?, error = ? WHERE state = ?",
+                             (UNKNOWN, self.INTERRUPTED, SENDING))
+
+    def add(self, endpoint, params):
+        """Queue a POST request, return the id of the item."""
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (account, endpoint, params, state, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self._account, endpoint, json.dumps(params), PENDING, time.time()))
+            id = cursor.lastrowid
+        self._notify(self.item(id))
+        self.start()
+        return id
+
+    def item(self, id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM outbox WHERE id = ?", (id,)).fetchone()
+        return self._item(row) if row else None
+
+    def items(self, state=None):
+        """Return the items, the newest first."""
+        query = "SELECT * FROM outbox WHERE account = ?"
+        args = [self._account]
+        if state:
+            query += " AND state = ?"
+            args.append(state)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY id DESC", args).fetchall()
+        return [self._item(row) for row in rows]
+
+    def retry(self, id):
+        """Send a failed or an unknown item again."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE outbox SET state = ?, attempts = 0, next_try = 0, error = NULL "
+                "WHERE id = ? AND state IN (?, ?)", (PENDING, id, FAILED, UNKNOWN))
+        self._notify(self.item(id))
+        self.start()
+
+    def cancel(self, id):
+        """Stop sending an item, it fails as cancelled."""
+        sending = self._sending
+        if sending and sending[0] == id:
+            sending[1].set()
+            return
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "UPDATE outbox SET state = ?, error = ? WHERE id = ? AND state = ?",
+                (FAILED, self.CANCELLED, id, PENDING))
+        item = self.item(id)
+        if cursor.rowcount:
+            self._discardItem(item)
+        self._notify(item)
+
+    def progress(self, id):
+        """Return (sent, total) bytes of the item being sent, or None."""
+        sending = self._sending
+        if sending and sending[0] == id:
+            return sending[2]
+        return None
+
+    def remove(self, id):
+        """Forget an item which isn't being sent."""
+        item = self.item(id)
+        with self._lock, self._db:
+            cursor = self._db.execute("DELETE FROM outbox WHERE id = ? AND state != ?",
+                                      (id, SENDING))
+        if cursor.rowcount:
+            self._discardItem(item)
+
+    def setAccount(self, account):
+        """Switch to the items of another account, and send them."""
+        self._account = str(account)
+        self.start()
+
+    def addListener(self, listener):
+        self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        self._listeners.remove(listener)
+
+    def start(self):
+        """Send the pending items, if we are not sending them."""
+        self._wakeup.set()
+        with self._lock:
+            if self._running or self._stop_event.is_set():
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="Outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def close(self):
+        self.stop()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join()
+        with self._lock:
+            self._db.close()
+
+    def _item(self, row):
+        item = dict(row)
+        item["params"] = json.loads(item["params"])
+        return item
+
+    def _notify(self, item):
+        if not item:
+            return
+        for listener in list(self._listeners):
+            listener(item)
+
+    def _discardItem(self, item):
+        if not self._discard:
+            return
+        try:
+            self._discard(item)
+        except:
+            logging.exception("Failed to discard %s" % item["endpoint"])
+
+    def _update(self, id, **values):
+        columns = ", ".join("%s = ?" % column for column in values)
+        with self._lock, self._db:
+            self._db.execute("UPDATE outbox SET %s WHERE id = ?" % columns,
+                             list(values.values()) + [id])
+        self._notify(self.item(id))
+
+    def _next(self):
+        """Return the first pending item, or None and stop running."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM outbox WHERE account = ? AND state = ? ORDER BY id LIMIT 1",
+                (self._account, PENDING)).fetchone()
+            if not row or not self._connectivity.online() or self._stop_event.is_set():
+                self._running = False
+                return None
+            self._wakeup.clear()
+        return self._item(row)
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if not item:
+                break
+            delay = item["next_try"] - time.time()
+            if delay > 0:
+                # Backing off, or until something is added.
+                self._wakeup.wait(delay)
+                continue
+
+            cancel = threading.Event()
+            self._sending = (item["id"], cancel, None)
+            self._notified = 0
+            self._update(item["id"], state=SENDING)
+            try:
+                self._post(item["endpoint"], item["params"],
+                           lambda sent, total: self._setProgress(item["id"], sent, total),
+                           cancel)
+            except Exception as e:
+                self._sending = None
+                if cancel.is_set():
+                    self._discardItem(item)
+                    self._update(item["id"], state=FAILED, error=self.CANCELLED)
+                elif isinstance(e, NETWORK_ERRORS) and unsent(e):
+                    self._connectivity.reportFailure()
+                    backoff = min(self.BACKOFF * 2 ** item["attempts"], self.MAX_BACKOFF)
+                    self._update(item["id"], state=PENDING, attempts=item["attempts"] + 1,
+                                 next_try=time.time() + backoff, error=str(e))
+                elif isinstance(e, NETWORK_ERRORS):
+                    # Sina may have it, let users check it before retrying.
+                    self._connectivity.reportFailure()
+                    self._update(item["id"], state=UNKNOWN, attempts=item["attempts"] + 1,
+                                 error=str(e))
+                else:
+                    logging.warning("Failed to send %s: %s" % (item["endpoint"], e))
+                    self._update(item["id"], state=FAILED, attempts=item["attempts"] + 1,
+                                 error=str(e))
+            else:
+                self._sending = None
+                self._connectivity.reportSuccess()
+                self._prune()
+                self._update(item["id"], state=SENT, error=None)
+
+        if self.items(PENDING) and not self._stop_event.is_set():
+            # Offline, go on when we are online again.
+            self._connectivity.queue(self.start)
+
+    def _setProgress(self, id, sent, total):
+        sending = self._sending
+        if not sending or sending[0] != id:
+            return
+        self._sending = (id, sending[1], (sent, total))
+        # Every percent, not every chunk, the listeners may redraw.
+        if sent == total or sent * 100 // total != self._notified * 100 // total:
+            self._notified = sent
+            self._notify(self.item(id))
+
+    def _prune(self):
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM outbox WHERE account = ? AND state = ? AND id NOT IN "
+                "(SELECT id FROM outbox WHERE account = ? AND state = ? "
+                "ORDER BY id DESC LIMIT ?)",
+                (self._account, SENT, self._account, SENT, self.KEEP_SENT - 1))
@@ -0,0 +1,170 @@
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import unittest
+from urllib.error import URLError
+from connectivity import Connectivity
+from fakeweibo import FakeWeibo, APIError
+from corpusgen import CorpusGenerator
+import outbox
+from outbox import Outbox
+
+
+class OutboxTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "outbox.db")
+        self.api = FakeWeibo(CorpusGenerator(users=5).dataset(20))
+        self.connectivity = Connectivity(probe=lambda: None)
+        self.connectivity.PROBE_INTERVAL = 0.01
+        self.connectivity.RETRY_DELAY = 0.01
+        self.errors = []
+        self.discarded = []
+        self.changed = threading.Condition()
+        self.outbox = self.open()
+
+    def tearDown(self):
+        self.outbox.close()
+        self.connectivity.stop()
+        shutil.rmtree(self.dir)
+
+    def open(self):
+        box = Outbox(self.post, self.connectivity, self.path,
+                     discard=lambda item: self.discarded.append(item["id"]))
+        box.BACKOFF = 0.01
+        box.addListener(self.listener)
+        return box
+
+    def post(self, endpoint, params, progress, cancel):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.api.call("POST", endpoint, {key: str(value) for key, value in params.items()})
+
+    def listener(self, item):
+        with self.changed:
+            self.changed.notify_all()
+
+    def wait(self, id, state):
+        with self.changed:
+            self.assertTrue(self.changed.wait_for(
+                lambda: self.outbox.item(id)["state"] == state, 2))
+
+    def home(self):
+        return self.api.call("GET", "statuses/home_timeline", {})["statuses"]
+
+    def test_send_in_order(self):
+        status = self.home()[0]
+        first = self.outbox.add("statuses/update", {"status": "Hello"})
+        second = self.outbox.add("comments/create", {"id": status["id"], "comment": "Hi"})
+        self.wait(second, outbox.SENT)
+        self.assertEqual(self.outbox.item(first)["state"], outbox.SENT)
+        self.assertEqual(self.home()[0]["text"], "Hello")
+        self.assertEqual(outbox.summary(self.outbox.item(second)), "Hi")
+        self.assertEqual([item["id"] for item in self.outbox.items()], [second, first])
+
+    def test_retry_network_errors(self):
+        self.errors = [URLError(ConnectionRefusedError()), socket.gaierror()]
+        id = self.outbox.add("statuses/update", {"status": "Hello"})
+        self.wait(id, outbox.SENT)
+        self.assertEqual(self.outbox.item(id)["attempts"], 2)
+        self.assertIsNone(self.outbox.item(id)["error"])
+
+    def test_unknown(self):
+        # Sina may have got it before the timeout.
+        self.errors = [socket.timeout()]
+        id = self.outbox.add("statuses/update", {"status": "Hello"})
+        self.wait(id, outbox.UNKNOWN)
+        self.assertEqual(self.outbox.item(id)["attempts"], 1)
+        self.outbox.retry(id)
+        self.wait(id, outbox.SENT)
+
+    def test_interrupted(self):
+        self.outbox.stop()
+        id = self.outbox.add("statuses/update", {"status": "Hello"})
+        self.outbox.close()
+        db = sqlite3.connect(self.path)
+        with db:
+            db.execute("UPDATE outbox SET state = ?", (outbox.SENDING,))
+        db.close()
+
+        self.outbox = self.open()
+        self.assertEqual(self.outbox.item(id)["state"], outbox.UNKNOWN)
+        self.assertEqual(self.outbox.item(id)["error"], Outbox.INTERRUPTED)
+
+    def test_failed(self):
+        self.errors = [APIError(400, 20019, "Repeat content!")]
+        id = self.outbox.add("statuses/update", {"status": "Hello"})
+        self.wait(id, outbox.FAILED)
+        self.assertIn("Repeat content", self.outbox.item(id)["error"])
+        self.assertEqual(self.outbox.items(outbox.FAILED)[0]["id"], id)
+
+        self.outbox.retry(id)
+        self.wait(id, outbox.SENT)
+        self.outbox.remove(id)
+        self.assertIsNone(self.outbox.item(id))
+
+    def test_progress_and_cancel(self):
+        started = threading.Event()
+        progress = []
+
+        def post(endpoint, params, report, cancel):
+            for sent in range(0, 1000, 100):
+                report(sent + 100, 1000)
+                progress.append(self.outbox.progress(first))
+            started.set()
+            cancel.wait(2)
+            raise URLError("closed")
+
+        self.outbox._post = post
+        first = self.outbox.add("statuses/upload", {"status": "Photo", "pic": "a.jpg"})
+        second = self.outbox.add("statuses/update", {"status": "Text"})
+        self.assertTrue(started.wait(2))
+        self.assertEqual(progress[-1], (1000, 1000))
+        self.outbox.cancel(second)
+        self.assertEqual(self.outbox.item(second)["state"], outbox.FAILED)
+        self.outbox.cancel(first)
+        self.wait(first, outbox.FAILED)
+        self.assertEqual(self.outbox.item(first)["error"], Outbox.CANCELLED)
+        self.assertIsNone(self.outbox.progress(first))
+        self.assertEqual(sorted(self.discarded), [first, second])
+
+        self.outbox.remove(second)
+        self.outbox.remove(second)
+        self.assertEqual(sorted(self.discarded), [first, second, second])
+
+    def test_restart(self):
+        self.outbox.stop()
+        id = self.outbox.add("statuses/update", {"status": "Later"})
+        self.outbox.close()
+
+        self.outbox = self.open()
+        self.assertEqual(self.outbox.item(id)["state"], outbox.PENDING)
+        self.outbox.start()
+        self.wait(id, outbox.SENT)
+        self.assertEqual(self.home()[0]["text"], "Later")
+
+    def test_accounts(self):
+        self.outbox.setAccount("other")
+        self.outbox.stop()
+        id = self.outbox.add("statuses/update", {"status": "Other"})
+        self.outbox.close()
+
+        self.outbox = self.open()
+        self.assertEqual(self.outbox.items(), [])
+        self.outbox.setAccount("other")
+        self.wait(id, outbox.SENT)
+        self.assertEqual(self.outbox.items()[0]["account"], "other")
+
+    def test_keep_sent(self):
+        self.outbox.KEEP_SENT = 2
+        ids = [self.outbox.add("statuses/update", {"status": str(i)}) for i in range(4)]
+        self.wait(ids[-1], outbox.SENT)
+        self.assertEqual([item["id"] for item in self.outbox.items()], ids[:1:-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
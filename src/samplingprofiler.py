@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This file implemented a sampling profiler, which can be
+#           started and stopped at runtime (SIGUSR1 or Ctrl+Shift+P).
+#           It samples the stacks of all threads, and writes them in
+#           the collapsed-stack format of FlameGraph.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import os
+import re
+import sys
+import time
+import threading
+import logging
+from collections import Counter
+
+
+class SamplingProfiler(threading.Thread):
+
+    def __init__(self, interval=0.005):
+        super(SamplingProfiler, self).__init__(name="SamplingProfiler")
+        self.daemon = True
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+
+    @staticmethod
+    def _threadName(thread):
+        if not thread:
+            return "Unknown"
+        # Merge all the "Thread-N" of @async workers, newer Pythons
+        # also append the name of the target, as "Thread-N (func)".
+        return re.sub(r"^Thread-\d+.*$", "Thread", thread.name)
+
+    @staticmethod
+    def _frameName(frame):
+        code = frame.f_code
+        return "%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename),
+                               code.co_firstlineno)
+
+    def sample(self):
+        threads = {thread.ident: thread for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            stack = []
+            while frame:
+                stack.append(self._frameName(frame))
+                frame = frame.f_back
+            stack.append(self._threadName(threads.get(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join("%s %d\n" % (stack, count)
+                       for stack, count in sorted(self.stacks.items()))
+
+    def dump(self, path):
+        with open(path, "w") as profile_file:
+            profile_file.write(self.collapsed())
+
+
+_profiler = None
+
+
+def running():
+    return _profiler is not None
+
+
+def start(interval=0.005):
+    global _profiler
+    if _profiler:
+        return
+    _profiler = SamplingProfiler(interval)
+    _profiler.start()
+    logging.warning("Sampling profiler started.")
+
+
+def stop(directory):
+    """Stop the profiler, save the stacks in the directory and
+    return the path."""
+
+    global _profiler
+    if not _profiler:
+        return None
+    profiler = _profiler
+    _profiler = None
+    profiler.stop()
+
+    path = os.path.join(directory, "profile-%s.folded" % time.strftime("%Y%m%d-%H%M%S"))
+    profiler.dump(path)
+    logging.warning("Sampling profiler stopped, %d samples saved to %s" %
+                    (profiler.samples, path))
+    return path
+
+
+def toggle(directory):
+    """Start the profiler, or stop it and return the path of the result."""
+    if running():
+        return stop(directory)
+    start()
+    return None
@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import samplingprofiler
+
+
+def busy_worker(stop_event):
+    while not stop_event.is_set():
+        sum(range(1000))
+
+
+class SamplingProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_toggle(self):
+        stop_event = threading.Event()
+        worker = threading.Thread(target=busy_worker, args=(stop_event,))
+        worker.start()
+
+        self.assertIsNone(samplingprofiler.toggle(self.dir))
+        self.assertTrue(samplingprofiler.running())
+        stop_event.wait(0.2)
+        path = samplingprofiler.toggle(self.dir)
+        stop_event.set()
+        worker.join()
+
+        self.assertFalse(samplingprofiler.running())
+        self.assertTrue(path.startswith(os.path.join(self.dir, "profile-")))
+        with open(path) as profile_file:
+            lines = profile_file.read().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(any(line.startswith("Thread;") and "busy_worker" in line
+                            for line in lines))
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(int(count) > 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
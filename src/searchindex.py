@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented the tokenizer of the local search.
+#           There are no spaces between Chinese words, so CJK text is
+#           indexed by bigrams, e.g. "微博客户端" is "微博", "博客",
+#           "客户", "户端" and "端". Other text is indexed by words.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import re
+
+
+# Kana, CJK ideographs and Hangul.
+CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+TOKEN_RE = re.compile("([%s]+)|([^\\W_%s]+)" % (CJK, CJK))
+# The largest character, for the prefix queries.
+MAX_CHAR = "\U0010ffff"
+
+
+def searchable(status):
+    """The text of a status to search: the text, the author, and the
+    text and the author of the retweeted status."""
+
+    parts = []
+    while status:
+        user = status.get("user") or {}
+        parts += [status.get("text", ""), user.get("screen_name", ""),
+                  user.get("name", "")]
+        status = status.get("retweeted_status")
+    return "\n".join(part for part in parts if part).casefold()
+
+
+def _runs(text):
+    for match in TOKEN_RE.finditer(text.casefold()):
+        yield match.group(1), match.group(2)
+
+
+def terms(text):
+    """Return the set of the terms of the text to index. The last
+    character of a CJK run is a term by itself, so any character is
+    the prefix of a term."""
+
+    result = set()
+    for cjk, word in _runs(text):
+        if word:
+            result.add(word)
+            continue
+        for i in range(len(cjk) - 1):
+            result.add(cjk[i:i + 2])
+        result.add(cjk[-1])
+    return result
+
+
+def queryTerms(query):
+    """Return the [(term, prefix)] to look up for the query. A status
+    has all of them if it matches. The words and single CJK characters
+    are prefixes, so we can search while typing."""
+
+    result = []
+    for cjk, word in _runs(query):
+        if word:
+            result.append((word, True))
+        elif len(cjk) == 1:
+            result.append((cjk, True))
+        else:
+            result += [(cjk[i:i + 2], False) for i in range(len(cjk) - 1)]
+    return result
+
+
+def matches(query, text):
+    """Whether the searchable text has all the parts of the query. The
+    terms of a part may be found apart, the part itself may not."""
+    return all(part in text for part in query.casefold().split())
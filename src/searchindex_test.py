@@ -0,0 +1,27 @@
+import unittest
+from searchindex import searchable, terms, queryTerms, matches
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def test_terms(self):
+        self.assertEqual(terms("微博客户端"), {"微博", "博客", "客户", "户端", "端"})
+        self.assertEqual(terms("Hello, WeCase_1.0 好"), {"hello", "wecase", "1", "0", "好"})
+        self.assertEqual(terms("WeCase微博"), {"wecase", "微博", "博"})
+        self.assertEqual(terms(""), set())
+
+    def test_queryTerms(self):
+        self.assertEqual(queryTerms("客户端 wec 微"),
+                         [("客户", False), ("户端", False), ("wec", True), ("微", True)])
+        self.assertEqual(queryTerms("!!"), [])
+
+    def test_matches(self):
+        text = searchable({"text": "微博客户端", "user": {"screen_name": "Tom"},
+                           "retweeted_status": {"text": "Hello", "user": {"name": "Li"}}})
+        self.assertTrue(matches("客户 TOM", text))
+        self.assertTrue(matches("hello li", text))
+        self.assertFalse(matches("微客", text))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This file implemented the recorder and the replayer of the
+#           HTTP traffic (API calls and images), to reproduce the slow
+#           sessions offline.
+#
+#           $ WECASE_RECORD=session.gz ./wecase.py
+#           $ WECASE_REPLAY=session.gz WECASE_REPLAY_SPEED=10 ./wecase.py
+#
+#           Both of them are urllib handlers, the SDK and the image
+#           fetchers use urllib, so they go through the same code paths.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import io
+import os
+import gzip
+import json
+import time
+import base64
+import logging
+import threading
+import http.client
+import urllib.request
+import urllib.response
+from urllib.error import URLError
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from collections import defaultdict, deque
+
+
+ENV_RECORD = "WECASE_RECORD"
+ENV_REPLAY = "WECASE_REPLAY"
+ENV_REPLAY_SPEED = "WECASE_REPLAY_SPEED"
+# The token changes in every session.
+IGNORED_PARAMS = ("access_token",)
+
+
+def requestKey(method, url):
+    """The key to match a request in the replay."""
+    parts = urlsplit(url)
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, True)
+                   if key not in IGNORED_PARAMS)
+    return "%s %s://%s%s?%s" % (method, parts.scheme, parts.netloc,
+                                parts.path, urlencode(query))
+
+
+def _response(body, headers, url, code, msg):
+    response = urllib.response.addinfourl(io.BytesIO(body), headers, url, code)
+    response.msg = msg
+    return response
+
+
+class SessionRecorder(urllib.request.BaseHandler):
+    # Before HTTPErrorProcessor, which raises the HTTP errors.
+    handler_order = 900
+
+    def __init__(self, path):
+        self.path = path
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.start = time.time()
+
+    def http_request(self, request):
+        request.session_start = time.time()
+        return request
+
+    https_request = http_request
+
+    def http_response(self, request, response):
+        body = response.read()
+        now = time.time()
+        data = request.data if isinstance(request.data, bytes) else b""
+        record = {"time": request.session_start - self.start,
+                  "duration": now - request.session_start,
+                  "method": request.get_method(),
+                  "url": request.full_url,
+                  "key": requestKey(request.get_method(), request.full_url),
+                  "data": base64.b64encode(data).decode("ascii"),
+                  "status": response.code,
+                  "reason": response.msg,
+                  "headers": list(response.info().items()),
+                  "body": base64.b64encode(body).decode("ascii")}
+
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(json.dumps(record) + "\n")
+                self.file.flush()
+        return _response(body, response.info(), response.geturl(),
+                         response.code, response.msg)
+
+    https_response = http_response
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class SessionReplayer(urllib.request.BaseHandler):
+    """Responses of the same request are replayed in the recorded order,
+    the last one is repeated if the client asks for more. Requests not
+    in the archive fail with URLError.
+
+    The response is delayed by its recorded duration divided by speed,
+    0 means no delay."""
+
+    # Before HTTPHandler, so nothing goes to the network.
+    handler_order = 100
+
+    def __init__(self, path, speed=1.0):
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.responses = defaultdict(deque)
+        with gzip.open(path, "rt", encoding="utf-8") as session_file:
+            try:
+                for line in session_file:
+                    record = json.loads(line)
+                    self.responses[record["key"]].append(record)
+            except (EOFError, ValueError):
+                # The recorder was killed, ignore the incomplete tail.
+                pass
+
+    def _open(self, request):
+        key = requestKey(request.get_method(), request.full_url)
+        with self.lock:
+            responses = self.responses.get(key)
+            if not responses:
+                raise URLError("%s is not in the session" % key)
+            record = responses.popleft() if len(responses) > 1 else responses[0]
+
+        if self.speed:
+            time.sleep(record["duration"] / self.speed)
+
+        headers = http.client.HTTPMessage()
+        for name, value in record["headers"]:
+            headers[name] = value
+        return _response(base64.b64decode(record["body"]), headers,
+                         record["url"], record["status"], record["reason"])
+
+    http_open = _open
+    https_open = _open
+
+    def close(self):
+        with self.lock:
+            self.responses.clear()
+
+
+_handler = None
+
+
+def install():
+    """Install the recorder or the replayer for all urllib requests,
+    as the environment says. Return the handler or None."""
+
+    global _handler
+    record_path = os.environ.get(ENV_RECORD)
+    replay_path = os.environ.get(ENV_REPLAY)
+    if replay_path:
+        speed = float(os.environ.get(ENV_REPLAY_SPEED, 1))
+        _handler = SessionReplayer(replay_path, speed)
+        logging.warning("Replaying the session %s at %gx speed" % (replay_path, speed))
+    elif record_path:
+        _handler = SessionRecorder(record_path)
+        logging.warning("Recording the session to %s" % record_path)
+    else:
+        return None
+
+    urllib.request.install_opener(urllib.request.build_opener(_handler))
+    return _handler
+
+
+def replaying():
+    return isinstance(_handler, SessionReplayer)
+
+
+def close():
+    if _handler:
+        _handler.close()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.request
+import urllib.error
+from fakeweibo import FakeWeiboServer, Faults
+from corpusgen import CorpusGenerator
+from sessionrecorder import SessionRecorder, SessionReplayer, requestKey
+
+
+class SessionRecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "session.gz")
+        self.server = FakeWeiboServer(("127.0.0.1", 0), CorpusGenerator(users=5).dataset(50),
+                                      Faults(rate_limit=2))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.stopServer()
+        shutil.rmtree(self.dir)
+
+    def stopServer(self):
+        if not self.thread.is_alive():
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def fetch(self, opener, path):
+        try:
+            return opener.open(self.server.url + path).read()
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def test_key(self):
+        self.assertEqual(requestKey("GET", "http://a/2/x.json?b=2&access_token=1&a=1"),
+                         requestKey("GET", "http://a/2/x.json?a=1&b=2&access_token=2"))
+
+    def test_record_and_replay(self):
+        paths = ["/2/statuses/home_timeline.json?access_token=1",
+                 "/images/tp1/1/50/0/1",
+                 "/2/account/get_uid.json",
+                 "/2/account/get_uid.json"]
+
+        recorder = SessionRecorder(self.path)
+        opener = urllib.request.build_opener(recorder)
+        recorded = [self.fetch(opener, path) for path in paths]
+        recorder.close()
+        self.stopServer()
+        self.assertEqual(recorded[3], 403)
+
+        opener = urllib.request.build_opener(SessionReplayer(self.path, speed=0))
+        paths[0] = paths[0].replace("access_token=1", "access_token=2")
+        self.assertEqual([self.fetch(opener, path) for path in paths], recorded)
+        # The last response is repeated.
+        self.assertEqual(self.fetch(opener, paths[3]), 403)
+        self.assertRaises(urllib.error.URLError, self.fetch, opener, "/2/statuses/mentions.json")
+
+
+if __name__ == "__main__":
+    unittest.main()
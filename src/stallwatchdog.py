@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This file implemented StallWatchdog, which watches the
+#           heartbeats of the GUI thread, and logs the stack of the
+#           GUI thread when it is blocked.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import os
+import sys
+import time
+import threading
+import logging
+import traceback
+from WMetrics import metrics
+
+
+class StallWatchdog(threading.Thread):
+    """Call heartbeat() from the event loop every `interval` seconds
+    (e.g. by a QTimer). When no heartbeat arrives for `threshold`
+    seconds, the stack of the GUI thread is captured, then logged with
+    the duration when the event loop comes back.
+
+    The watchdog must be created in the GUI thread."""
+
+    # Log the stack even if the event loop never comes back.
+    HANG = 5
+
+    def __init__(self, threshold=0.25, interval=0.1, root=None):
+        super(StallWatchdog, self).__init__(name="StallWatchdog")
+        self.daemon = True
+        self.threshold = threshold
+        self.interval = interval
+        # Stall sites are the innermost frames of our own source files.
+        self.root = root or os.path.dirname(os.path.abspath(__file__))
+        self.main_ident = threading.current_thread().ident
+        self.last_beat = time.monotonic()
+        self.stalls = {}
+        self._stall = None
+        self._hang_logged = False
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def _site(self, stack):
+        for filename, lineno, func, _ in reversed(stack):
+            if filename.startswith(self.root):
+                break
+        else:
+            filename, lineno, func, _ = stack[-1]
+        return "%s (%s:%d)" % (func, os.path.basename(filename), lineno)
+
+    def heartbeat(self):
+        now = time.monotonic()
+        with self.lock:
+            stall = self._stall
+            self._stall = None
+            duration = now - self.last_beat - self.interval
+            self.last_beat = now
+        if stall:
+            self._finish(stall, duration)
+
+    def _finish(self, stack, duration):
+        site = self._site(stack)
+        count, total, longest = self.stalls.get(site, (0, 0, 0))
+        self.stalls[site] = (count + 1, total + duration, max(longest, duration))
+        metrics.histogram("gui.stall").observe(duration)
+        logging.warning("GUI thread was blocked for %.3fs in %s:\n%s" %
+                        (duration, site, "".join(traceback.format_list(stack))))
+
+    def check(self):
+        with self.lock:
+            blocked = time.monotonic() - self.last_beat - self.interval
+            if self._stall is None:
+                if blocked < self.threshold:
+                    return
+                frame = sys._current_frames().get(self.main_ident)
+                if not frame:
+                    return
+                self._stall = traceback.extract_stack(frame)
+                self._hang_logged = False
+            if blocked > self.HANG and not self._hang_logged:
+                self._hang_logged = True
+                logging.warning("GUI thread is still blocked after %.3fs:\n%s" %
+                                (blocked, "".join(traceback.format_list(self._stall))))
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+    def top(self, n=10):
+        """Return the top-n stall sites, as (site, count, total, longest),
+        sorted by the total blocked time."""
+        stalls = [(site,) + stat for site, stat in self.stalls.items()]
+        stalls.sort(key=lambda stall: stall[2], reverse=True)
+        return stalls[:n]
+
+    def report(self, n=10):
+        lines = ["Top GUI thread stalls:"]
+        for site, count, total, longest in self.top(n):
+            lines.append("%8.3fs %4d times, longest %.3fs, %s" %
+                         (total, count, longest, site))
+        return "\n".join(lines)
@@ -0,0 +1,41 @@
+import time
+import unittest
+from stallwatchdog import StallWatchdog
+
+
+def blocking_call(seconds):
+    time.sleep(seconds)
+
+
+class StallWatchdogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.watchdog = StallWatchdog(threshold=0.1, interval=0.02)
+        self.watchdog.start()
+
+    def tearDown(self):
+        self.watchdog.stop()
+
+    def test_no_stall(self):
+        for i in range(10):
+            self.watchdog.heartbeat()
+            time.sleep(0.02)
+        self.watchdog.heartbeat()
+        self.assertEqual(self.watchdog.top(), [])
+
+    def test_stall(self):
+        for i in range(2):
+            self.watchdog.heartbeat()
+            blocking_call(0.3)
+        self.watchdog.heartbeat()
+
+        (site, count, total, longest), = self.watchdog.top()
+        self.assertTrue(site.startswith("blocking_call"))
+        self.assertEqual(count, 2)
+        self.assertTrue(longest >= 0.25)
+        self.assertTrue(total >= 0.5)
+        self.assertIn("blocking_call", self.watchdog.report())
+
+
+if __name__ == "__main__":
+    unittest.main()
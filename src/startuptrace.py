@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This file implemented a tracer for the startup of WeCase.
+#           Run WeCase with WECASE_TRACE_STARTUP=1, we'll record how long
+#           each phase and each import took, until the first timeline
+#           is rendered.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import os
+import sys
+import builtins
+import threading
+from time import perf_counter
+
+
+ENV_NAME = "WECASE_TRACE_STARTUP"
+TOP_IMPORTS = 25
+# Seconds to wait for the first timeline, e.g. the login may never finish.
+TIMEOUT = 60
+
+_enabled = bool(os.environ.get(ENV_NAME))
+_start = perf_counter()
+_phases = []
+# module name -> [self time, cumulative time]
+_imports = {}
+# time spent in nested imports of each import on the stack
+_stack = []
+_original_import = builtins.__import__
+
+
+def enabled():
+    return _enabled
+
+
+def _traced_import(name, *args, **kwargs):
+    if (name in sys.modules or
+            threading.current_thread().name != "MainThread"):
+        return _original_import(name, *args, **kwargs)
+
+    start = perf_counter()
+    _stack.append(0.0)
+    try:
+        return _original_import(name, *args, **kwargs)
+    finally:
+        elapsed = perf_counter() - start
+        children = _stack.pop()
+        times = _imports.setdefault(name, [0.0, 0.0])
+        times[0] += elapsed - children
+        times[1] += elapsed
+        if _stack:
+            _stack[-1] += elapsed
+
+
+def install():
+    if _enabled:
+        builtins.__import__ = _traced_import
+
+
+def uninstall():
+    builtins.__import__ = _original_import
+
+
+def mark(phase):
+    """Mark the end of a phase of startup."""
+    if _enabled:
+        _phases.append((phase, perf_counter()))
+
+
+def report():
+    lines = ["Startup trace", "", "%-40s %10s %10s" % ("Phase", "Took", "Since start")]
+    last = _start
+    for phase, time in _phases:
+        lines.append("%-40s %8.1fms %9.1fms" %
+                     (phase, (time - last) * 1000, (time - _start) * 1000))
+        last = time
+
+    lines.append("")
+    lines.append("%-40s %10s %10s" % ("Import", "Self", "Cumulative"))
+    imports = sorted(_imports.items(), key=lambda item: -item[1][1])
+    for name, (self_time, cumulative) in imports[:TOP_IMPORTS]:
+        lines.append("%-40s %8.1fms %9.1fms" %
+                     (name, self_time * 1000, cumulative * 1000))
+    return "\n".join(lines)
+
+
+def finish(path=None):
+    """Stop tracing, print the report and save it to path."""
+
+    global _enabled
+    if not _enabled:
+        return
+    _enabled = False
+    uninstall()
+
+    text = report()
+    print(text, file=sys.stderr)
+    if path:
+        with open(path, "w") as trace_file:
+            trace_file.write(text + "\n")
+
+
+# Trace the imports as early as possible.
+install()
@@ -0,0 +1,64 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import startuptrace
+
+
+class StartupTraceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        sys.path.insert(0, self.dir)
+        with open(os.path.join(self.dir, "trace_parent.py"), "w") as f:
+            f.write("import time\ntime.sleep(0.02)\nimport trace_child\n")
+        with open(os.path.join(self.dir, "trace_child.py"), "w") as f:
+            f.write("import time\ntime.sleep(0.05)\n")
+        self.enabled = startuptrace._enabled
+        startuptrace._enabled = True
+
+    def tearDown(self):
+        startuptrace.uninstall()
+        startuptrace._enabled = self.enabled
+        del startuptrace._phases[:]
+        startuptrace._imports.clear()
+        sys.path.remove(self.dir)
+        sys.modules.pop("trace_parent", None)
+        sys.modules.pop("trace_child", None)
+        shutil.rmtree(self.dir)
+
+    def test_traced_import(self):
+        startuptrace.install()
+        import trace_parent
+        startuptrace.uninstall()
+        startuptrace.mark("imports")
+
+        parent_self, parent_total = startuptrace._imports["trace_parent"]
+        child_self, child_total = startuptrace._imports["trace_child"]
+        self.assertTrue(child_self >= 0.05)
+        self.assertTrue(parent_self >= 0.02)
+        self.assertTrue(parent_self < 0.05)
+        self.assertTrue(parent_total >= parent_self + child_total)
+
+        report = startuptrace.report().splitlines()
+        self.assertTrue(any(line.startswith("imports") for line in report))
+        header = [line.startswith("Import") for line in report].index(True)
+        imports = [line.split()[0] for line in report[header + 1:]]
+        self.assertEqual(imports[:2], ["trace_parent", "trace_child"])
+
+    def test_finish(self):
+        path = os.path.join(self.dir, "trace")
+        startuptrace.mark("phase")
+        startuptrace.finish(path)
+        self.assertFalse(startuptrace.enabled())
+        with open(path) as trace_file:
+            self.assertIn("phase", trace_file.read())
+        # Only the first call writes the report.
+        os.remove(path)
+        startuptrace.finish(path)
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented the refresh of the repost and comment
+#           counts of many statuses, by a few calls of statuses/count.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+# statuses/count accepts 100 ids at most.
+BATCH_SIZE = 100
+
+
+def batches(ids, size=BATCH_SIZE):
+    """Split the ids into lists of the size, without duplicates."""
+    ids = sorted(set(ids), reverse=True)
+    return [ids[start:start + size] for start in range(0, len(ids), size)]
+
+
+def refreshCounts(ids, fetch, identityMap):
+    """Fetch the counts of the statuses, fetch(ids) is called with a
+    comma-separated string of ids for each batch. The statuses in the
+    identity map are updated, return the number of the counts."""
+
+    total = 0
+    for batch in batches(ids):
+        counts = fetch(",".join(str(id) for id in batch))
+        for count in counts:
+            identityMap.update("status", {"id": int(count["id"]),
+                                          "reposts_count": count["reposts"],
+                                          "comments_count": count["comments"]})
+        total += len(counts)
+    return total
@@ -0,0 +1,42 @@
+import unittest
+from fakeweibo import FakeWeibo
+from corpusgen import CorpusGenerator
+from identitymap import IdentityMap
+from statuscounts import batches, refreshCounts
+
+
+class StatusCountsTest(unittest.TestCase):
+
+    def test_batches(self):
+        self.assertEqual(batches([]), [])
+        self.assertEqual(batches([1, 3, 2, 3], size=2), [[3, 2], [1]])
+        self.assertEqual(len(batches(range(250))), 3)
+
+    def test_refreshCounts(self):
+        api = FakeWeibo(CorpusGenerator(users=5).dataset(300))
+        statuses = api.call("GET", "statuses/home_timeline", {"count": "200"})["statuses"]
+        identityMap = IdentityMap()
+        shown = [identityMap.get("status", dict(status)) for status in statuses]
+        # Use a status which isn't a repost, it's the one reposted.
+        original = [status for status in statuses if "retweeted_status" not in status][-1]
+        comments = statuses[0]["comments_count"]
+        reposts = original["reposts_count"]
+        api.call("POST", "comments/create", {"id": str(statuses[0]["id"]), "comment": "Hi"})
+        api.call("POST", "statuses/repost", {"id": str(original["id"]), "status": ""})
+
+        calls = []
+
+        def fetch(ids):
+            calls.append(ids)
+            return api.call("GET", "statuses/count", {"ids": ids})
+
+        total = refreshCounts([status["id"] for status in statuses], fetch, identityMap)
+        self.assertEqual(total, len(statuses))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(shown[0].data["comments_count"], comments + 1)
+        self.assertEqual(identityMap.find("status", original["id"]).data["reposts_count"],
+                         reposts + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
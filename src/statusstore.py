@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented a local store of the statuses,
+#           comments and users we've fetched, by timelines. It lets us
+#           read the timelines without the network, and search the
+#           statuses we've seen.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import json
+import sqlite3
+import threading
+from searchindex import searchable, terms, queryTerms, matches, MAX_CHAR
+
+
+PAGE_SIZE = 20
+# The newest statuses kept in each timeline by prune().
+KEEP = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statuses (
+    id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS timelines (
+    timeline TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (timeline, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS timelines_id ON timelines (id);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_name ON users (name);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (term, id)
+) WITHOUT ROWID;
+"""
+# The stores before the search don't have the terms of their statuses.
+INDEX_VERSION = 1
+
+
+class StatusStore():
+    """Statuses (and comments) are stored once by id, a timeline is a
+    set of ids. The queries return the newest statuses first, like Sina.
+
+    The statuses are indexed by the terms of their searchable text
+    when they are added, see search().
+
+    Call prune() now and then, or it only grows.
+
+    It's used by the models in their worker threads, all the queries
+    are serialized by a lock."""
+
+    def __init__(self, path=":memory:"):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+            if not self._db.execute("SELECT 1 FROM statuses LIMIT 1").fetchone():
+                self._db.execute("PRAGMA user_version = %d" % INDEX_VERSION)
+            version, = self._db.execute("PRAGMA user_version").fetchone()
+        # Or the first search indexes them.
+        self._indexed = version >= INDEX_VERSION
+
+    def addStatuses(self, timeline, statuses):
+        statuses = [status for status in statuses if status.get("id")]
+        users = {}
+        for status in statuses:
+            while status:
+                user = status.get("user")
+                if user and user.get("id"):
+                    users[user["id"]] = user
+                # retweeted_status for tweets, status for comments.
+                status = status.get("retweeted_status") or status.get("status")
+
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO statuses (id, data) VALUES (?, ?)",
+                [(status["id"], json.dumps(status)) for status in statuses])
+            self._db.executemany(
+                "INSERT OR IGNORE INTO timelines (timeline, id) VALUES (?, ?)",
+                [(timeline, status["id"]) for status in statuses])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO users (id, name, data) VALUES (?, ?, ?)",
+                [(user["id"], user.get("name"), json.dumps(user))
+                 for user in users.values()])
+            self._index(statuses)
+
+    def _index(self, statuses):
+        self._db.executemany(
+            "INSERT OR IGNORE INTO terms (term, id) VALUES (?, ?)",
+            [(term, status["id"]) for status in statuses
+             for term in terms(searchable(status))])
+
+    def _remove(self, ids):
+        """Remove the statuses, from the timelines and the index, too."""
+        rows = []
+        for id in ids:
+            rows += self._db.execute("SELECT data FROM statuses WHERE id = ?",
+                                     (id,)).fetchall()
+        self._db.executemany(
+            "DELETE FROM terms WHERE term = ? AND id = ?",
+            [(term, status["id"]) for status in (json.loads(data) for data, in rows)
+             for term in terms(searchable(status))])
+        self._db.executemany("DELETE FROM timelines WHERE id = ?", [(id,) for id in ids])
+        self._db.executemany("DELETE FROM statuses WHERE id = ?", [(id,) for id in ids])
+
+    def _indexAll(self):
+        """Index the statuses stored before the search."""
+        cursor = self._db.execute("SELECT data FROM statuses")
+        with self._db:
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                self._index([json.loads(data) for data, in rows])
+            self._db.execute("PRAGMA user_version = %d" % INDEX_VERSION)
+        self._indexed = True
+
+    def statuses(self, timeline, max_id=None, since_id=None,
+                 count=PAGE_SIZE, offset=0, oldest_first=False):
+        """Return the statuses of the timeline with since_id < id <= max_id,
+        newest first, or the oldest ones first if oldest_first."""
+
+        query = ("SELECT statuses.data FROM timelines JOIN statuses USING (id) "
+                 "WHERE timelines.timeline = ?")
+        args = [timeline]
+        if max_id is not None:
+            query += " AND id <= ?"
+            args.append(max_id)
+        if since_id is not None:
+            query += " AND id > ?"
+            args.append(since_id)
+        query += " ORDER BY id %s LIMIT ? OFFSET ?" % ("ASC" if oldest_first else "DESC")
+        args += [count, offset]
+
+        with self._lock:
+            rows = self._db.execute(query, args).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def search(self, query, max_id=None, since_id=None, count=PAGE_SIZE,
+               offset=0, oldest_first=False):
+        """Return the statuses with since_id < id <= max_id which match
+        the query, newest first, or the oldest ones first if
+        oldest_first, skipping offset of them. All the words of the
+        query must be found in the text, the author or the retweeted
+        status, see searchindex."""
+
+        lookups = queryTerms(query)
+        if not lookups:
+            return []
+        subqueries = []
+        args = []
+        for term, prefix in lookups:
+            if prefix:
+                subqueries.append("SELECT id FROM terms WHERE term >= ? AND term < ?")
+                args += [term, term + MAX_CHAR]
+            else:
+                subqueries.append("SELECT id FROM terms WHERE term = ?")
+                args.append(term)
+            if max_id is not None:
+                subqueries[-1] += " AND id <= ?"
+                args.append(max_id)
+            if since_id is not None:
+                subqueries[-1] += " AND id > ?"
+                args.append(since_id)
+        sql = ("SELECT data FROM statuses WHERE id IN (%s) ORDER BY id %s"
+               % (" INTERSECT ".join(subqueries), "ASC" if oldest_first else "DESC"))
+
+        result = []
+        with self._lock:
+            if not self._indexed:
+                self._indexAll()
+            # The terms are found, but maybe not in the same order.
+            for data, in self._db.execute(sql, args):
+                status = json.loads(data)
+                if not matches(query, searchable(status)):
+                    continue
+                if offset:
+                    offset -= 1
+                    continue
+                result.append(status)
+                if len(result) >= count:
+                    break
+        return result
+
+    def removeStatus(self, id):
+        """Forget a deleted status, it's not in any timeline or search."""
+        with self._lock, self._db:
+            self._remove([id])
+
+    def prune(self, keep=KEEP):
+        """Keep the newest statuses of each timeline, remove the others
+        unless another timeline has them. Return the number removed."""
+        with self._lock, self._db:
+            timelines = self._db.execute(
+                "SELECT timeline FROM timelines GROUP BY timeline HAVING COUNT(*) > ?",
+                (keep,)).fetchall()
+            for timeline, in timelines:
+                self._db.execute(
+                    "DELETE FROM timelines WHERE timeline = ? AND id < "
+                    "(SELECT id FROM timelines WHERE timeline = ? "
+                    "ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (timeline, timeline, keep - 1))
+            ids = [id for id, in self._db.execute(
+                "SELECT id FROM statuses WHERE id NOT IN (SELECT id FROM timelines)")]
+            self._remove(ids)
+        return len(ids)
+
+    def status(self, id):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM statuses WHERE id = ?",
+                                   (id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def user(self, id=None, name=None):
+        with self._lock:
+            if id:
+                row = self._db.execute("SELECT data FROM users WHERE id = ?",
+                                       (id,)).fetchone()
+            else:
+                row = self._db.execute("SELECT data FROM users WHERE name = ?",
+                                       (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from statusstore import StatusStore
+
+
+def status(id, uid=1, **kwargs):
+    status = {"id": id, "text": "status %d" % id,
+              "user": {"id": uid, "name": "user%d" % uid}}
+    status.update(kwargs)
+    return status
+
+
+class StatusStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = StatusStore()
+
+    def tearDown(self):
+        self.store.close()
+
+    def ids(self, statuses):
+        return [status["id"] for status in statuses]
+
+    def test_timelines(self):
+        self.store.addStatuses("home", [status(i) for i in range(1, 31)])
+        self.store.addStatuses("user/2", [status(5, 2), status(40, 2)])
+
+        self.assertEqual(self.ids(self.store.statuses("home")), list(range(30, 10, -1)))
+        self.assertEqual(self.ids(self.store.statuses("home", offset=20)), list(range(10, 0, -1)))
+        self.assertEqual(self.ids(self.store.statuses("home", max_id=5, since_id=2)), [5, 4, 3])
+        self.assertEqual(self.ids(self.store.statuses("home", since_id=2, count=3,
+                                                      oldest_first=True)), [3, 4, 5])
+        self.assertEqual(self.ids(self.store.statuses("user/2")), [40, 5])
+        self.assertEqual(self.store.statuses("topic"), [])
+
+        # A status is stored once, the latest one wins.
+        self.assertEqual(self.store.status(5)["user"]["id"], 2)
+        self.assertEqual(self.store.statuses("home", max_id=5, count=1)[0]["user"]["id"], 2)
+
+    def test_users(self):
+        retweet = status(2, 1, retweeted_status=status(1, 3))
+        comment = status(3, 4, status=status(1, 3))
+        self.store.addStatuses("home", [retweet, comment])
+        self.assertEqual(self.store.user(3)["name"], "user3")
+        self.assertEqual(self.store.user(name="user4")["id"], 4)
+        self.assertEqual(self.store.user(5), None)
+        # The nested statuses are not in the timeline.
+        self.assertEqual(self.ids(self.store.statuses("home")), [3, 2])
+
+    def test_search(self):
+        self.store.addStatuses("home", [
+            status(1, text="今天天气不错"),
+            status(2, text="WeCase 发布了", user={"id": 2, "screen_name": "WeCaseDev"}),
+            status(3, text="转发", retweeted_status=status(1, text="今天天气不错")),
+            status(4, text="天气预报说今天有雨"),
+        ])
+        self.assertEqual(self.ids(self.store.search("天气")), [4, 3, 1])
+        # The bigrams of 今天气 are in 4, the phrase isn't.
+        self.assertEqual(self.ids(self.store.search("今天气")), [])
+        self.assertEqual(self.ids(self.store.search("今天 天气")), [4, 3, 1])
+        self.assertEqual(self.ids(self.store.search("今天天气")), [3, 1])
+        self.assertEqual(self.ids(self.store.search("雨")), [4])
+        self.assertEqual(self.ids(self.store.search("wecasedev")), [2])
+        self.assertEqual(self.ids(self.store.search("wec")), [2])
+        self.assertEqual(self.ids(self.store.search("天气", max_id=3, count=1)), [3])
+        self.assertEqual(self.ids(self.store.search("天气", offset=1)), [3, 1])
+        self.assertEqual(self.ids(self.store.search("天气", since_id=1, oldest_first=True)),
+                         [3, 4])
+        self.assertEqual(self.store.search(" ,"), [])
+
+    def test_removeStatus(self):
+        self.store.addStatuses("home", [status(1, text="hello"), status(2, text="hello")])
+        self.store.addStatuses("user/1", [status(1, text="hello")])
+        self.store.removeStatus(1)
+        self.store.removeStatus(3)
+        self.assertIsNone(self.store.status(1))
+        self.assertEqual(self.ids(self.store.statuses("home")), [2])
+        self.assertEqual(self.store.statuses("user/1"), [])
+        self.assertEqual(self.ids(self.store.search("hello")), [2])
+        count, = self.store._db.execute("SELECT COUNT(*) FROM terms WHERE id = 1").fetchone()
+        self.assertEqual(count, 0)
+
+    def test_prune(self):
+        self.store.addStatuses("home", [status(i, text="hello") for i in range(1, 11)])
+        self.store.addStatuses("user/1", [status(2, text="hello")])
+        self.store.addStatuses("mentions", [status(20, text="hello")])
+        self.assertEqual(self.store.prune(keep=3), 6)
+        self.assertEqual(self.ids(self.store.statuses("home")), [10, 9, 8])
+        self.assertEqual(self.ids(self.store.statuses("user/1")), [2])
+        self.assertEqual(self.ids(self.store.statuses("mentions")), [20])
+        self.assertEqual(self.ids(self.store.search("hello")), [20, 10, 9, 8, 2])
+        self.assertIsNone(self.store.status(1))
+        self.assertEqual(self.store.prune(keep=3), 0)
+
+    def test_index_old_store(self):
+        path = os.path.join(tempfile.mkdtemp(), "statuses.db")
+        store = StatusStore(path)
+        store.addStatuses("home", [status(1, text="old status")])
+        store.close()
+        # As if the store is older than the search.
+        db = sqlite3.connect(path)
+        with db:
+            db.execute("DELETE FROM terms")
+            db.execute("PRAGMA user_version = 0")
+        db.close()
+
+        store = StatusStore(path)
+        self.assertEqual(self.ids(store.search("old")), [1])
+        store.close()
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+# WeCase -- This model implemented the upload of images. The SDK reads
+#           the whole image into the memory and sends it at once, here
+#           the multipart/form-data body is streamed from the disk in
+#           chunks, so we know the progress and can stop it.
+# Copyright (C) 2013 Tom Li
+# License: GPL v3 or later.
+
+
+import os
+import json
+import uuid
+import mimetypes
+import http.client
+from urllib.parse import urlsplit
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """The error returned by Sina."""
+
+    def __init__(self, error_code, error, request=""):
+        super(UploadError, self).__init__("%s: %s" % (error_code, error))
+        self.error_code = error_code
+        self.error = error
+        self.request = request
+
+
+class Cancelled(Exception):
+    pass
+
+
+class MultipartBody():
+    """The multipart/form-data body of the fields and the files, with
+    its length known before the files are read."""
+
+    def __init__(self, fields, files, boundary=None):
+        self.boundary = boundary or uuid.uuid4().hex
+        self._parts = []
+        for name, value in fields.items():
+            self._parts.append(self._header(name) + str(value).encode("utf-8") + b"\r\n")
+        for name, path in files.items():
+            mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            extra = "; filename=\"%s\"\r\nContent-Type: %s" % (os.path.basename(path), mime)
+            self._parts.append(self._header(name, extra))
+            self._parts.append(path)
+            self._parts.append(b"\r\n")
+        self._parts.append(("--%s--\r\n" % self.boundary).encode("utf-8"))
+
+    def _header(self, name, extra=""):
+        return ("--%s\r\nContent-Disposition: form-data; name=\"%s\"%s\r\n\r\n"
+                % (self.boundary, name, extra)).encode("utf-8")
+
+    @property
+    def content_type(self):
+        return "multipart/form-data; boundary=%s" % self.boundary
+
+    def __len__(self):
+        return sum(len(part) if isinstance(part, bytes) else os.path.getsize(part)
+                   for part in self._parts)
+
+    def chunks(self, size=CHUNK_SIZE):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            with open(part, "rb") as f:
+                while True:
+                    chunk = f.read(size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+
+def upload(url, access_token, fields, files, progress=None, cancel=None, timeout=60):
+    """POST the fields and the files {name: path} to the API url, return
+    the JSON result.
+
+    progress(sent, total) is called after each chunk. Cancelled is raised
+    if the cancel event is set, the connection is closed then. Network
+    errors are raised as they are, UploadError if Sina returns an error."""
+
+    body = MultipartBody(fields, files)
+    total = len(body)
+    url = urlsplit(url)
+    if url.scheme == "https":
+        connection = http.client.HTTPSConnection(url.hostname, url.port, timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection(url.hostname, url.port, timeout=timeout)
+
+    try:
+        connection.putrequest("POST", url.path + ("?" + url.query if url.query else ""))
+        connection.putheader("Authorization", "OAuth2 %s" % access_token)
+        connection.putheader("Content-Type", body.content_type)
+        connection.putheader("Content-Length", str(total))
+        connection.endheaders()
+
+        sent = 0
+        for chunk in body.chunks():
+            if cancel and cancel.is_set():
+                raise Cancelled()
+            connection.send(chunk)
+            sent += len(chunk)
+            if progress:
+                progress(sent, total)
+
+        response = connection.getresponse()
+        content = response.read()
+    finally:
+        connection.close()
+
+    try:
+        result = json.loads(content.decode("utf-8"))
+    except ValueError:
+        # A proxy or a broken response, not the answer of Sina.
+        raise http.client.HTTPException("HTTP %d without JSON" % response.status)
+    if "error_code" in result:
+        raise UploadError(result["error_code"], result.get("error", ""),
+                          result.get("request", ""))
+    return result
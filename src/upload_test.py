@@ -0,0 +1,96 @@
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import unittest
+from corpusgen import CorpusGenerator
+from fakeweibo import FakeWeiboServer, placeholder_png
+import imageprep
+import upload
+from upload import MultipartBody, UploadError, Cancelled
+
+
+class UploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.pic = os.path.join(self.dir, "pic.png")
+        with open(self.pic, "wb") as f:
+            f.write(placeholder_png(300, 200) * 20)
+        self.server = FakeWeiboServer(("127.0.0.1", 0), CorpusGenerator(users=5).dataset(10))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = self.server.url + "/2/statuses/upload.json"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.dir)
+
+    def test_body(self):
+        body = MultipartBody({"status": "Hi"}, {"pic": self.pic}, boundary="xyz")
+        content = b"".join(body.chunks(size=100))
+        self.assertEqual(len(content), len(body))
+        self.assertTrue(content.startswith(b'--xyz\r\nContent-Disposition: form-data; name="status"'))
+        self.assertIn(b'filename="pic.png"\r\nContent-Type: image/png\r\n\r\n', content)
+        self.assertTrue(content.endswith(b"\r\n--xyz--\r\n"))
+        self.assertEqual(body.content_type, "multipart/form-data; boundary=xyz")
+
+    def test_upload(self):
+        progress = []
+        status = upload.upload(self.url, "token", {"status": "Photo"}, {"pic": self.pic},
+                               lambda sent, total: progress.append((sent, total)))
+        self.assertEqual(status["text"], "Photo")
+        self.assertEqual(self.server.api.statuses[0]["id"], status["id"])
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(progress[-1][0], progress[-1][1])
+
+    def test_error(self):
+        url = self.server.url + "/2/statuses/no_such_api.json"
+        with self.assertRaises(UploadError) as cm:
+            upload.upload(url, "token", {"status": "Photo"}, {"pic": self.pic})
+        self.assertEqual(cm.exception.error_code, 10014)
+
+    def test_cancel(self):
+        cancel = threading.Event()
+
+        def progress(sent, total):
+            cancel.set()
+
+        with self.assertRaises(Cancelled):
+            upload.upload(self.url, "token", {"status": "Photo"}, {"pic": self.pic},
+                          progress, cancel)
+        self.assertNotEqual(self.server.api.statuses[0]["text"], "Photo")
+
+    def test_orientation(self):
+        def jpeg(tiff):
+            exif = b"Exif\0\0" + tiff
+            return (b"\xff\xd8\xff\xe0\x00\x04JF" +
+                    b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif +
+                    b"\xff\xda\x00\x02")
+
+        path = os.path.join(self.dir, "photo.jpg")
+        tests = [
+            (b"MM\x00\x2a\x00\x00\x00\x08\x00\x01"
+             b"\x01\x12\x00\x03\x00\x00\x00\x01\x00\x06\x00\x00", 6),
+            (b"II\x2a\x00\x08\x00\x00\x00\x02\x00"
+             b"\x0f\x01\x02\x00\x04\x00\x00\x00\x00\x00\x00\x00"
+             b"\x12\x01\x03\x00\x01\x00\x00\x00\x08\x00\x00\x00", 8),
+            (b"II\x2a\x00\x08\x00\x00\x00\x00\x00", 1),
+        ]
+        for tiff, expected in tests:
+            with open(path, "wb") as f:
+                f.write(jpeg(tiff))
+            self.assertEqual(imageprep.orientation(path), expected)
+        self.assertEqual(imageprep.orientation(self.pic), 1)
+
+    def test_fit(self):
+        self.assertEqual(imageprep.fit(800, 600), (800, 600))
+        self.assertEqual(imageprep.fit(4000, 3000), (2048, 1536))
+        self.assertEqual(imageprep.fit(100, 10000, max_side=1000), (10, 1000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,8 @@
 # Copyright: GPL v3 or later.
 
 
+# startuptrace should be imported first, to trace all other imports.
+import startuptrace
 import sys
 import os
 from PyQt4 import QtCore, QtGui
@@ -13,6 +15,7 @@ from LoginWindow import LoginWindow
 import const
 import traceback
 import signal
+import sessionrecorder
 import logging
 import WeHack
 
@@ -32,6 +35,17 @@ def mkconfig():
         pass
 
 
+def toggle_profiler(signum, frame):
+    import samplingprofiler
+    samplingprofiler.toggle(const.cache_path)
+
+
+def finish_startup_trace(phase):
+    # No-op if the first timeline has finished the trace.
+    startuptrace.mark(phase)
+    startuptrace.finish(const.cache_path + "startup_trace")
+
+
 class ErrorWindow(QtCore.QObject):
 
     raiseException = QtCore.pyqtSignal(str)
@@ -99,12 +113,17 @@ def setup_logger():
 
 
 if __name__ == "__main__":
+    startuptrace.mark("imports")
     setup_logger()
     mkconfig()
+    # Record or replay the HTTP traffic, if the environment says so.
+    sessionrecorder.install()
+    startuptrace.mark("logger and directories")
 
     App = QtGui.QApplication(sys.argv)
     App.setApplicationName("WeCase")
     QtCore.QTextCodec.setCodecForTr(QtCore.QTextCodec. codecForName("UTF-8"))
+    startuptrace.mark("QApplication")
 
     # Exceptions may happen in other threads.
     # So, use signal/slot to avoid threads' issue.
@@ -113,6 +132,32 @@ if __name__ == "__main__":
     errorWindow = ErrorWindow()
     signal.signal(signal.SIGINT, signal.SIG_DFL)
 
+    # Send SIGUSR1 to start the sampling profiler, and send it again
+    # to stop and save the result in the cache directory.
+    signal.signal(signal.SIGUSR1, toggle_profiler)
+
+    # Log the stack of the GUI thread when the event loop is blocked.
+    # The heartbeats also wake the interpreter up periodically, Python
+    # handles signals only when it is running.
+    from stallwatchdog import StallWatchdog
+    watchdog = StallWatchdog()
+    watchdog_timer = QtCore.QTimer()
+    watchdog_timer.timeout.connect(watchdog.heartbeat)
+    watchdog_timer.start(int(watchdog.interval * 1000))
+    watchdog.start()
+
+    # objgraph is slow to import, import leakmonitor only if it is enabled.
+    if os.environ.get("WECASE_LEAKMONITOR"):
+        import leakmonitor
+        leak_interval = leakmonitor.interval()
+    else:
+        leak_interval = 0
+    if leak_interval:
+        leak_monitor = leakmonitor.LeakMonitor(const.cache_path + "leaks.txt")
+        leak_timer = QtCore.QTimer()
+        leak_timer.timeout.connect(leak_monitor.check)
+        leak_timer.start(leak_interval * 1000)
+
     # Qt's built-in string translator
     qt_translator = QtCore.QTranslator(App)
     qt_translator.load("qt_" + QtCore.QLocale.system().name(),
@@ -125,13 +170,22 @@ if __name__ == "__main__":
     my_translator.load("WeCase_" + QtCore.QLocale.system().name(),
                        const.myself_path + "locale")
     App.installTranslator(my_translator)
+    startuptrace.mark("translators")
 
     import_warning()
     wecase_login = LoginWindow()
+    startuptrace.mark("LoginWindow")
+    if startuptrace.enabled():
+        QtCore.QTimer.singleShot(startuptrace.TIMEOUT * 1000,
+                                 lambda: finish_startup_trace("timeout"))
 
     exit_status = App.exec_()
 
     # Cleanup code here.
+    finish_startup_trace("exit")
+    if watchdog.stalls:
+        logging.warning(watchdog.report())
+    sessionrecorder.close()
     App.deleteLater()
 
     # Hack: The easiest way to avoid exit crashes is to call os._exit()